@@ -0,0 +1,266 @@
+import pandas as pd
+import json
+import os
+import smtplib
+import threading
+from datetime import datetime
+from email.message import EmailMessage
+import requests
+import collector_metrics
+import history_store
+
+# ==========================================
+# 信号告警 (Alert Rules)
+# ==========================================
+# 采集器入库后 (source_engine) 立即用 "本次写入的行" 评估规则，不重扫历史库:
+#   1. 规则: 声明式条件列表 (列, 运算符, 阈值)，全部满足即为 "激活"
+#   2. 状态: 每条规则记住上一次的激活状态与对应的主键日期 (alerts/state.json)，
+#      只在状态翻转时告警 (enter: 未激活 -> 激活；change: 任一方向)
+#      同一主键日期重复运行 (覆盖今日记录) 时与该日期之前的状态比较，不会重复告警
+#   3. 输出: 告警依次交给 ALERT_SINKS 中的各个 sink (文件 / webhook / 邮件)，
+#      sink 出错只打印警告，不影响采集器
+# 告警延迟即入库延迟: 数据写入后的同一次运行内完成评估与发送。
+#
+# 环境变量:
+#   ALERT_SINKS          逗号分隔的 sink 名称 (默认 file)
+#   ALERT_WEBHOOK_URL    webhook sink 的地址 (未设置时写入 alerts/webhook_outbox.jsonl)
+#   ALERT_SMTP_HOST / ALERT_EMAIL_FROM / ALERT_EMAIL_TO
+#                        email sink (未设置 SMTP 时写入 alerts/outbox/*.eml)
+
+ALERT_DIR = os.environ.get("ALERT_DIR", "alerts")
+STATE_FILE = os.path.join(ALERT_DIR, "state.json")
+
+OPS = {
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+}
+
+# 规则: name 唯一；when 中的列可以是历史库列，也可以是 derive 声明的差值列 (a - b)
+RULES = [
+    {
+        "name": "nao_day10_below_minus1",
+        "source": "weather",
+        "title": "NAO Day-10 跌破 -1 (阻塞增强)",
+        "when": [("NAO_Day10", "<", -1.0)],
+    },
+    {
+        "name": "strong_buy_day10",
+        "source": "weather",
+        "title": "极寒模式 (Strong Buy): NAO(-) + AO(-) + PNA(+) [Day-10]",
+        "when": [("NAO_Day10", "<", 0), ("AO_Day10", "<", 0), ("PNA_Day10", ">", 0)],
+    },
+    {
+        "name": "strong_sell_day10",
+        "source": "weather",
+        "title": "暖冬模式 (Strong Sell): NAO(+) + AO(+) + PNA(-) [Day-10]",
+        "when": [("NAO_Day10", ">", 0), ("AO_Day10", ">", 0), ("PNA_Day10", "<", 0)],
+    },
+    {
+        "name": "storage_vs_5yr_flip",
+        "source": "storage",
+        "title": "总库存相对 5 年均值翻转 (正 = 高于均值)",
+        "derive": {"Total_vs_5Yr": ("Total_Stock", "Total_5Yr_Avg")},
+        "when": [("Total_vs_5Yr", ">", 0)],
+        "on": "change",
+    },
+]
+
+
+# ==========================================
+# 1. 输出 (Sinks)
+# ==========================================
+
+class FileSink:
+    """追加到 alerts/alerts.jsonl (看板 / 其他脚本可直接读取)。"""
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(ALERT_DIR, "alerts.jsonl")
+
+    def send(self, alert):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with history_store.locked(self.path), open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(alert, ensure_ascii=False) + "\n")
+
+
+class WebhookSink:
+    """POST JSON 到 ALERT_WEBHOOK_URL；未配置地址时写入本地 outbox 代替。"""
+
+    def __init__(self, url=None, timeout=10):
+        self.url = url or os.environ.get("ALERT_WEBHOOK_URL")
+        self.timeout = timeout
+        self.outbox = FileSink(os.path.join(ALERT_DIR, "webhook_outbox.jsonl"))
+
+    def send(self, alert):
+        if not self.url:
+            self.outbox.send(alert)
+            return
+        response = requests.post(self.url, json=alert, timeout=self.timeout)
+        response.raise_for_status()
+
+
+class EmailSink:
+    """发邮件；未配置 ALERT_SMTP_HOST 时把邮件写成 alerts/outbox/*.eml 代替。"""
+
+    def __init__(self, host=None, sender=None, to=None):
+        self.host = host or os.environ.get("ALERT_SMTP_HOST")
+        self.sender = sender or os.environ.get("ALERT_EMAIL_FROM", "alerts@localhost")
+        self.to = to or os.environ.get("ALERT_EMAIL_TO", "traders@localhost")
+        self.outbox = os.path.join(ALERT_DIR, "outbox")
+
+    def message(self, alert):
+        msg = EmailMessage()
+        msg["Subject"] = f"[Gas Alert] {alert['title']}"
+        msg["From"] = self.sender
+        msg["To"] = self.to
+        lines = [alert["title"], "",
+                 f"状态: {'激活' if alert['active'] else '解除'}",
+                 f"数据: {alert['source']} @ {alert['key']}"]
+        lines += [f"  {col}: {val}" for col, val in alert["values"].items()]
+        msg.set_content("\n".join(lines))
+        return msg
+
+    def send(self, alert):
+        msg = self.message(alert)
+        if self.host:
+            with smtplib.SMTP(self.host, timeout=10) as smtp:
+                smtp.send_message(msg)
+            return
+        os.makedirs(self.outbox, exist_ok=True)
+        name = f"{alert['key']}_{alert['rule']}.eml"
+        with open(os.path.join(self.outbox, name), "wb") as f:
+            f.write(bytes(msg))
+
+
+# 名称 -> sink 类 (无参构造)；新的 sink 注册到这里即可在 ALERT_SINKS 中使用
+SINK_TYPES = {
+    "file": FileSink,
+    "webhook": WebhookSink,
+    "email": EmailSink,
+}
+
+
+def configured_sinks():
+    names = [n.strip() for n in os.environ.get("ALERT_SINKS", "file").split(",") if n.strip()]
+    sinks = []
+    for name in names:
+        if name not in SINK_TYPES:
+            print(f"⚠️ 未知告警 sink: {name}")
+            continue
+        sinks.append(SINK_TYPES[name]())
+    return sinks
+
+
+def dispatch(alert, sinks):
+    for sink in sinks:
+        try:
+            sink.send(alert)
+        except Exception as e:
+            print(f"⚠️ 告警发送失败 ({type(sink).__name__}): {e}")
+
+
+# ==========================================
+# 2. 规则评估 (Evaluation)
+# ==========================================
+
+_state_lock = threading.Lock()
+
+
+def load_state(path=STATE_FILE):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _values(row, rule):
+    """规则用到的列的数值 (含 derive 差值列)。缺列 / 空值为 None。"""
+    def number(col):
+        val = pd.to_numeric(row.get(col), errors="coerce")
+        return None if pd.isna(val) else float(val)
+
+    values = {}
+    for name, (a, b) in rule.get("derive", {}).items():
+        x, y = number(a), number(b)
+        values[name] = None if x is None or y is None else x - y
+    for col, _, _ in rule["when"]:
+        if col not in values:
+            values[col] = number(col)
+    return values
+
+
+def is_active(rule, values):
+    """全部条件满足为 True；有条件缺数据时为 None (状态保持不变)。"""
+    results = []
+    for col, op, threshold in rule["when"]:
+        if values.get(col) is None:
+            return None
+        results.append(OPS[op](values[col], threshold))
+    return all(results)
+
+
+def step(rule, state, key, values):
+    """
+    用一行新数据推进一条规则的状态，返回要发出的告警 (或 None)。
+    state: {"key": 最近评估的主键, "active": 其状态, "before": 该主键之前的状态, "fired": 已告警的 (主键, 状态)}
+    """
+    active = is_active(rule, values)
+    last_key = state.get("key")
+    if active is None or (last_key is not None and key < last_key):
+        return None  # 缺数据 / 比已评估的更早 (不是新数据)
+
+    if key == last_key:
+        previous = state.get("before")  # 同一日期重跑: 与该日期之前的状态比较
+    else:
+        previous = state.get("active")
+        state["before"] = previous
+    state["key"], state["active"] = key, active
+
+    if previous is None:
+        return None  # 首次评估只建立基线，不告警
+    fire = active != previous if rule.get("on") == "change" else (active and not previous)
+    if not fire or state.get("fired") == [key, active]:
+        return None
+    state["fired"] = [key, active]
+    return {
+        "rule": rule["name"],
+        "title": rule["title"],
+        "source": rule["source"],
+        "key": key,
+        "active": active,
+        "values": {col: None if v is None else round(v, 4) for col, v in values.items()},
+        "time": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+    }
+
+
+def evaluate(source, rows, rules=None, sinks=None, state_path=STATE_FILE):
+    """
+    用本次入库的行评估该源的规则，发送翻转告警并保存状态。返回告警列表。
+    rows: 本次写入的 DataFrame (未转换类型亦可)，按主键排序后逐行推进状态。
+    """
+    rules = [r for r in (RULES if rules is None else rules) if r["source"] == source]
+    if not rules or rows is None or rows.empty:
+        return []
+    key_col = history_store.SOURCES[source]["key"]
+    keys = pd.to_datetime(rows[key_col], errors="coerce").dt.strftime("%Y-%m-%d")
+    ordered = rows.assign(_key=keys).dropna(subset=["_key"]).sort_values("_key", kind="stable")
+
+    fired = []
+    with _state_lock, history_store.locked(state_path):
+        state = load_state(state_path)
+        for row in ordered.to_dict("records"):
+            for rule in rules:
+                alert = step(rule, state.setdefault(rule["name"], {}), row["_key"], _values(row, rule))
+                if alert is not None:
+                    fired.append(alert)
+        history_store.write_json(state, state_path, versioned=False, ensure_ascii=False, indent=2)
+
+    if fired:
+        sinks = configured_sinks() if sinks is None else sinks
+        for alert in fired:
+            print(f"   🚨 [告警] {alert['title']} ({'激活' if alert['active'] else '解除'}) @ {alert['key']}")
+            dispatch(alert, sinks)
+    collector_metrics.add("alerts_fired", len(fired))
+    return fired
@@ -0,0 +1,298 @@
+import pandas as pd
+import numpy as np
+import requests
+import hashlib
+import json
+import math
+import os
+import sys
+from datetime import date, timedelta
+
+# ==========================================
+# 基准测试数据源 (Benchmark Fixtures)
+# ==========================================
+# 每个外部数据源对应一个固定文件，由本地 HTTP 服务 (local_server.py) 按文件名提供。
+#   - recorded/  : 真实数据源的录制副本。仓库里目前没有提交录制副本，
+#                  需在有网络的机器上运行 python benchmarks/fixtures.py record 生成 (之后可提交入库)
+#   - synthetic/ : 没有录制副本时按固定随机种子生成的同格式数据 (不入库，可随时重建)
+# 在 record 之前，基准测试全部使用合成数据；每个数据源用的是哪一种 (kind) 会打印出来并写入结果。
+# 同一份 fixture 的 sha256 会写入基准结果，比较两次结果时据此判断输入是否一致。
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import climate_collector
+import degree_day_parser
+import history_store
+import storage_collector
+
+FIXTURE_DIR = os.path.join(ROOT, "benchmarks", "fixtures")
+RECORDED_DIR = os.path.join(FIXTURE_DIR, "recorded")
+SYNTHETIC_DIR = os.path.join(FIXTURE_DIR, "synthetic")
+
+ENSO_URL = "https://www.cpc.ncep.noaa.gov/products/analysis_monitoring/lanina/enso_evolution-status-fcsts-web.pdf"
+
+# 数据源名称 -> 真实 URL (文件名取 URL 最后一段)
+SOURCES = {
+    "gefs_ao": climate_collector.DATA_SOURCES["AO"],
+    "gefs_nao": climate_collector.DATA_SOURCES["NAO"],
+    "gefs_pna": climate_collector.DATA_SOURCES["PNA"],
+    "hdd": degree_day_parser.LAYOUTS["HDD"]["url"],
+    "cdd": degree_day_parser.LAYOUTS["CDD"]["url"],
+    "eia": storage_collector.URL_EIA,
+    "enso": ENSO_URL,
+}
+
+# 参与倍增的历史库 (仓库根目录下 history/<source>/ 的月分区)
+HISTORY_SOURCES = ["weather", "hdd", "storage"]
+DATE_COLS = ["Date", "Run_Date", "Source_Date", "Report_Date", "Update_Time"]
+
+SEED = 20251122
+SYNTHETIC_DATE = date(2025, 11, 22)  # 周六，与 CPC 度日周的截止日一致
+
+
+def filename(source):
+    return SOURCES[source].rsplit("/", 1)[-1]
+
+
+def fixture_path(source):
+    """优先使用录制副本 (需先 record)，否则回退到合成数据 (不存在时先生成)。"""
+    recorded = os.path.join(RECORDED_DIR, filename(source))
+    if os.path.exists(recorded):
+        return recorded
+    synthetic = os.path.join(SYNTHETIC_DIR, filename(source))
+    if not os.path.exists(synthetic):
+        synthesize(source)
+    return synthetic
+
+
+def describe_fixtures():
+    """{数据源: {file, kind, bytes, sha256}}，写入基准结果用于比较输入是否一致。"""
+    info = {}
+    for source in SOURCES:
+        path = fixture_path(source)
+        with open(path, "rb") as f:
+            content = f.read()
+        info[source] = {
+            "file": filename(source),
+            "kind": "recorded" if path.startswith(RECORDED_DIR) else "synthetic",
+            "bytes": len(content),
+            "sha256": hashlib.sha256(content).hexdigest(),
+        }
+    synthetic = [s for s, v in info.items() if v["kind"] == "synthetic"]
+    if synthetic:
+        print(f"   ⚠️ Fixture: {len(synthetic)}/{len(info)} 个数据源使用合成数据 (synthetic): {', '.join(synthetic)}")
+        print("      运行 python benchmarks/fixtures.py record 录制真实数据后再比较绝对耗时")
+    else:
+        print(f"   🗂️ Fixture: 全部 {len(info)} 个数据源使用录制副本 (recorded)")
+    return info
+
+
+# ==========================================
+# 1. 录制 (Record)
+# ==========================================
+
+def record(sources=None):
+    """下载真实数据源到 recorded/ (需要网络)。"""
+    os.makedirs(RECORDED_DIR, exist_ok=True)
+    for source in sources or SOURCES:
+        url = SOURCES[source]
+        print(f"   -> 正在录制 {source}: {url}")
+        try:
+            response = requests.get(url, headers={"User-Agent": "Mozilla/5.0"}, timeout=60)
+            response.raise_for_status()
+            with open(os.path.join(RECORDED_DIR, filename(source)), "wb") as f:
+                f.write(response.content)
+            print(f"      ✅ {len(response.content):,} bytes")
+        except Exception as e:
+            print(f"      ❌ 录制失败: {e}")
+
+
+# ==========================================
+# 2. 合成 (Synthesize)
+# ==========================================
+
+def _gefs_csv(name, rng, days=120, members=31, leads=36):
+    """与 CPC GEFS 每日指数 CSV 同格式: time, ens, lead, <name>_index。"""
+    times = pd.date_range(end=SYNTHETIC_DATE, periods=days, freq="D")
+    t, e, l = np.meshgrid(np.arange(days), np.arange(members), np.arange(leads), indexing="ij")
+    # 随 lead 发散的随机游走，近似集合成员的离散度
+    base = np.sin(t / 9.0) + 0.3 * np.cos(t / 3.0)
+    spread = rng.standard_normal(t.shape) * (0.1 + 0.05 * l)
+    values = base + np.cumsum(spread, axis=2)
+    df = pd.DataFrame({
+        "time": times[t.ravel()].strftime("%Y-%m-%d"),
+        "ens": e.ravel(),
+        "lead": l.ravel(),
+        f"{name.lower()}_index": values.ravel().round(3),
+    })
+    return df.to_csv(index=False).encode()
+
+
+US_STATES = [
+    "ALABAMA", "ARIZONA", "ARKANSAS", "CALIFORNIA", "COLORADO", "CONNECTICUT", "DELAWARE", "FLORIDA",
+    "GEORGIA", "IDAHO", "ILLINOIS", "INDIANA", "IOWA", "KANSAS", "KENTUCKY", "LOUISIANA", "MAINE",
+    "MARYLAND", "MASSACHUSETTS", "MICHIGAN", "MINNESOTA", "MISSISSIPPI", "MISSOURI", "MONTANA",
+    "NEBRASKA", "NEVADA", "NEW HAMPSHIRE", "NEW JERSEY", "NEW MEXICO", "NEW YORK", "NORTH CAROLINA",
+    "NORTH DAKOTA", "OHIO", "OKLAHOMA", "OREGON", "PENNSYLVANIA", "RHODE ISLAND", "SOUTH CAROLINA",
+    "SOUTH DAKOTA", "TENNESSEE", "TEXAS", "UTAH", "VERMONT", "VIRGINIA", "WASHINGTON", "WEST VIRGINIA",
+    "WISCONSIN", "WYOMING",
+]
+
+
+def _degree_day_txt(product, rng):
+    """与 CPC wsahddy.txt / wsacddy.txt 同版式的周报 (州 + 分区 + 全国)。"""
+    kind = "HEATING" if product == "HDD" else "COOLING"
+    names = US_STATES + sorted(degree_day_parser.CENSUS_DIVISIONS) + [degree_day_parser.NATIONAL]
+
+    def block(title):
+        lines = [
+            "",
+            f"          {title} STATE, REGIONAL, AND NATIONAL AVERAGES",
+            " STATE            WEEK   DEV   DEV   CUM   DEV   DEV",
+            "                  TOTAL  FROM  FROM  TOTAL FROM  FROM",
+            "                         NORM  L YR        NORM  L YR",
+        ]
+        for n in names:
+            week = int(rng.integers(0, 250))
+            cum = week * 6 + int(rng.integers(0, 200))
+            devs = rng.integers(-60, 60, size=4)
+            lines.append(f" {n:<17}{week:>4}{devs[0]:>6}{devs[1]:>6}{cum:>6}{devs[2]:>6}{devs[3]:>6}")
+        return lines
+
+    lines = [
+        f"                    {kind} DEGREE DAY DATA MONITORING WEEKLY",
+        f"           LAST DATE OF DATA COLLECTION PERIOD IS {SYNTHETIC_DATE.strftime('%b %d, %Y').upper()}",
+    ]
+    lines += block("POPULATION-WEIGHTED")
+    if product == "HDD":
+        lines += block("GAS HOME HEATING CUSTOMER WEIGHTED")
+    return ("\n".join(lines) + "\n").encode()
+
+
+def _eia_json(rng, years=6):
+    """与 EIA wngsr.json 同结构: 各区域每周库存 + 官方 calculated 字段。"""
+    weeks = pd.date_range(end=SYNTHETIC_DATE - timedelta(days=1), periods=years * 52 + 1, freq="W-FRI")
+    regions = {"Total Lower 48": 0, "East Region": 800, "Midwest Region": 950, "Mountain Region": 250,
+               "Pacific Region": 280, "South Central Region": 1100, "Salt": 300, "NonSalt": 800}
+    series = []
+    for name, level in regions.items():
+        seasonal = np.cos(2 * np.pi * np.arange(len(weeks)) / 52.18) * level * 0.35
+        values = (level + seasonal + rng.normal(0, level * 0.01 + 1, len(weeks))).round()
+        series.append({"name": name, "data": [[d.strftime("%Y-%m-%d"), v] for d, v in zip(weeks, values)]})
+    total = np.sum([np.array([v for _, v in s["data"]]) for s in series[1:6]], axis=0)
+    series[0]["data"] = [[d, float(v)] for (d, _), v in zip(series[0]["data"], total)]
+    for s in series:
+        s["data"] = s["data"][::-1]  # 与真实文件一致: 最新一周在前
+        s["calculated"] = {"net_change": s["data"][0][1] - s["data"][1][1]}
+    return json.dumps({
+        "current_week": weeks[-1].strftime("%Y-%m-%d"),
+        "year_ago": weeks[-53].strftime("%Y-%m-%d"),
+        "series": series,
+    }).encode()
+
+
+def _minimal_pdf(pages):
+    """生成只含文本的多页 PDF (pypdf 可提取文字)，pages 为每页的文本行列表。"""
+
+    def esc(s):
+        return s.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+    n = len(pages)
+    font_id = 3 + 2 * n
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [%s] /Count %d >>" % (" ".join(f"{3 + 2 * i} 0 R" for i in range(n)), n),
+    ]
+    for i, lines in enumerate(pages):
+        content = "BT /F1 10 Tf 14 TL 50 760 Td " + " ".join(f"({esc(l)}) Tj T*" for l in lines) + " ET"
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {4 + 2 * i} 0 R "
+                       f"/Resources << /Font << /F1 {font_id} 0 R >> >> >>")
+        objects.append(f"<< /Length {len(content)} >>\nstream\n{content}\nendstream")
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for i, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{i} 0 obj\n{obj}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{o:010d} 00000 n \n" for o in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return out
+
+
+def _enso_pdf():
+    filler = [f"Recent evolution of equatorial Pacific SST departures, panel {i}." for i in range(40)]
+    summary = [
+        "ENSO Alert System Status: La Nina Advisory",
+        "La Nina conditions are present.",
+        "Equatorial sea surface temperatures are below average across the central and east-central Pacific Ocean.",
+        "The tropical atmospheric response is consistent with La Nina.",
+        "La Nina is favored to continue into the Northern Hemisphere winter, with a transition to",
+        "ENSO-neutral most likely in early spring.",
+        "* Note: These statements are updated once a month.",
+    ]
+    return _minimal_pdf([filler, summary, filler, filler])
+
+
+def synthesize(source):
+    rng = np.random.default_rng(SEED + sorted(SOURCES).index(source))
+    if source.startswith("gefs_"):
+        content = _gefs_csv(source.split("_", 1)[1].upper(), rng)
+    elif source in ("hdd", "cdd"):
+        content = _degree_day_txt(source.upper(), rng)
+    elif source == "eia":
+        content = _eia_json(rng)
+    elif source == "enso":
+        content = _enso_pdf()
+    else:
+        raise KeyError(source)
+    os.makedirs(SYNTHETIC_DIR, exist_ok=True)
+    with open(os.path.join(SYNTHETIC_DIR, filename(source)), "wb") as f:
+        f.write(content)
+    return content
+
+
+# ==========================================
+# 3. 历史库倍增 (Scaled Histories)
+# ==========================================
+
+def scale_history(factor, dst_dir, src_dir=ROOT):
+    """
+    把当前历史库复制 factor 份写入 dst_dir: 每一份整体向前平移 (跨度取整周，保持星期几不变)，
+    得到与真实数据同结构、行数为 factor 倍的历史 (同样按月分区写入)。返回 {源: 行数}。
+    """
+    os.makedirs(dst_dir, exist_ok=True)
+    sizes = {}
+    for source in HISTORY_SOURCES:
+        df = history_store.read_history(source, root=os.path.join(src_dir, history_store.HISTORY_ROOT))
+        if df.empty:
+            continue
+        date_cols = [c for c in DATE_COLS if c in df.columns]
+        parsed = {c: pd.to_datetime(df[c], errors="coerce") for c in date_cols}
+
+        span = max((s.max() - s.min() for s in parsed.values() if s.notna().any()), default=pd.Timedelta(0))
+        shift = pd.Timedelta(weeks=math.ceil(span.days / 7) + 1)
+
+        copies = []
+        for k in range(factor - 1, -1, -1):
+            part = df.copy()
+            for c, s in parsed.items():
+                fmt = "%Y-%m-%d %H:%M:%S" if c == "Update_Time" else "%Y-%m-%d"
+                part[c] = (s - shift * k).dt.strftime(fmt).where(s.notna(), df[c])
+            copies.append(part)
+        scaled = pd.concat(copies, ignore_index=True)
+        history_store.replace_history(scaled, source, root=os.path.join(dst_dir, history_store.HISTORY_ROOT))
+        sizes[source] = len(scaled)
+    return sizes
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "record":
+        record(sys.argv[2:] or None)
+    else:
+        for s in SOURCES:
+            synthesize(s)
+        print(json.dumps(describe_fixtures(), indent=2))
@@ -0,0 +1,295 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from datetime import datetime
+
+import numpy as np
+
+import fixtures
+import local_server
+
+import cdd_collector
+import climate_collector
+import hdd_collector
+import hdd_projection
+import storage_collector
+import storage_nowcast
+
+try:
+    import websockets
+    from streamlit.proto.BackMsg_pb2 import BackMsg
+    from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+except ImportError:
+    websockets = None
+
+# ==========================================
+# 看板并发压测 (Concurrent Session Load Test)
+# ==========================================
+# 启动真实的 streamlit 服务，用 N 个 websocket 会话模拟整个交易台同时打开看板:
+#   每个会话在 --window 秒内随机时刻连上 (近似数据更新后 change_watch 让所有会话集中 rerun)，
+#   然后每轮依次: 实时监控 -> 切到历史回溯 (侧边栏 radio) -> 切回实时监控。
+# 注意: st.tabs 的全部标签页在服务端每次 rerun 都会渲染，切换标签只发生在浏览器端，
+#       所以 "打开标签页" 的服务端成本已包含在每次 rerun 里。
+#
+# 用法 (在仓库根目录):
+#   python benchmarks/load_test.py --sessions 1 5 10 25 --rounds 3
+#   python benchmarks/load_test.py --scale 10 --save load_x10
+#
+# 每个会话数都会重启一次服务 (冷缓存 + 干净的内存基线)，输出:
+#   rerun 延迟 p50 / p95 / p99、服务进程峰值 RSS、CPU 时间与平均占用。
+
+DASHBOARD = os.path.join(fixtures.ROOT, "dashboard.py")
+RESULT_DIR = os.path.join(fixtures.ROOT, "benchmarks", "baselines")
+DEFAULT_SESSIONS = [1, 5, 10, 25]
+VIEWS = ["🚀 实时监控", "📅 历史回溯"]
+RERUN_TIMEOUT = 120
+SAMPLE_INTERVAL = 0.1
+
+
+# ==========================================
+# 1. 准备数据与服务 (Setup)
+# ==========================================
+
+def prepare_workdir(scale, workdir, urls):
+    """倍增历史库并把全部采集器跑一遍，使看板每个板块都有数据。"""
+    fixtures.scale_history(scale, workdir)
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        with local_server.collectors_pointed_at(urls), contextlib.redirect_stdout(io.StringIO()):
+            for module in [climate_collector, hdd_collector, cdd_collector, storage_collector,
+                           storage_nowcast, hdd_projection]:
+                module.run_collector()
+    finally:
+        os.chdir(cwd)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(workdir, enso_url):
+    port = free_port()
+    env = dict(os.environ, ENSO_PDF_URL=enso_url)
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", DASHBOARD,
+         "--server.headless", "true", "--server.port", str(port),
+         "--server.fileWatcherType", "none", "--browser.gatherUsageStats", "false",
+         "--logger.level", "error"],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    for _ in range(120):
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1)
+            return proc, port
+        except Exception:
+            if proc.poll() is not None:
+                break
+            time.sleep(0.5)
+    proc.kill()
+    raise RuntimeError("streamlit 服务启动失败")
+
+
+class ProcessSampler(threading.Thread):
+    """周期读取 /proc/<pid> 的 RSS 与 CPU 时间 (仅 Linux；其他平台返回 None)。"""
+
+    def __init__(self, pid):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.peak_rss_mb = None
+        self._halt = threading.Event()
+        self._tick = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+    def rss_mb(self):
+        try:
+            with open(f"/proc/{self.pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) / 1024
+        except OSError:
+            return None
+
+    def cpu_seconds(self):
+        try:
+            with open(f"/proc/{self.pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            return (int(fields[11]) + int(fields[12])) / self._tick  # utime + stime
+        except (OSError, IndexError):
+            return None
+
+    def run(self):
+        while not self._halt.is_set():
+            rss = self.rss_mb()
+            if rss is not None:
+                self.peak_rss_mb = max(self.peak_rss_mb or 0, rss)
+            self._halt.wait(SAMPLE_INTERVAL)
+
+    def stop(self):
+        self._halt.set()
+        self.join()
+
+
+# ==========================================
+# 2. 模拟会话 (Sessions)
+# ==========================================
+
+async def rerun(ws, widget_id=None, view=None):
+    """发送一次 rerun 并等待 script_finished。返回 (耗时 ms, 异常数, 视图 radio 的 widget id)。"""
+    msg = BackMsg()
+    msg.rerun_script.page_script_hash = ""
+    if widget_id is not None:
+        state = msg.rerun_script.widget_states.widgets.add()
+        state.id = widget_id
+        state.string_value = view
+
+    t = time.perf_counter()
+    await ws.send(msg.SerializeToString())
+    errors, radio_id = 0, widget_id
+    while True:
+        fwd = ForwardMsg()
+        fwd.ParseFromString(await asyncio.wait_for(ws.recv(), RERUN_TIMEOUT))
+        kind = fwd.WhichOneof("type")
+        if kind == "delta" and fwd.delta.WhichOneof("type") == "new_element":
+            element = fwd.delta.new_element
+            etype = element.WhichOneof("type")
+            if etype == "exception":
+                errors += 1
+            elif etype == "radio" and radio_id is None and list(element.radio.options) == VIEWS:
+                radio_id = element.radio.id
+        elif kind == "script_finished":
+            return (time.perf_counter() - t) * 1000, errors, radio_id
+
+
+async def session(port, rounds, delay, samples):
+    await asyncio.sleep(delay)
+    async with websockets.connect(f"ws://127.0.0.1:{port}/_stcore/stream", max_size=None) as ws:
+        ms, errors, radio_id = await rerun(ws)
+        samples.append(("realtime", ms, errors))
+        for _ in range(rounds):
+            for label, view in [("history", VIEWS[1]), ("realtime", VIEWS[0])]:
+                if radio_id is None:
+                    samples.append((label, None, 1))
+                    continue
+                ms, errors, _ = await rerun(ws, radio_id, view)
+                samples.append((label, ms, errors))
+
+
+async def drive(port, n_sessions, rounds, window, rng):
+    samples = []
+    results = await asyncio.gather(
+        *[session(port, rounds, rng.uniform(0, window), samples) for _ in range(n_sessions)],
+        return_exceptions=True,
+    )
+    failed = sum(isinstance(r, Exception) for r in results)
+    return samples, failed
+
+
+def summarize(samples, failed, n_sessions, wall, sampler, cpu0, cpu1):
+    latencies = np.array([ms for _, ms, _ in samples if ms is not None])
+
+    def pct(q):
+        return round(float(np.percentile(latencies, q)), 1) if len(latencies) else None
+
+    by_view = {}
+    for label in ["realtime", "history"]:
+        values = [ms for l, ms, _ in samples if l == label and ms is not None]
+        by_view[label] = round(float(np.median(values)), 1) if values else None
+
+    cpu = None if cpu0 is None or cpu1 is None else round(cpu1 - cpu0, 2)
+    return {
+        "sessions": n_sessions,
+        "reruns": int(len(latencies)),
+        "p50_ms": pct(50),
+        "p95_ms": pct(95),
+        "p99_ms": pct(99),
+        "max_ms": round(float(latencies.max()), 1) if len(latencies) else None,
+        "median_by_view_ms": by_view,
+        "errors": int(sum(e for _, _, e in samples)) + failed,
+        "failed_sessions": failed,
+        "wall_s": round(wall, 2),
+        "peak_rss_mb": None if sampler.peak_rss_mb is None else round(sampler.peak_rss_mb, 1),
+        "cpu_s": cpu,
+        "cpu_s_per_session": None if cpu is None else round(cpu / n_sessions, 3),
+        "cpu_util_pct": None if cpu is None else round(cpu / wall * 100, 1),
+    }
+
+
+def run_level(workdir, enso_url, n_sessions, rounds, window, seed):
+    proc, port = start_server(workdir, enso_url)
+    sampler = ProcessSampler(proc.pid)
+    sampler.start()
+    try:
+        cpu0 = sampler.cpu_seconds()
+        t = time.perf_counter()
+        samples, failed = asyncio.run(drive(port, n_sessions, rounds, window, random.Random(seed)))
+        wall = time.perf_counter() - t
+        cpu1 = sampler.cpu_seconds()
+    finally:
+        sampler.stop()
+        proc.terminate()
+        proc.wait(timeout=30)
+    return summarize(samples, failed, n_sessions, wall, sampler, cpu0, cpu1)
+
+
+# ==========================================
+# 3. 主流程 (Main)
+# ==========================================
+
+def main():
+    parser = argparse.ArgumentParser(description="看板并发会话压测")
+    parser.add_argument("--sessions", type=int, nargs="+", default=DEFAULT_SESSIONS)
+    parser.add_argument("--rounds", type=int, default=3, help="每个会话的 历史/实时 切换轮数")
+    parser.add_argument("--window", type=float, default=5.0, help="会话接入的随机时间窗 (秒)")
+    parser.add_argument("--scale", type=int, default=1, help="历史库倍数 (同 run_benchmarks.py)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", metavar="NAME", help="保存结果到 benchmarks/baselines/NAME.json")
+    args = parser.parse_args()
+
+    if websockets is None:
+        print("❌ 需要 websockets 包 (pip install websockets)")
+        sys.exit(1)
+
+    print(f"🚀 [Load Test] 启动: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} | 历史库 x{args.scale}")
+    workdir = tempfile.mkdtemp(prefix=f"loadtest_x{args.scale}_")
+    levels = []
+    try:
+        with local_server.serve() as urls:
+            prepare_workdir(args.scale, workdir, urls)
+            print(f"{'sessions':>8}{'reruns':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'RSS MB':>9}{'CPU s':>8}{'CPU %':>8}{'err':>5}")
+            for n in args.sessions:
+                r = run_level(workdir, urls["enso"], n, args.rounds, args.window, args.seed + n)
+                levels.append(r)
+                print(f"{n:>8}{r['reruns']:>8}{r['p50_ms'] or 0:>9.1f}{r['p95_ms'] or 0:>9.1f}{r['p99_ms'] or 0:>9.1f}"
+                      f"{r['peak_rss_mb'] or 0:>9.1f}{r['cpu_s'] or 0:>8.2f}{r['cpu_util_pct'] or 0:>8.1f}{r['errors']:>5}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.save:
+        os.makedirs(RESULT_DIR, exist_ok=True)
+        path = os.path.join(RESULT_DIR, f"{args.save}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({
+                "created": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "scale": args.scale, "rounds": args.rounds, "window_s": args.window,
+                "fixtures": fixtures.describe_fixtures(),
+                "levels": levels,
+            }, f, indent=2, ensure_ascii=False)
+        print(f"✅ 结果已保存: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import os
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import fixtures
+
+import cdd_collector
+import climate_collector
+import hdd_collector
+import storage_collector
+
+# ==========================================
+# 本地 HTTP 替身 (Local Source Server)
+# ==========================================
+# 在 127.0.0.1 的随机端口上提供全部 fixture，并把各采集器的 URL 临时指向本地，
+# 这样基准测试走的是真实的 requests 下载 + 解析 + 入库路径，只是不依赖外网。
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@contextmanager
+def serve():
+    """启动本地服务，返回 {数据源: 本地 URL}；退出时关闭服务。"""
+    root = tempfile.mkdtemp(prefix="bench_sources_")
+    for source in fixtures.SOURCES:
+        shutil.copy(fixtures.fixture_path(source), os.path.join(root, fixtures.filename(source)))
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(_QuietHandler, directory=root))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        yield {source: f"{base}/{fixtures.filename(source)}" for source in fixtures.SOURCES}
+    finally:
+        server.shutdown()
+        server.server_close()
+        shutil.rmtree(root, ignore_errors=True)
+
+
+@contextmanager
+def collectors_pointed_at(urls):
+    """临时把各采集器 SOURCE 的数据源 URL 换成本地地址，退出时恢复。"""
+    local = {
+        climate_collector.SOURCE: {"AO": urls["gefs_ao"], "NAO": urls["gefs_nao"], "PNA": urls["gefs_pna"]},
+        hdd_collector.SOURCE: {"HDD": urls["hdd"]},
+        cdd_collector.SOURCE: {"CDD": urls["cdd"]},
+        storage_collector.SOURCE: {"EIA": urls["eia"]},
+    }
+    saved = {source: source.urls for source in local}
+    for source, mapping in local.items():
+        source.urls = mapping
+    try:
+        yield
+    finally:
+        for source, mapping in saved.items():
+            source.urls = mapping
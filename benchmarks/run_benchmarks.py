@@ -0,0 +1,174 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import fixtures
+import local_server
+
+import pandas as pd
+import cdd_collector
+import climate_collector
+import cross_correlation
+import data_loader
+import hdd_collector
+import hdd_projection
+import history_store
+import snapshots
+import storage_collector
+import storage_nowcast
+
+# ==========================================
+# 离线基准测试 (Offline Benchmarks)
+# ==========================================
+# 用法 (在仓库根目录):
+#   python benchmarks/run_benchmarks.py                        # 1x / 10x / 100x 全部跑一遍
+#   python benchmarks/run_benchmarks.py --save baseline        # 保存为 benchmarks/baselines/baseline.json
+#   python benchmarks/run_benchmarks.py --compare baseline     # 与基线比较，出现回归时退出码为 1
+#
+# 每个倍数在独立的临时工作目录中运行 (采集器按相对路径读写 history/ 分区)，
+# 数据源由 local_server 从本地 fixture 提供，仓库里的历史库不会被改动。
+
+BASELINE_DIR = os.path.join(fixtures.ROOT, "benchmarks", "baselines")
+DEFAULT_SCALES = [1, 10, 100]
+DEFAULT_REPEAT = 5
+DEFAULT_TOLERANCE = 0.25  # 中位数变慢超过 25% 视为回归
+MIN_DELTA_MS = 5.0  # 且绝对差值超过 5ms (过滤极短任务的计时噪声)
+
+
+def benchmark_cases(urls):
+    """基准项: 名称 -> 无参函数。采集器按 workflow 中的顺序排列 (后面的依赖前面的输出)。"""
+    return {
+        "collector:climate": climate_collector.run_collector,
+        "collector:hdd": hdd_collector.run_collector,
+        "collector:cdd": cdd_collector.run_collector,
+        "collector:storage": storage_collector.run_collector,
+        "collector:nowcast": storage_nowcast.run_collector,
+        "collector:projection": hdd_projection.run_collector,
+        "loader:load_degree_days": lambda: data_loader.load_degree_days("HDD"),
+        "loader:load_eia_total": data_loader.load_eia_total,
+        "loader:load_scenarios": data_loader.load_scenarios,
+        "loader:fetch_enso_summary": lambda: data_loader.fetch_enso_summary(urls["enso"]),
+        "loader:history_csv": lambda: history_store.read_history(data_loader.STORAGE_SOURCE),
+        "loader:history_snapshot": lambda: snapshots.load(data_loader.STORAGE_SOURCE),
+        "view:eia_history": lambda: data_loader.build_eia_history_view(
+            history_store.read_history(data_loader.STORAGE_SOURCE)),
+        "analysis:cross_correlation": lambda: cross_correlation.correlate_all(cross_correlation.load_series(), 60),
+    }
+
+
+def time_case(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            func()
+        samples.append((time.perf_counter() - t) * 1000)
+    return {
+        "median_ms": round(statistics.median(samples), 3),
+        "min_ms": round(min(samples), 3),
+        "max_ms": round(max(samples), 3),
+        "repeat": repeat,
+    }
+
+
+def run_scale(factor, urls, repeat):
+    workdir = tempfile.mkdtemp(prefix=f"bench_x{factor}_")
+    cwd = os.getcwd()
+    try:
+        rows = fixtures.scale_history(factor, workdir)
+        os.chdir(workdir)
+        results = {}
+        for name, func in benchmark_cases(urls).items():
+            results[name] = time_case(func, repeat)
+            print(f"   x{factor:<4} {name:<28} {results[name]['median_ms']:>10.1f} ms")
+        return {"history_rows": rows, "cases": results}
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=fixtures.ROOT,
+                                capture_output=True, text=True).stdout.strip()
+    except Exception:
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "commit": commit,
+    }
+
+
+def compare(current, baseline, tolerance):
+    """逐项比较中位数，返回回归列表。"""
+    if current["fixtures"] != baseline.get("fixtures"):
+        print("⚠️ fixture 与基线不一致 (录制/合成数据不同)，比较结果仅供参考。")
+
+    regressions = []
+    print(f"\n{'scale':<7}{'case':<30}{'base ms':>10}{'now ms':>10}{'ratio':>8}")
+    for scale, result in current["scales"].items():
+        base_cases = baseline.get("scales", {}).get(scale, {}).get("cases", {})
+        for name, stats in result["cases"].items():
+            if name not in base_cases:
+                continue
+            base, now = base_cases[name]["median_ms"], stats["median_ms"]
+            ratio = now / base if base else float("inf")
+            flag = ""
+            if ratio > 1 + tolerance and now - base > MIN_DELTA_MS:
+                regressions.append((scale, name, base, now))
+                flag = "  ❌"
+            print(f"x{scale:<6}{name:<30}{base:>10.1f}{now:>10.1f}{ratio:>8.2f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="离线基准测试 (采集器 + 看板加载)")
+    parser.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES)
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--save", metavar="NAME", help="保存结果到 benchmarks/baselines/NAME.json")
+    parser.add_argument("--compare", metavar="NAME", help="与 benchmarks/baselines/NAME.json 比较")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+
+    print(f"🚀 [Benchmarks] 启动: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    current = {
+        "created": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "environment": environment(),
+        "fixtures": fixtures.describe_fixtures(),
+        "scales": {},
+    }
+    with local_server.serve() as urls, local_server.collectors_pointed_at(urls):
+        for factor in args.scales:
+            current["scales"][str(factor)] = run_scale(factor, urls, args.repeat)
+
+    if args.save:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        path = os.path.join(BASELINE_DIR, f"{args.save}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2, ensure_ascii=False)
+        print(f"✅ 结果已保存: {path}")
+
+    if args.compare:
+        with open(os.path.join(BASELINE_DIR, f"{args.compare}.json"), encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.tolerance)
+        if regressions:
+            print(f"\n❌ 发现 {len(regressions)} 项性能回归 (容差 {args.tolerance:.0%})")
+            sys.exit(1)
+        print("\n✅ 未发现性能回归")
+
+
+if __name__ == "__main__":
+    main()
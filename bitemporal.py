@@ -0,0 +1,93 @@
+import pandas as pd
+import history_store
+import schemas
+
+# ==========================================
+# 双时态回看 (As-of / Time Travel)
+# ==========================================
+# 回答 "某个时刻看板上显示的是什么": 每一行有两个时间
+#   有效时间 = 主键日期 (Date / Run_Date ...)
+#   入库时间 = Update_Time (模式中没有该列的源按主键日期当天结束视为入库)
+# 当前分区只保留每个主键的最新版本，被覆盖的旧版本在 history/_superseded/<source>/ (见 history_store)。
+#
+# 时刻 T 的视图，逐个主键取 T 时有效的版本:
+#   1. 存档中 入库时间 <= T < Superseded_At 的版本 (同一主键取最早被覆盖的那个)
+#   2. 否则当前分区中 入库时间 <= T 的版本
+#   3. 都没有 = T 时尚未入库
+# 查找都走索引: 当前分区按主键月份裁剪到 <= T，存档只打开 index.json 中
+# 在 T 之后仍有覆盖的月份 (通常只有最近一两个月)，不扫描全部历史。
+
+INGEST_COLUMN = "Update_Time"
+
+
+def _timestamp(as_of):
+    return None if as_of is None else pd.Timestamp(as_of)
+
+
+def ingested_at(df, source):
+    """每行的入库时间。"""
+    if INGEST_COLUMN in schemas.columns(source) and INGEST_COLUMN in df.columns:
+        known = pd.to_datetime(df[INGEST_COLUMN], errors="coerce")
+    else:
+        known = pd.Series(pd.NaT, index=df.index, dtype="datetime64[ns]")
+    key = history_store.SOURCES[source]["key"]
+    # 缺入库时间的行 (旧数据 / 没有该列的源) 视为主键日期当天结束时入库
+    fallback = pd.to_datetime(df[key], errors="coerce").dt.normalize() + pd.Timedelta(days=1) - pd.Timedelta(seconds=1)
+    return known.fillna(fallback)
+
+
+def _superseded_months(source, as_of, months, root):
+    """存档中在 as_of 之后仍有覆盖的月份 (只有这些月份可能需要旧版本)。"""
+    index = history_store.superseded_index(source, root)
+    return [m for m in months if m in index and pd.Timestamp(index[m]) > as_of]
+
+
+def _resolve(current, source, as_of, root):
+    """给定主键范围内的当前行，返回 as_of 时刻有效的行 (按主键升序)。"""
+    key = history_store.SOURCES[source]["key"]
+    keys = current[key].dt.strftime("%Y-%m-%d")
+    live = current[(ingested_at(current, source) <= as_of).to_numpy()]
+
+    months = _superseded_months(source, as_of, sorted(set(keys.str[:7])), root)
+    archived = history_store.read_superseded(source, months, root) if months else pd.DataFrame()
+    if not archived.empty:
+        valid = ((ingested_at(archived, source) <= as_of) & (archived[history_store.SUPERSEDED_COLUMN] > as_of)
+                 & archived[key].isin(current[key]))
+        archived = archived[valid.to_numpy()]
+    if archived.empty:
+        return live.reset_index(drop=True)
+
+    # 同一主键在 as_of 之后被覆盖过: 取最早被覆盖的版本 (即 as_of 时正在显示的那版)，替换当前行
+    first = archived.groupby(key)[history_store.SUPERSEDED_COLUMN].transform("min")
+    archived = archived[(archived[history_store.SUPERSEDED_COLUMN] == first).to_numpy()]
+    live = live[~live[key].isin(archived[key]).to_numpy()]
+    out = pd.concat([live, archived.drop(columns=[history_store.SUPERSEDED_COLUMN])], ignore_index=True)
+    return schemas.conform(out.sort_values(key, kind="stable", ignore_index=True), source)
+
+
+def read_as_of(source, as_of=None, start=None, root=history_store.HISTORY_ROOT):
+    """源在 as_of 时刻的完整视图 (主键 >= start)；as_of 为 None 时即当前历史。"""
+    as_of = _timestamp(as_of)
+    if as_of is None:
+        return history_store.read_history(source, start=start, root=root)
+    current = history_store.read_history(source, start=start, end=as_of, root=root)
+    if current.empty:
+        return current
+    return _resolve(current, source, as_of, root)
+
+
+def read_latest(source, as_of=None, root=history_store.HISTORY_ROOT):
+    """
+    as_of 时刻最新一个非空月份的行 (侧边栏等只看最新几行的场景，对应 history_store.read_latest)。
+    从 as_of 所在月份往前逐月查找，通常只读一个分区。
+    """
+    as_of = _timestamp(as_of)
+    if as_of is None:
+        return history_store.read_latest(source, root=root)
+    months = [m for m, _ in history_store.list_partitions(source, root) if m <= as_of.strftime("%Y-%m")]
+    for month in reversed(months):
+        start = pd.Timestamp(f"{month}-01")
+        df = read_as_of(source, as_of, start=start, root=root)
+        if not df.empty:
+            return df
+    return pd.DataFrame()
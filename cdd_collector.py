@@ -0,0 +1,70 @@
+import degree_day_parser
+import collector_metrics
+import source_engine
+
+# ==========================================
+# 1. 配置区域 (Configuration)
+# ==========================================
+
+HISTORY_SOURCE = "cdd"  # history/cdd/<YYYY-MM>.csv
+URL_CDD = degree_day_parser.LAYOUTS["CDD"]["url"]
+FETCH_BUDGET_S = 120  # 本次运行全部下载 (含重试 / 对冲) 的总预算
+
+# 地区映射表 (夏季发电用气主力区域; CDD 只有人口加权口径)
+TARGET_REGIONS = {
+    "SOUTH ATLANTIC": "SA",
+    "W S CENTRAL": "WSC",
+    "E N CENTRAL": "MW",
+    "UNITED STATES": "US"
+}
+
+
+# ==========================================
+# 2. 功能函数 (Functions)
+# ==========================================
+
+def parse_cdd_report(payloads, ctx):
+    """NOAA 周报 -> 一行 (各目标地区的 Actual / Dev_Norm / Dev_Year / Seas_Total)。"""
+    report = payloads["CDD"]
+    if report is None:
+        return None
+
+    rows, source_date = degree_day_parser.parse_report(source_engine.decode(report), "CDD")
+    collector_metrics.add("rows_parsed", len(rows))
+    print(f"   📅 识别到数据截止日期 (Source Date): {source_date}")
+    print(f"   🗂️ 解析行数: {len(rows)}")
+
+    data_bag = degree_day_parser.select_regions(rows, "POP", TARGET_REGIONS)
+    if not data_bag:
+        return None
+
+    new_row = {'Source_Date': source_date}  # Run_Date / Update_Time 由引擎补上
+    for prefix, values in data_bag.items():
+        new_row[f"{prefix}_Actual"] = values['Actual']
+        new_row[f"{prefix}_Dev_Norm"] = values['Dev_Norm']
+        new_row[f"{prefix}_Dev_Year"] = values['Dev_Year']
+        new_row[f"{prefix}_Seas_Total"] = values['Seas_Total']
+
+    print("   📊 抓取样本 (US Total):")
+    print(f"      - Actual: {new_row.get('US_Actual')}")
+    print(f"      - Source Date: {new_row.get('Source_Date')}")
+    return new_row
+
+
+# ==========================================
+# 3. 数据源声明 (Source)
+# ==========================================
+
+# 按 Run_Date 写入按月分区的历史库 (今天跑过则覆盖今天的记录)；
+# 同一期周报 (Source_Date) 已入库过即记为缓存命中
+SOURCE = source_engine.Source(
+    "cdd", HISTORY_SOURCE, {"CDD": URL_CDD}, parse_cdd_report,
+    dedupe="Source_Date", timeout=30, budget=FETCH_BUDGET_S)
+
+
+def run_collector():
+    return source_engine.run(SOURCE)
+
+
+if __name__ == "__main__":
+    run_collector()
@@ -0,0 +1,76 @@
+import streamlit as st
+import os
+import threading
+import time
+import history_store
+
+# ==========================================
+# 数据变更推送 (Change-driven Refresh)
+# ==========================================
+# 取代每小时一次的 st_autorefresh (不管数据有没有变，所有会话都整页重跑):
+#   1. 每次整页运行时，页面读到的文件 / 分区目录经 watch() 登记，并记下当时的 history_store.stamp
+#   2. 脚本结尾 start() 挂一个 st.fragment(run_every=POLL_SECONDS) 的隐形片段，
+#      片段只重跑自身: 比较已登记路径的当前 stamp，有变化才 st.rerun() 整页刷新
+# 因此只有 "正在看的数据" 变了的会话才会重跑；空闲时每次检查只是几次 os.stat。
+# 同一进程内的会话共享 stamp 结果 (STAMP_TTL 秒内不重复 stat)。
+#
+# 旧版 streamlit (没有 st.fragment) 回退到原来的定时整页刷新。
+# 轮询间隔可用环境变量 CHANGE_POLL_SECONDS 调整。
+
+POLL_SECONDS = float(os.environ.get("CHANGE_POLL_SECONDS", "10"))
+STAMP_TTL = POLL_SECONDS / 2
+FALLBACK_REFRESH_MS = 3600000  # 无 st.fragment 时的整页刷新间隔 (1 小时)
+WATCH_KEY = "_change_watch"
+
+_stamps = {}
+_stamps_lock = threading.Lock()
+
+
+def current_stamp(path):
+    """history_store.stamp(path)，进程内短时缓存 (所有会话的轮询共用一次 stat)。"""
+    with _stamps_lock:
+        cached = _stamps.get(path)
+        if cached is not None and time.monotonic() - cached[0] < STAMP_TTL:
+            return cached[1]
+    return _refresh(path)
+
+
+def _refresh(path):
+    value = history_store.stamp(path)
+    with _stamps_lock:
+        _stamps[path] = (time.monotonic(), value)
+    return value
+
+
+def begin():
+    """整页运行开始: 清空本会话的登记 (本次运行没读到的数据不再触发刷新)。"""
+    st.session_state[WATCH_KEY] = {}
+
+
+def watch(path):
+    """登记页面依赖的文件或分区目录，返回其当前 stamp (可直接作为缓存键)。"""
+    value = _refresh(path)  # 同时刷新共享缓存，避免轮询拿旧值误判为变化
+    st.session_state.setdefault(WATCH_KEY, {})[path] = value
+    return value
+
+
+def changed():
+    """本会话登记过的路径中 stamp 已变化的那些。"""
+    watched = st.session_state.get(WATCH_KEY, {})
+    return [path for path, value in watched.items() if current_stamp(path) != value]
+
+
+def start():
+    """脚本结尾调用: 挂上变更检查片段 (不渲染任何内容)。"""
+    if hasattr(st, "fragment"):
+        _watcher()
+    else:
+        from streamlit_autorefresh import st_autorefresh
+        st_autorefresh(interval=FALLBACK_REFRESH_MS, key="data_refresh_key")
+
+
+if hasattr(st, "fragment"):
+    @st.fragment(run_every=POLL_SECONDS)
+    def _watcher():
+        if changed():
+            st.rerun()
@@ -1,9 +1,15 @@
 import pandas as pd
-from datetime import datetime
-import os
+import io
+import ensemble_scenarios
+import forecast_revisions
+import collector_metrics
+import history_store
+import source_engine
 
 # === 配置区域 ===
-HISTORY_FILE = "history_weather.csv"
+HISTORY_SOURCE = "weather"  # history/weather/<YYYY-MM>.csv
+TRAJECTORY_FILE = "forecast_trajectory.csv"  # 最新一次运行的全部 lead 集合平均 (供 HDD 投影使用)
+FETCH_BUDGET_S = 240  # 三个指数下载 (含重试 / 对冲) 共用的总预算
 
 # 数据源字典 (全部使用 GEFS 集合预报源)
 DATA_SOURCES = {
@@ -13,108 +19,142 @@ DATA_SOURCES = {
 }
 
 
-def fetch_index_data(name, url):
+def read_index_frame(payload):
+    """GEFS CSV (每个起报日 x 成员 x lead 一行，覆盖最近 120 天) -> DataFrame。"""
+    df = pd.read_csv(io.BytesIO(payload))
+    df['time'] = pd.to_datetime(df['time'])
+    return df
+
+
+def index_on_date(df, name, date):
     """
-    通用抓取函数：传入指标名称和 URL
-    返回：该指标当天的 {Obs, Day7, Day10, Day14}
+    某个起报日的集合平均与成员轨迹。
+    返回：{Obs, Day7, Day10, Day14}、全部 lead 的集合平均轨迹及各成员轨迹；该日不在 CSV 中时为 None
     """
-    print(f"   -> 正在下载 {name} 数据 (GEFS)...")
-    try:
-        df = pd.read_csv(url)
-        df['time'] = pd.to_datetime(df['time'])
+    day_df = df[df['time'] == date]
+    if day_df.empty:
+        return None
+
+    # 计算所有成员的平均值 (Ensemble Mean)
+    col_name = f"{name.lower()}_index"
+    daily_means = day_df.groupby('lead')[col_name].mean()
+
+    # 保留各成员的轨迹 (成员 x lead)，供情景聚类使用
+    member_cols = [c for c in day_df.columns if c not in ('time', 'lead', col_name)]
+    members = None
+    if member_cols:
+        members = day_df.pivot_table(index=member_cols[0], columns='lead', values=col_name)
+
+    return {
+        "date": date,
+        "obs": daily_means.get(0),  # 历史观测
+        "d7": daily_means.get(7),  # 短期预测
+        "d10": daily_means.get(10),  # [新增] 中期预测
+        "d14": daily_means.get(14),  # 长期预测
+        "trajectory": daily_means,  # 全部 lead
+        "members": members  # 各成员轨迹
+    }
 
-        # 1. 锁定最新日期
-        latest_date = df['time'].max()
 
-        # 2. 提取今日数据
-        today_df = df[df['time'] == latest_date]
+def parse_index_data(name, payload):
+    """
+    解析单个指标的 GEFS CSV
+    返回：该指标最新一天的 index_on_date 结果
+    """
+    try:
+        df = read_index_frame(payload)
+        collector_metrics.add("rows_parsed", len(df))
 
-        if today_df.empty:
+        # 锁定最新日期
+        data = index_on_date(df, name, df['time'].max())
+        if data is None:
             print(f"      ⚠️ 警告: {name} 今日数据尚未生成")
-            return None
-
-        # 3. 计算所有成员的平均值 (Ensemble Mean)
-        col_name = f"{name.lower()}_index"
-        daily_means = today_df.groupby('lead')[col_name].mean()
-
-        return {
-            "date": latest_date,
-            "obs": daily_means.get(0),  # 历史观测
-            "d7": daily_means.get(7),  # 短期预测
-            "d10": daily_means.get(10),  # [新增] 中期预测
-            "d14": daily_means.get(14)  # 长期预测
-        }
+        return data
     except Exception as e:
-        print(f"❌ {name} 下载失败: {e}")
+        print(f"❌ {name} 解析失败: {e}")
         return None
 
 
-def run_collector():
-    print(f"🚀 [Climate Collector] 启动任务: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+def weather_row(results, target_date):
+    """各指标结果 -> weather 历史的一行 (Update_Time 由调用方补上)。日期不一致 / 缺失的指标为空值。"""
+    row = {'Date': target_date.strftime('%Y-%m-%d')}
+    for name in ["AO", "NAO", "PNA"]:
+        data = results.get(name)
+        ok = data is not None and data['date'] == target_date
+        for suffix, field in (('_Obs', 'obs'), ('_Day7', 'd7'), ('_Day10', 'd10'), ('_Day14', 'd14')):
+            row[f'{name}{suffix}'] = round(data[field], 4) if ok else None
+    return row
 
+
+def parse_climate(payloads, ctx):
+    """三个指标 -> 一行 (以第一个成功指标的日期入库)。完整结果留在 ctx 里给 after_store 用。"""
     results = {}
     target_date = None
 
-    # 1. 分别抓取 AO, NAO, PNA
-    for index_name, url in DATA_SOURCES.items():
-        data = fetch_index_data(index_name, url)
+    # 1. 分别解析 AO, NAO, PNA (下载已由引擎并发完成)
+    for index_name, payload in payloads.items():
+        data = parse_index_data(index_name, payload) if payload is not None else None
         if data:
             results[index_name] = data
             if target_date is None:
                 target_date = data['date']
 
     if not results:
-        print("❌ 所有数据源均下载失败，任务终止。")
-        return
+        return None
 
-    # 2. 构造数据行
+    # 2. 构造数据行 (Obs, Day7, Day10, Day14)
     date_str = target_date.strftime('%Y-%m-%d')
     print(f"   📅 锁定入库日期: {date_str}")
+    ctx.update(results=results, target_date=target_date, date_str=date_str)
 
-    new_row = {
-        'Date': date_str,
-        'Update_Time': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    }
-
-    # 动态填充数据 (Obs, Day7, Day10, Day14)
+    new_row = weather_row(results, target_date)  # Update_Time 由引擎补上
     for name in ["AO", "NAO", "PNA"]:
         data = results.get(name)
         if data and data['date'] == target_date:
-            new_row[f'{name}_Obs'] = round(data['obs'], 4)
-            new_row[f'{name}_Day7'] = round(data['d7'], 4)
-            new_row[f'{name}_Day10'] = round(data['d10'], 4)  # [新增]
-            new_row[f'{name}_Day14'] = round(data['d14'], 4)
-
             print(
                 f"      ✅ {name:<3} | Obs:{new_row[f'{name}_Obs']:>6} | D7:{new_row[f'{name}_Day7']:>6} | D10:{new_row[f'{name}_Day10']:>6} | D14:{new_row[f'{name}_Day14']:>6}")
         else:
             print(f"      ⚠️ {name} 数据缺失")
-            for suffix in ['_Obs', '_Day7', '_Day10', '_Day14']:
-                new_row[f'{name}{suffix}'] = None
-
-    # 3. 存入 CSV
-    if os.path.exists(HISTORY_FILE):
-        history_df = pd.read_csv(HISTORY_FILE)
-        # 覆盖今日旧数据
-        if new_row['Date'] in history_df['Date'].astype(str).values:
-            print("   🔄 覆盖今日旧数据...")
-            history_df = history_df[history_df['Date'] != new_row['Date']]
-
-        new_df = pd.DataFrame([new_row])
-        history_df = pd.concat([history_df, new_df], ignore_index=True)
-    else:
-        print(f"   ✨ 初始化数据库: {HISTORY_FILE}")
-        history_df = pd.DataFrame([new_row])
-
-    # 排序并调整列顺序
-    history_df = history_df.sort_values(by='Date')
-
-    # 智能调整列顺序: Date在前, Update_Time在后, 其他中间
-    cols = ['Date'] + [c for c in history_df.columns if c not in ['Date', 'Update_Time']] + ['Update_Time']
-    history_df = history_df[cols]
-
-    history_df.to_csv(HISTORY_FILE, index=False)
-    print(f"✅ [成功] 数据库已更新: {HISTORY_FILE}")
+    return new_row
+
+
+def save_forecast_outputs(ctx):
+    """入库后: 保存今日完整预报轨迹，按目标日追踪预报修正，并做集合成员情景聚类。"""
+    results, target_date, date_str = ctx['results'], ctx['target_date'], ctx['date_str']
+
+    # 1. 保存今日完整预报轨迹 (只保留最新一次)
+    means = pd.DataFrame({
+        name: data['trajectory'] for name, data in results.items() if data['date'] == target_date
+    })
+    means.index.name = 'Lead'
+    trajectory = means.round(4).reset_index()
+    trajectory.insert(0, 'Date', date_str)
+    history_store.write_csv(trajectory, TRAJECTORY_FILE)
+    print(f"   🛰️ 预报轨迹已保存: {TRAJECTORY_FILE} ({len(trajectory)} leads)")
+
+    # 2. 全部 lead 按目标日入库，并与之前几次运行比较 (修正 / 趋势)
+    with collector_metrics.stage("revisions"):
+        forecast_revisions.update(means.round(4), date_str)
+
+    # 3. 集合成员情景聚类 (写入 history/scenarios/)
+    members = {
+        name: data['members'] for name, data in results.items()
+        if data['date'] == target_date and data['members'] is not None
+    }
+    with collector_metrics.stage("scenarios"):
+        ensemble_scenarios.update_archive(members, date_str)
+
+
+# === 数据源声明 ===
+# 按 Date 存入按月分区的历史库 (今日已有则覆盖)；三个指标并发下载
+SOURCE = source_engine.Source(
+    "climate", HISTORY_SOURCE, DATA_SOURCES, parse_climate,
+    after_store=save_forecast_outputs, extra_snapshots=(forecast_revisions.SOURCE,),
+    timeout=60, budget=FETCH_BUDGET_S)
+
+
+def run_collector():
+    return source_engine.run(SOURCE)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,169 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from functools import wraps
+import history_store
+
+# ==========================================
+# 采集任务运行指标 (Collector Metrics)
+# ==========================================
+# 每次 run_collector 记录:
+#   - 各阶段耗时 (download / parse / store ...)
+#   - 计数器: 下载字节数、解析行数、缓存命中/未命中 (源数据是否已在库中)
+# 输出:
+#   - metrics/collector_metrics.jsonl (每次运行一行，便于长期追踪性能回归)
+#   - 可选 Prometheus textfile: 设置环境变量 PROMETHEUS_TEXTFILE_DIR 后写入 <dir>/<collector>.prom
+# 当前运行保存在 ContextVar 中: run_all 并行运行多个采集器时各记各的，
+# 采集器内部的下载线程经 contextvars.copy_context() 继承所属运行。
+
+METRICS_DIR = os.environ.get("COLLECTOR_METRICS_DIR", "metrics")
+METRICS_FILE = "collector_metrics.jsonl"
+PROM_DIR_ENV = "PROMETHEUS_TEXTFILE_DIR"
+
+
+class RunMetrics:
+    def __init__(self, collector):
+        self.collector = collector
+        self.started = datetime.now()
+        self._t0 = time.perf_counter()
+        self.stages = {}
+        self.counters = {}
+        self.status = "ok"
+        self.reason = None
+        self._lock = threading.Lock()  # 同一运行的并发下载线程共用
+
+    @contextmanager
+    def stage(self, name):
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - t
+
+    def add(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def fail(self, reason):
+        self.status = "failed"
+        self.reason = reason
+
+    def to_record(self):
+        return {
+            "collector": self.collector,
+            "started": self.started.strftime("%Y-%m-%d %H:%M:%S"),
+            "duration_s": round(time.perf_counter() - self._t0, 4),
+            "status": self.status,
+            "reason": self.reason,
+            "stages": {k: round(v, 4) for k, v in self.stages.items()},
+            "counters": self.counters,
+        }
+
+
+class _NullMetrics(RunMetrics):
+    """没有处于 run 中时 (例如单独调用 fetch 函数) 的空实现。"""
+
+    def __init__(self):
+        super().__init__("none")
+
+    def add(self, name, value=1):
+        pass
+
+    def fail(self, reason):
+        pass
+
+
+_NULL = _NullMetrics()
+_active = ContextVar("collector_metrics", default=None)
+
+
+def current():
+    return _active.get() or _NULL
+
+
+def stage(name):
+    return current().stage(name)
+
+
+def add(name, value=1):
+    current().add(name, value)
+
+
+def mark_failed(reason):
+    current().fail(reason)
+
+
+def record_cache(hit):
+    """源数据已在库中 = 命中 (本次运行没有带来新数据)。"""
+    add("cache_hit" if hit else "cache_miss")
+
+
+def _write_prometheus(record):
+    prom_dir = os.environ.get(PROM_DIR_ENV)
+    if not prom_dir:
+        return
+    name = record["collector"]
+    lines = [
+        "# TYPE collector_run_duration_seconds gauge",
+        f'collector_run_duration_seconds{{collector="{name}"}} {record["duration_s"]}',
+        "# TYPE collector_run_success gauge",
+        f'collector_run_success{{collector="{name}"}} {1 if record["status"] == "ok" else 0}',
+        "# TYPE collector_run_timestamp_seconds gauge",
+        f'collector_run_timestamp_seconds{{collector="{name}"}} {time.time():.0f}',
+        "# TYPE collector_stage_duration_seconds gauge",
+    ]
+    lines += [f'collector_stage_duration_seconds{{collector="{name}",stage="{s}"}} {v}'
+              for s, v in record["stages"].items()]
+    lines.append("# TYPE collector_counter gauge")
+    lines += [f'collector_counter{{collector="{name}",name="{c}"}} {v}'
+              for c, v in record["counters"].items()]
+
+    os.makedirs(prom_dir, exist_ok=True)
+    path = os.path.join(prom_dir, f"{name}.prom")
+    # node_exporter 可能随时读取: 先写临时文件再原子替换
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(path + ".tmp", path)
+
+
+def _flush(metrics):
+    record = metrics.to_record()
+    try:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        path = os.path.join(METRICS_DIR, METRICS_FILE)
+        # 并发运行的采集器共用同一个文件: 追加时持锁，避免行交错
+        with history_store.locked(path), open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        _write_prometheus(record)
+    except Exception as e:
+        print(f"⚠️ 指标写入失败: {e}")
+    stages = " | ".join(f"{k} {v:.2f}s" for k, v in record["stages"].items())
+    print(f"   ⏱️ [{record['collector']}] {record['duration_s']:.2f}s ({record['status']}) {stages}")
+
+
+def instrumented(collector):
+    """装饰 run_collector: 整个运行期间激活一份 RunMetrics，结束后写出。"""
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            metrics = RunMetrics(collector)
+            token = _active.set(metrics)
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                metrics.status = "error"
+                metrics.reason = str(e)
+                raise
+            finally:
+                _active.reset(token)
+                _flush(metrics)
+
+        return wrapper
+
+    return decorator
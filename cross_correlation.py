@@ -0,0 +1,215 @@
+import pandas as pd
+import numpy as np
+import history_store
+import schemas
+
+# ==========================================
+# 滞后互相关 (Lagged Cross-Correlation)
+# ==========================================
+# 回答 "NAO 摆动之后几天新英格兰 HDD 才有反应"、"AO 变化领先库存抽取多少天":
+# 对 SERIES 中每一对序列，计算 -max_lag..+max_lag 天每个滞后上的 Pearson 相关系数。
+#   滞后 k > 0: 第一个序列领先 k 天，即 corr(a[t], b[t + k])
+# 所有序列放在同一个日历日网格上:
+#   日度序列 (遥相关指数) 按日期放置
+#   周度序列 (度日报表 / EIA 库存) 的值代表截至该日期的一周，铺满这 7 天
+# 缺测日不参与计算: 每个滞后只用两边都有值的日期对 (重叠样本数 n 一并返回，少于 MIN_PAIRS 为 NaN)。
+#
+# 计算: 带缺测的相关系数拆成 6 个互相关求和 (n, Σa, Σb, Σab, Σa², Σb²)。
+#   短序列直接用 np.correlate；长序列 (>= FFT_MIN_LENGTH 天，例如几十年历史) 用 FFT，
+#   每个序列的频谱只算一次，所有序列对共用，复杂度 O(N log N)。
+# 结果按数据版本缓存: 看板以各源的 history_store.stamp 作为缓存键 (见 dashboard.py)。
+
+MAX_LAG_DAYS = 30
+MIN_PAIRS = 20  # 某滞后上的重叠样本少于该数时不给出相关系数
+FFT_MIN_LENGTH = 1024  # 日历长度 (天) 达到该值时改用 FFT
+
+# 序列: 显示名 -> 源、日期列、数值列
+#   period_days   周度序列的值覆盖的天数 (截至日期往前铺)
+#   normal_stock  净变化减去该 5 年均值库存列的周变化 = 相对 5 年同期的注入 / 抽取偏差
+SERIES = {
+    "AO": {"source": "weather", "date": "Date", "column": "AO_Obs"},
+    "NAO": {"source": "weather", "date": "Date", "column": "NAO_Obs"},
+    "PNA": {"source": "weather", "date": "Date", "column": "PNA_Obs"},
+    "NE HDD Dev": {"source": "hdd", "date": "Source_Date", "column": "NE_Dev_Norm", "period_days": 7},
+    "US HDD Dev": {"source": "hdd", "date": "Source_Date", "column": "US_Dev_Norm", "period_days": 7},
+    "Storage Net Chg": {"source": "storage_weekly", "date": "Week_Date", "column": "Total_Net_Change",
+                        "period_days": 7},
+    "Storage vs 5Yr": {"source": "storage_weekly", "date": "Week_Date", "column": "Total_Net_Change",
+                       "normal_stock": "Total_5Yr_Avg", "period_days": 7},
+}
+
+
+def sources():
+    """SERIES 用到的历史库源 (看板用它们的 stamp 作为缓存键)。"""
+    return sorted({spec["source"] for spec in SERIES.values()})
+
+
+# ==========================================
+# 1. 序列 (Series)
+# ==========================================
+
+def _series_values(df, spec):
+    values = pd.to_numeric(df[spec["column"]], errors="coerce")
+    if spec.get("normal_stock"):
+        values = values - pd.to_numeric(df[spec["normal_stock"]], errors="coerce").diff()
+    return values
+
+
+def load_series(root=history_store.HISTORY_ROOT):
+    """读取全部序列，放到同一个日历日网格上。返回 index = 日期 (每天一行)、列 = SERIES 显示名。"""
+    needed = {}
+    for spec in SERIES.values():
+        cols = needed.setdefault(spec["source"], {spec["date"]})
+        cols.update(c for c in (spec["column"], spec.get("normal_stock")) if c)
+    frames = {}
+    for source, cols in needed.items():
+        key = history_store.SOURCES[source]["key"]
+        frames[source] = history_store.read_history(source, root=root, usecols=schemas.only(key, *cols))
+
+    columns = {}
+    for name, spec in SERIES.items():
+        df = frames[spec["source"]]
+        if df.empty or spec["column"] not in df.columns:
+            continue
+        dates = pd.to_datetime(df[spec["date"]], errors="coerce").dt.normalize()
+        # 同一期报表每天运行都会入库一行: 按日期保留最后一行 (日期为 Unknown 的行丢弃)
+        df = df.assign(_date=dates).dropna(subset=["_date"]).drop_duplicates("_date", keep="last")
+        df = df.sort_values("_date", kind="stable")
+        columns[name] = pd.Series(_series_values(df, spec).to_numpy(), index=df["_date"])
+    if not columns:
+        return pd.DataFrame()
+
+    start = min(s.index.min() for s in columns.values())
+    end = max(s.index.max() for s in columns.values())
+    grid = pd.date_range(start, end, freq="D")
+    out = pd.DataFrame(index=grid)
+    for name, s in columns.items():
+        s = s.dropna()
+        s = s[~s.index.duplicated(keep="last")].reindex(grid)
+        days = SERIES[name].get("period_days", 1)
+        out[name] = s.bfill(limit=days - 1) if days > 1 else s
+    out.index.name = "Date"
+    return out
+
+
+# ==========================================
+# 2. 互相关 (Cross-Correlation)
+# ==========================================
+
+def _standardize(values):
+    """去均值、除标准差 (数值量级统一到 1 附近，FFT 求和的舍入误差可以忽略)；缺测为 NaN。"""
+    x = np.asarray(values, dtype=float)
+    valid = np.isfinite(x)
+    if valid.sum() < 2:
+        return x
+    std = x[valid].std()
+    return (x - x[valid].mean()) / (std if std > 0 else 1.0)
+
+
+def _parts(x):
+    """掩码与 (a, a²) 两个加权序列，缺测处为 0。"""
+    mask = np.isfinite(x).astype(float)
+    a = np.where(mask > 0, x, 0.0)
+    return {"m": mask, "a": a, "aa": a * a}
+
+
+def _spectra(parts, nfft):
+    return {k: np.fft.rfft(v, nfft) for k, v in parts.items()}
+
+
+def _fft_xcorr(fa, fb, nfft, max_lag):
+    """c[k] = Σ a[t]·b[t + k]，k = -max_lag..max_lag (fa / fb 为 rfft 频谱)。"""
+    r = np.fft.irfft(np.conj(fa) * fb, nfft)
+    return np.concatenate([r[nfft - max_lag:], r[:max_lag + 1]])
+
+
+def _direct_xcorr(a, b, max_lag):
+    full = np.correlate(b, a, "full")  # full[k + n - 1] = Σ a[t]·b[t + k]
+    mid = len(a) - 1
+    lo, hi = mid - max_lag, mid + max_lag + 1
+    if lo >= 0 and hi <= len(full):
+        return full[lo:hi]
+    out = np.zeros(2 * max_lag + 1)
+    src_lo, src_hi = max(lo, 0), min(hi, len(full))
+    out[src_lo - lo:src_hi - lo] = full[src_lo:src_hi]
+    return out
+
+
+def _pearson(sums):
+    """由各滞后上的 6 个求和得到 (r, n)。"""
+    n = np.rint(sums["n"])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cov = sums["ab"] - sums["a"] * sums["b"] / n
+        var_a = sums["aa"] - sums["a"] ** 2 / n
+        var_b = sums["bb"] - sums["b"] ** 2 / n
+        r = cov / np.sqrt(var_a * var_b)
+    r = np.where((n >= MIN_PAIRS) & (var_a > 0) & (var_b > 0), np.clip(r, -1.0, 1.0), np.nan)
+    return r, n.astype(int)
+
+
+def _pair_sums(pa, pb, xcorr):
+    return {
+        "n": xcorr(pa["m"], pb["m"]),
+        "a": xcorr(pa["a"], pb["m"]),
+        "b": xcorr(pa["m"], pb["a"]),
+        "ab": xcorr(pa["a"], pb["a"]),
+        "aa": xcorr(pa["aa"], pb["m"]),
+        "bb": xcorr(pa["m"], pb["aa"]),
+    }
+
+
+def correlate_all(frame, max_lag=MAX_LAG_DAYS, pairs=None):
+    """
+    frame: load_series() 的日历网格；pairs: [(a, b), ...]，默认全部列两两组合。
+    返回 {(a, b): DataFrame(index = Lag, 列 r / n)}。
+    """
+    names = [c for c in frame.columns if frame[c].notna().any()]
+    if pairs is None:
+        pairs = [(a, b) for i, a in enumerate(names) for b in names[i + 1:]]
+    length = len(frame)
+    max_lag = int(min(max_lag, max(length - 1, 0)))
+    lags = np.arange(-max_lag, max_lag + 1)
+    parts = {name: _parts(_standardize(frame[name])) for name in {n for p in pairs for n in p}}
+
+    if length >= FFT_MIN_LENGTH:
+        nfft = 1 << int(np.ceil(np.log2(2 * length - 1)))
+        spectra = {name: _spectra(p, nfft) for name, p in parts.items()}
+        sums_for = lambda a, b: _pair_sums(spectra[a], spectra[b], lambda x, y: _fft_xcorr(x, y, nfft, max_lag))
+    else:
+        sums_for = lambda a, b: _pair_sums(parts[a], parts[b], lambda x, y: _direct_xcorr(x, y, max_lag))
+
+    out = {}
+    for a, b in pairs:
+        r, n = _pearson(sums_for(a, b))
+        out[(a, b)] = pd.DataFrame({"r": r, "n": n}, index=pd.Index(lags, name="Lag"))
+    return out
+
+
+def correlate(frame, a, b, max_lag=MAX_LAG_DAYS):
+    """单个序列对的相关曲线。"""
+    return correlate_all(frame, max_lag, pairs=[(a, b)])[(a, b)]
+
+
+def peak_table(results):
+    """每个序列对 |r| 最大的滞后 (看板汇总表用)。"""
+    records = []
+    for (a, b), curve in results.items():
+        valid = curve.dropna(subset=["r"])
+        if valid.empty:
+            continue
+        lag = valid["r"].abs().idxmax()
+        records.append({"A": a, "B": b, "Lag": int(lag), "r": valid.at[lag, "r"],
+                        "n": int(valid.at[lag, "n"]), "r@0": curve.at[0, "r"] if 0 in curve.index else np.nan})
+    if not records:
+        return pd.DataFrame(columns=["A", "B", "Lag", "r", "n", "r@0"])
+    return pd.DataFrame(records).sort_values("r", key=np.abs, ascending=False, ignore_index=True)
+
+
+if __name__ == "__main__":
+    import sys
+
+    max_lag = int(sys.argv[1]) if len(sys.argv) > 1 else MAX_LAG_DAYS
+    frame = load_series()
+    table = peak_table(correlate_all(frame, max_lag))
+    print(f"📈 [Cross-Correlation] {len(frame)} 天 x {frame.shape[1]} 序列，滞后 ±{max_lag} 天")
+    print(table.to_string(index=False, float_format=lambda v: f"{v:+.3f}"))
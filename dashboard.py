@@ -1,13 +1,15 @@
 import streamlit as st
 from datetime import datetime, timedelta
-import requests
-import io
-import re
-from pypdf import PdfReader
 import pandas as pd
-import json
-import os
-from streamlit_autorefresh import st_autorefresh
+import bitemporal
+import change_watch
+import cross_correlation
+import data_loader
+import history_store
+import render_profiler
+import rollups
+import snapshots
+import styles
 
 # === 1. 页面全局配置 ===
 st.set_page_config(
@@ -17,360 +19,133 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# === [配置] 自动刷新 (1小时) ===
-st_autorefresh(interval=3600000, key="data_refresh_key")
-
-# === 2. 样式优化 (CSS) - 已修改以缩小顶部空间 ===
-st.markdown("""
-    <style>
-    /* [新增] 强行缩小主页面顶部空白 */
-    .block-container {
-        padding-top: 1.5rem !important; /* 默认通常是 6rem，这里改为 1.5rem */
-        padding-bottom: 1rem !important;
-        margin-top: 0rem !important;
-    }
-
-    /* 侧边栏背景 */
-    [data-testid="stSidebar"] { background-color: #f8f9fa; }
-
-    /* 侧边栏顶部紧凑模式 */
-    section[data-testid="stSidebar"] .block-container {
-        padding-top: 2rem;
-        padding-bottom: 2rem;
-    }
-
-    /* Tabs 样式 */
-    .stTabs [data-baseweb="tab-list"] { gap: 8px; }
-    .stTabs [data-baseweb="tab"] {
-        height: 45px; white-space: pre-wrap; padding: 8px 16px; 
-        background-color: #fff; border-radius: 4px; border: 1px solid #e0e0e0;
-    }
-    .stTabs [aria-selected="true"] {
-        background-color: #e3f2fd; border-left: 4px solid #1565c0; color: #1565c0;
-    }
-
-    /* [核心颜色统一] Bullish (Negative/Cold) = Green; Bearish (Positive/Warm) = Red */
-    .tag-minus {
-        background-color: #e8f5e9; color: #2e7d32; /* 绿色: 负相位/寒冷/利多 */
-        padding: 4px 12px; border-radius: 6px; font-weight: 700; font-size: 1.1em; 
-        border: 1px solid #c8e6c9; display: inline-block; margin: 4px 0;
-    }
-    .tag-plus {
-        background-color: #e8f5e9; color: #2e7d32; /* [FIXED] 绿色: 正相位/PNA/利多 */
-        padding: 4px 12px; border-radius: 6px; font-weight: 700; font-size: 1.1em;
-        border: 1px solid #c8e6c9; display: inline-block; margin: 4px 0;
-    }
-
-    .tag-bear {
-        background-color: #ffebee; 
-        color: #c62828;               /* 红色：暖冬/利空 */
-        padding: 4px 12px; 
-        border-radius: 6px; 
-        font-weight: 700; 
-        font-size: 1.1em;
-        border: 1px solid #ffcdd2; 
-        display: inline-block; 
-        margin: 4px 0;
-    }
-
-    .tag-neutral {
-        background-color: #f5f5f5; color: #616161; 
-        padding: 4px 12px; border-radius: 6px; font-weight: 700; font-size: 1.1em;
-        border: 1px solid #e0e0e0; display: inline-block; margin: 4px 0;
-    }
-
-    /* 信号框样式 */
-    .signal-box-bull {
-        background-color: #fff; border-left: 4px solid #c62828;
-        padding: 16px; border-radius: 8px; margin-top: 10px;
-        box-shadow: 0 2px 5px rgba(0,0,0,0.05);
-        border: 1px solid #f0f0f0;
-    }
-
-    /* 决策矩阵排版样式 */
-    .decision-content {
-        margin-top: 10px;
-        font-size: 0.95em;
-        line-height: 1.6;
-    }
-    .decision-label {
-        font-weight: 700; 
-        color: #212121;
-        display: block; 
-        margin-top: 10px;
-        margin-bottom: 4px;
-    }
-
-    .zoom-img:hover { opacity: 0.9; cursor: zoom-in; transition: 0.3s; }
-    </style>
-""", unsafe_allow_html=True)
+# === [配置] 渲染性能剖析 (?profile=1 或 DASHBOARD_PROFILE=1 时开启) ===
+render_profiler.start()
+render_profiler.begin("setup")
+
+# === [配置] 数据变更时自动刷新 (见 change_watch.py；页面读取的数据经 change_watch.watch 登记) ===
+change_watch.begin()
+
+# === 2. 样式优化 (CSS，见 styles.py，与静态导出共用) ===
+st.markdown(styles.DASHBOARD_CSS, unsafe_allow_html=True)
 
 
 # === 3. 核心数据源 ===
-IMG_URLS = {
-    "AO": "https://www.cpc.ncep.noaa.gov/products/precip/CWlink/daily_ao_index/ao.gefs.sprd2.png",
-    "NAO": "https://www.cpc.ncep.noaa.gov/products/precip/CWlink/pna/nao.gefs.sprd2.png",
-    "PNA": "https://www.cpc.ncep.noaa.gov/products/precip/CWlink/pna/pna.gefs.sprd2.png",
-    "LANINA": "https://www.cpc.ncep.noaa.gov/products/analysis_monitoring/lanina/enso_evolution-status-fcsts-web.pdf"
-}
-
-LINKS = {
-    "NOAA_HOME": "https://www.cpc.ncep.noaa.gov/",
-    "YAHOO_NG": "https://finance.yahoo.com/quote/NG=F",
-    "YAHOO_EQT": "https://finance.yahoo.com/quote/EQT",
-    "YAHOO_BOIL": "https://finance.yahoo.com/quote/BOIL",
-    "YAHOO_CSX": "https://finance.yahoo.com/quote/CSX",
-    "YAHOO_UNP": "https://finance.yahoo.com/quote/UNP",
-    "YAHOO_UAL": "https://finance.yahoo.com/quote/UAL",
-}
+IMG_URLS = styles.IMG_URLS
+LINKS = styles.LINKS
 
 
 # === 辅助函数定义 (必须在调用前) ===
 
 def clickable_image_html(img_url, alt_text):
-    html_code = f'''
-    <a href="{img_url}" target="_blank">
-        <img src="{img_url}" class="zoom-img" style="width:100%; border-radius:5px; border:1px solid #ddd;" alt="{alt_text}">
-    </a>
-    '''
-    st.markdown(html_code, unsafe_allow_html=True)
+    st.markdown(styles.clickable_image_html(img_url, alt_text), unsafe_allow_html=True)
 
 
 def signal_card(title, dynamics, impact, signal_text):
-    html = f"""
-<div class="signal-box-bull">
-    <div style="font-size: 1.15em; font-weight: bold; margin-bottom: 12px; color: #212121;">{title}</div>
-    <div style="margin-bottom: 8px; color: #424242;">
-        🌪️ <b>动力学:</b> {dynamics}
-    </div>
-    <div style="margin-bottom: 12px; color: #424242;">
-        🥶 <b>影响:</b> {impact.replace('**', '')} 
-    </div>
-    <div style="background-color: #ffebee; padding: 8px; border-radius: 4px; color: #c62828; font-weight: bold;">
-        🔥 信号: {signal_text}
-    </div>
-</div>
-"""
-    st.markdown(html, unsafe_allow_html=True)
+    st.markdown(styles.signal_card_html(title, dynamics, impact, signal_text), unsafe_allow_html=True)
 
 
 # === 提取本地历史数据最新行 (供 NCRI 和 Tab 展示使用) ===
-def load_latest_climate_data():
-    """从本地 CSV 文件读取最新一行的 AO/NAO/PNA 数据。"""
-    HISTORY_FILE = "history_weather.csv"
+def load_latest_climate_data(as_of=None):
+    """从本地历史库 (最新月分区) 读取最新一行 (as_of 时刻) 的 AO/NAO/PNA 数据。"""
+    change_watch.watch(history_store.source_dir(data_loader.WEATHER_SOURCE))
     try:
-        if not os.path.exists(HISTORY_FILE):
+        df = bitemporal.read_latest(data_loader.WEATHER_SOURCE, as_of)
+        if df.empty:
             return None
-        df = pd.read_csv(HISTORY_FILE)
         return df.iloc[-1].to_dict()
     except Exception as e:
         return None
 
 
-# === 辅助函数 - 显示当前气象指标的值 (供 Tab 使用) ===
-def display_current_index_value(index_name):
-    global latest_data
+# === 度日 (HDD/CDD) 数据 - 统一走 data_loader 缓存层 ===
+# 以下加载函数的 stamp 参数 = history_store.stamp(文件或分区目录)，只用作缓存键:
+# 采集器原子写入后版本号变化，缓存立即失效，因此 ttl 只是兜底。
+# as_of = 时间回溯的时刻 (None = 当前)，同样是缓存键的一部分。
+@render_profiler.cache_data(ttl=3600)
+def get_degree_days(kind, stamp, as_of=None):
+    return data_loader.load_degree_days(kind, as_of)
 
-    if latest_data:
-        obs_val = latest_data.get(f'{index_name}_Obs')
-        d7_val = latest_data.get(f'{index_name}_Day7')
-        d10_val = latest_data.get(f'{index_name}_Day10')
 
-        is_nao_ao = index_name in ["NAO", "AO"]
+# === ENSO 报告解析 (保持原样) ===
+# [修改点] 使用 @st.cache_data 替换 @st.cache (经 render_profiler 包装)
+@render_profiler.cache_data(ttl=3600)
+def get_enso_summary(url):
+    return data_loader.fetch_enso_summary(url)
 
-        def get_style(value):
-            if value is None: return "color: #888;", "-"
-            is_positive = value > 0
-            if is_nao_ao:
-                is_bullish = not is_positive
-            else:
-                is_bullish = is_positive
-            color = "#2e7d32" if is_bullish else "#c62828"  # Green or Red
-            arrow = "▲" if is_bullish else "▼"
-            return f"color: {color};", arrow
-
-        obs_style, obs_arrow = get_style(obs_val)
-        d7_style, d7_arrow = get_style(d7_val)
-        d10_style, d10_arrow = get_style(d10_val)
-
-        col1, col2, col3 = st.columns(3)
-
-        with col1:
-            st.markdown(f"**今日实况 (Observed):**")
-            st.markdown(
-                f"<span style='font-size: 1.8em; font-weight: bold; {obs_style}'>{obs_arrow} {obs_val:.3f}</span>",
-                unsafe_allow_html=True)
-        with col2:
-            st.markdown(f"**7天预测 (Forecast Day 7):**")
-            st.markdown(f"<span style='font-size: 1.8em; font-weight: bold; {d7_style}'>{d7_arrow} {d7_val:.3f}</span>",
-                        unsafe_allow_html=True)
-        with col3:
-            st.markdown(f"**10天预测 (Forecast Day 10):**")
-            st.markdown(
-                f"<span style='font-size: 1.8em; font-weight: bold; {d10_style}'>{d10_arrow} {d10_val:.3f}</span>",
-                unsafe_allow_html=True)
-        st.markdown("---")
-    else:
-        st.warning("⚠️ 数据库尚未更新，请运行 'climate_collector.py' 获取数据。")
 
+# === EIA 数据解析 (CSV版 - 极简行名) ===
+@render_profiler.cache_data(ttl=3600)
+def load_eia_total(stamp, as_of=None):
+    return data_loader.load_eia_total(as_of)
 
-# === HDD 数据抓取函数 (CSV版) ===
-# [修改点] 使用 @st.cache_data 替换 @st.cache
-@st.cache_data(ttl=60)
-def get_gas_hdd():
-    csv_file = "history_hdd.csv"
-    try:
-        if not os.path.exists(csv_file):
-            return None, None
-
-        df = pd.read_csv(csv_file)
-        if df.empty: return None, None
-
-        latest = df.iloc[-1]
-        source_date = latest.get("Source_Date", "N/A")
-
-        data_bag = {
-            "New England": {
-                "actual": latest.get("NE_Actual", 0),
-                "dev_normal": latest.get("NE_Dev_Norm", 0),
-                "dev_last_year": latest.get("NE_Dev_Year", 0)
-            },
-            "Middle Atlantic": {
-                "actual": latest.get("MA_Actual", 0),
-                "dev_normal": latest.get("MA_Dev_Norm", 0),
-                "dev_last_year": latest.get("MA_Dev_Year", 0)
-            },
-            "Midwest": {
-                "actual": latest.get("MW_Actual", 0),
-                "dev_normal": latest.get("MW_Dev_Norm", 0),
-                "dev_last_year": latest.get("MW_Dev_Year", 0)
-            },
-            "US Total": {
-                "actual": latest.get("US_Actual", 0),
-                "dev_normal": latest.get("US_Dev_Norm", 0),
-                "dev_last_year": latest.get("US_Dev_Year", 0)
-            }
-        }
-        return data_bag, source_date
-    except Exception as e:
-        return None, None
 
+@render_profiler.cache_data(ttl=3600)
+def load_nowcast(stamp):
+    return data_loader.load_nowcast()
 
-# === ENSO 报告解析 (保持原样) ===
-# [修改点] 使用 @st.cache_data 替换 @st.cache
-@st.cache_data(ttl=3600)
-def get_enso_summary(url):
-    try:
-        headers = {"User-Agent": "Mozilla/5.0"}
-        response = requests.get(url, headers=headers, timeout=15, verify=False)
-        if response.status_code == 200:
-            f = io.BytesIO(response.content)
-            reader = PdfReader(f)
-            raw_text = ""
-            for i in range(min(5, len(reader.pages))):
-                page_text = reader.pages[i].extract_text()
-                if "ENSO Alert System Status" in page_text:
-                    raw_text = page_text
-                    break
-            if not raw_text: return {"status": "未找到 Summary", "body": []}
-
-            status_line = "Unknown"
-            if "ENSO Alert System Status:" in raw_text:
-                parts = raw_text.split("ENSO Alert System Status:", 1)
-                temp = parts[1].strip()
-                status_line = temp.split("\n")[0]
-                raw_text = parts[1].replace(status_line, "", 1)
-
-            if "* Note" in raw_text:
-                raw_text = raw_text.split("* Note", 1)[0]
-            elif "Note:" in raw_text:
-                raw_text = raw_text.split("Note:", 1)[0]
-
-            clean_text = raw_text.replace("\n", " ")
-            clean_text = re.sub(' +', ' ', clean_text).strip()
-            sentences = clean_text.split('. ')
-            formatted_sentences = [s.strip() + "." for s in sentences if len(s) > 5]
-            return {"status": status_line, "body": formatted_sentences}
-    except Exception as e:
-        return {"status": "Error", "body": [str(e)]}
-    return {"status": "Error", "body": []}
 
+@render_profiler.cache_data(ttl=3600)
+def load_hdd_projection(stamp):
+    return data_loader.load_hdd_projection()
 
-# === EIA 数据解析 (CSV版 - 极简行名) ===
-# [修改点] 使用 @st.cache_data 替换 @st.cache
-@st.cache_data(ttl=60)
-def load_eia_total():
-    csv_file = "history_storage.csv"
-    try:
-        if not os.path.exists(csv_file):
-            return None, None
-
-        df_csv = pd.read_csv(csv_file)
-        if df_csv.empty: return None, None
-
-        latest = df_csv.iloc[-1]
-
-        report_date_str = latest.get("Report_Date", "")
-        try:
-            current_date_obj = datetime.strptime(report_date_str, "%Y-%m-%d")
-            week_ago_obj = current_date_obj - timedelta(days=7)
-            curr_fmt = current_date_obj.strftime("%m/%d/%y")
-            prev_fmt = week_ago_obj.strftime("%m/%d/%y")
-        except:
-            curr_fmt = "Current"
-            prev_fmt = "Prev Week"
-
-        labels = [
-            curr_fmt,  # 1. 本周
-            prev_fmt,  # 2. 上周
-            "Net Chg",  # 3. 简写
-            "Year Ago",  # 4. 简写
-            "vs Year %",  # 5. 简写
-            "5-Yr Avg",  # 6. 简写
-            "vs 5Yr %"  # 7. 简写
-        ]
-
-        def calc_pct(curr, base):
-            try:
-                if base is None or base == 0: return None
-                return ((curr - base) / base) * 100
-            except:
-                return None
-
-        regions_to_extract = [
-            ("Total", "Total"),
-            ("East", "East"),
-            ("Midwest", "Midwest"),
-            ("SouthCentral", "S.Central")
-        ]
-
-        rows = []
-        for prefix, display_name in regions_to_extract:
-            stock = latest.get(f"{prefix}_Stock")
-            net = latest.get(f"{prefix}_Net_Change")
-            yr = latest.get(f"{prefix}_Year_Ago")
-            avg = latest.get(f"{prefix}_5Yr_Avg")
-
-            prev = stock - net if (stock is not None and net is not None) else None
-
-            row = {
-                "Region": display_name,
-                labels[0]: stock,
-                labels[1]: prev,
-                labels[2]: net,
-                labels[3]: yr,
-                labels[4]: calc_pct(stock, yr),
-                labels[5]: avg,
-                labels[6]: calc_pct(stock, avg)
-            }
-            rows.append(row)
-
-        df_display = pd.DataFrame(rows).set_index("Region")
-
-        return df_display, report_date_str
 
-    except Exception as e:
-        return None, None
+@render_profiler.cache_data(ttl=3600)
+def load_scenarios(stamp, as_of=None):
+    return data_loader.load_scenarios(as_of)
+
+
+@render_profiler.cache_data(ttl=3600)
+def load_forecast_revisions(stamp, as_of=None):
+    return data_loader.load_forecast_revisions(as_of)
+
+
+# === 历史回溯 ===
+HISTORY_LOOKBACK = {"3 个月": 92, "6 个月": 183, "1 年": 366, "全部": None}
+
+
+# 整段历史优先用内存映射的 Arrow 快照: 所有会话共享同一个只读 DataFrame (cache_resource 不复制)，
+# 多个 streamlit 进程共享页缓存。没有 pyarrow 时回退为按回看窗口读取 CSV 分区。
+@render_profiler.cache_resource(ttl=3600, max_entries=12)
+def load_history_table(source, stamp):
+    return snapshots.load(source)
+
+
+@render_profiler.cache_data(ttl=3600)
+def load_history_csv(source, lookback, stamp):
+    days = HISTORY_LOOKBACK[lookback]
+    start = None if days is None else datetime.now() - timedelta(days=days)
+    return history_store.read_history(source, start=start)
+
+
+def load_history(source, lookback, stamp):
+    """回看窗口内的历史 (只读，勿原地修改)。"""
+    df = load_history_table(source, stamp)
+    if df is None:
+        return load_history_csv(source, lookback, stamp)
+    days = HISTORY_LOOKBACK[lookback]
+    if days is None or df.empty:
+        return df
+    # 快照按主键日期升序: 二分定位起点后切片 (视图，不复制)
+    key = history_store.SOURCES[source]["key"]
+    start = df[key].searchsorted(pd.Timestamp(datetime.now() - timedelta(days=days)))
+    return df.iloc[start:]
+
+
+def history_stamp(source):
+    return change_watch.watch(history_store.source_dir(source))
+
+
+# 互相关按数据版本缓存: 缓存键为相关各源的 stamp，数据不变时拖动滑块只重算一次
+@render_profiler.cache_data(ttl=3600, max_entries=8)
+def load_cross_correlation(max_lag, stamp):
+    return data_loader.load_cross_correlation(max_lag)
+
+
+# 汇总表由采集器增量维护 (rollups.py)，这里只读一个小文件
+@render_profiler.cache_data(ttl=3600)
+def load_rollup(source, grain, stamp):
+    return data_loader.load_rollup(source, grain)
 
 
 # === 4. 侧边栏导航 ===
@@ -382,14 +157,29 @@ with st.sidebar:
         ["🚀 实时监控", "📅 历史回溯"],
         index=0
     )
+
+    # [新增] 时间回溯: 还原过去某一时刻侧边栏与实时监控页显示的数据 (见 bitemporal.py)
+    as_of = None
+    with st.expander("🕰️ 时间回溯 (As of)"):
+        if st.checkbox("查看过去某一时刻", key="as_of_enabled"):
+            as_of_date = st.date_input("日期", value=datetime.now().date(), key="as_of_date")
+            as_of_time = st.time_input("时间", value=datetime.strptime("10:00", "%H:%M").time(), key="as_of_time")
+            as_of = datetime.combine(as_of_date, as_of_time)
+            st.caption("按入库时间还原: 只显示该时刻之前已入库的版本 (同日重跑覆盖前的旧值也会还原)。")
     st.markdown("---")
 
-    # ---- HDD 数据板块 ----
-    st.subheader("🔥 实际燃烧需求 (HDD)")
+    # ---- 度日数据板块 (冬季 HDD / 夏季 CDD 自动切换) ----
+    render_profiler.begin("sidebar:degree_days")
+    dd_kind = data_loader.current_season(as_of)
+    dd_data, dd_date = get_degree_days(dd_kind, history_stamp(data_loader.DEGREE_DAY_PANELS[dd_kind]["source"]), as_of)
+    if not dd_data:
+        # 当季数据尚未入库时回退到另一种度日
+        dd_kind = "HDD" if dd_kind == "CDD" else "CDD"
+        dd_data, dd_date = get_degree_days(dd_kind, history_stamp(data_loader.DEGREE_DAY_PANELS[dd_kind]["source"]), as_of)
 
-    hdd_data, hdd_date = get_gas_hdd()
+    st.subheader(data_loader.DEGREE_DAY_PANELS[dd_kind]["title"])
 
-    if hdd_data:
+    if dd_data:
         def show_dual_metric(col, label, data):
             actual = data.get('actual', '-')
             dev_norm = data.get('dev_normal', 0)
@@ -402,70 +192,29 @@ with st.sidebar:
                     delta=f"{dev_norm} (Norm)",
                     delta_color="normal"
                 )
-                color = "#2e7d32" if dev_year > 0 else "#c62828"
-                arrow = "▲" if dev_year > 0 else "▼"
-                if dev_year == 0:
-                    color = "#666"
-                    arrow = "-"
+                st.markdown(styles.dev_year_html(dev_year), unsafe_allow_html=True)
 
-                st.markdown(
-                    f"""<div style="margin-top: -15px; font-size: 0.85em; color: #555;">vs Year: <span style="color: {color}; font-weight: bold;">{arrow} {dev_year}</span></div>""",
-                    unsafe_allow_html=True)
 
+        dd_cols = st.columns(2)
+        for i, (label, data) in enumerate(dd_data.items()):
+            show_dual_metric(dd_cols[i % 2], label, data)
 
-        hd_col1, hd_col2 = st.columns(2)
-        show_dual_metric(hd_col1, "New England", hdd_data.get('New England', {}))
-        show_dual_metric(hd_col2, "Mid-Atlantic", hdd_data.get('Middle Atlantic', {}))
-        show_dual_metric(hd_col1, "Midwest", hdd_data.get('Midwest', {}))
-        show_dual_metric(hd_col2, "US Total", hdd_data.get('US Total', {}))
-
-        st.caption(f"📅 Source Updated: {hdd_date} ")
-        st.caption("[NOAA HDD Data](https://www.cpc.ncep.noaa.gov/products/analysis_monitoring/cdus/degree_days/)")
+        st.caption(f"📅 Source Updated: {dd_date} ")
+        st.caption("[NOAA Degree Day Data](https://www.cpc.ncep.noaa.gov/products/analysis_monitoring/cdus/degree_days/)")
 
     else:
-        st.warning("HDD 数据暂不可用")
+        st.warning(f"{dd_kind} 数据暂不可用")
 
     st.markdown("---")
 
     # ---- EIA 模块 ----
+    render_profiler.begin("sidebar:eia")
     st.markdown("### 🏦 EIA 天然气库存")
     try:
-        eia_df, eia_date = load_eia_total()
+        eia_df, eia_date = load_eia_total(history_stamp(data_loader.STORAGE_SOURCE), as_of)
 
         if eia_df is not None:
-            tdf = eia_df.T
-
-
-            def num_fmt(x):
-                if pd.isna(x): return ""
-                v = float(x)
-                if abs(v - round(v)) < 1e-6: return f"{int(round(v)):,d}"
-                return f"{v:.1f}".rstrip("0").rstrip(".")
-
-
-            highlight_rows = ["Net Chg", "vs Year %", "vs 5Yr %"]
-
-
-            def highlight_style(df):
-                styles = pd.DataFrame('font-weight: bold;', index=df.index, columns=df.columns)
-                for idx in df.index:
-                    if idx in highlight_rows:
-                        for col in df.columns:
-                            val = df.loc[idx, col]
-                            base = 'font-weight: bold; background-color: #fff3cd;'
-                            if pd.notna(val):
-                                if val < 0:
-                                    styles.loc[idx, col] = base + 'color: #2e7d32;'
-                                elif val > 0:
-                                    styles.loc[idx, col] = base + 'color: #c62828;'
-                                else:
-                                    styles.loc[idx, col] = base + 'color: black;'
-                            else:
-                                styles.loc[idx, col] = base + 'color: black;'
-                return styles
-
-
-            st.dataframe(tdf.style.format(num_fmt).apply(highlight_style, axis=None))
+            st.dataframe(styles.eia_total_styler(eia_df))
             st.caption(f"📅 Source Updated: {eia_date}")
 
         else:
@@ -474,9 +223,39 @@ with st.sidebar:
         st.warning(f"EIA Error: {e}")
 
     st.caption("[EIA Weekly Report](https://ir.eia.gov/ngs/ngs.html)")
+
+    # ---- 库存预测 (由 storage_nowcast.py 预先计算) ----
+    render_profiler.begin("sidebar:nowcast")
+    # 预测文件只保留最新一次运行，回看时不显示
+    nowcast, nowcast_prev = load_nowcast(change_watch.watch(data_loader.NOWCAST_FILE)) if as_of is None else (None, None)
+    if nowcast:
+        st.markdown("##### 📈 下周净变化预测 (Model)")
+        band = ""
+        if pd.notna(nowcast.get("Lower")) and pd.notna(nowcast.get("Upper")):
+            band = f"90%: {nowcast['Lower']:+.0f} ~ {nowcast['Upper']:+.0f}"
+
+        consensus = st.number_input("市场预期 (Consensus, Bcf)", value=None, step=1.0, key="eia_consensus")
+        nc1, nc2 = st.columns(2)
+        nc1.metric(
+            label=f"Model {nowcast['Target_Week']}",
+            value=f"{nowcast['Expected']:+.0f}",
+            delta=band or None,
+            delta_color="off"
+        )
+        if consensus is not None:
+            nc2.metric(
+                label="Model vs Consensus",
+                value=f"{nowcast['Expected'] - consensus:+.0f}",
+                delta="偏空 (多注入/少抽取)" if nowcast['Expected'] > consensus else "偏多 (少注入/多抽取)",
+                delta_color="inverse" if nowcast['Expected'] > consensus else "normal"
+            )
+        if nowcast_prev:
+            st.caption(f"上期 {nowcast_prev['Target_Week']}: 预测 {nowcast_prev['Expected']:+.0f} / 实际 {nowcast_prev['Actual']:+.0f}")
+
     st.markdown("---")
 
     # ---- 其它导航 ----
+    render_profiler.begin("sidebar:links")
     st.markdown("### 🏛️ 官方数据源")
     st.markdown(f"- [NOAA CPC 气候预测]({LINKS['NOAA_HOME']})")
     st.markdown(f"- [**ENSO / 拉尼娜周报**]({IMG_URLS['LANINA']})")
@@ -502,149 +281,87 @@ if view_mode == "🚀 实时监控":
     st.title("⚛️ 天然气气象分析终端")
     st.caption(
         f"**数据更新 (Last Updated):** `{datetime.now().astimezone().strftime('%Y-%m-%d %H:%M %Z')}`")
+    if as_of is not None:
+        st.warning(f"🕰️ 时间回溯: 显示 {as_of.strftime('%Y-%m-%d %H:%M')} 时已入库的数据。"
+                   "ENSO 周报、HDD 投影与库存预测只保留最新一份，回看时不显示。")
     st.markdown("---")
 
-    latest_data = load_latest_climate_data()
+    latest_data = load_latest_climate_data(as_of)
 
 
     # [新增] 辅助函数 - 显示当前气象指标的值
     def display_current_index_value(index_name):
         if latest_data:
-            # 获取 CSV 中的值
-            obs_val = latest_data.get(f'{index_name}_Obs')
-            d7_val = latest_data.get(f'{index_name}_Day7')
-            d10_val = latest_data.get(f'{index_name}_Day10')
-
-            # === 核心颜色逻辑 ===
-            is_nao_ao = index_name in ["NAO", "AO"]
-
-            def get_style(value):
-                if value is None: return "color: #888;", "-"
-                is_positive = value > 0
-                if is_nao_ao:
-                    is_bullish = not is_positive
-                else:
-                    is_bullish = is_positive
-                color = "#2e7d32" if is_bullish else "#c62828"
-                arrow = "▲" if is_bullish else "▼"
-                return f"color: {color};", arrow
-
-            obs_style, obs_arrow = get_style(obs_val)
-            d7_style, d7_arrow = get_style(d7_val)
-            d10_style, d10_arrow = get_style(d10_val)
-
-            html_card = f"""
-            <div style='
-                margin-top: 15px; 
-                border: 1px solid #e0e0e0; 
-                border-radius: 6px; 
-                padding: 8px; 
-                background-color: #f8f8f8;
-                display: flex; 
-                justify-content: space-around;
-                text-align: center;
-                font-size: 0.95em;
-            '>
-                <div style='flex:1; border-right: 1px solid #eee;'>
-                    <span style='font-weight: bold; color: #555;'>OBSERVED (Today)</span><br>
-                    <span style='font-size: 1.3em; {obs_style}; font-weight: bold;'>{obs_val:.3f}</span>
-                </div>
-                <div style='flex:1; border-right: 1px solid #eee;'>
-                    <span style='font-weight: bold; color: #555;'>DAY 7 FORECAST</span><br>
-                    <span style='font-size: 1.3em; {d7_style}; font-weight: bold;'>{d7_val:.3f}</span>
-                </div>
-                <div style='flex:1;'>
-                    <span style='font-weight: bold; color: #555;'>DAY 10 FORECAST</span><br>
-                    <span style='font-size: 1.3em; {d10_style}; font-weight: bold;'>{d10_val:.3f}</span>
-                </div>
-            </div>
-            """
-            st.markdown(html_card, unsafe_allow_html=True)
+            st.markdown(styles.index_value_card_html(index_name, latest_data), unsafe_allow_html=True)
         else:
             st.warning("⚠️ 数据库尚未更新，请运行 'climate_collector.py' 获取数据。")
 
 
     # === 核心气象板块 (4 Tabs) ===
+    render_profiler.begin("live:teleconnection_tabs")
     st.subheader("📡 大气遥相关机制 (Atmospheric Teleconnections)")
     st.caption("注：图表展示 GEFS 集合预报发散度。红线 (Mean) 代表主流趋势。")
 
-    tab_nao, tab_ao, tab_pna, tab_enso = st.tabs([
-        "1. 北大西洋涛动 (NAO)", "2. 北极涛动 (AO)", "3. 太平洋-北美模式 (PNA)", "🌊 NOAA ENSO 周报"
-    ])
-
-    with tab_nao:
-        col_img, col_content = st.columns([1, 1.5])
-        with col_img: clickable_image_html(IMG_URLS["NAO"], "NAO")
-        with col_content:
-            st.markdown("<div class='tag-minus'>📉 负相位 / Negative (-)</div>", unsafe_allow_html=True)
-            signal_card("阻塞效应 (Blocking)", "西风急流弯曲，格陵兰高压形成。", "冷气团在美东<b>停滞不前</b>。",
-                        "极强利多 (寒潮持续)")
-            display_current_index_value("NAO")
-
-    with tab_ao:
-        col_img, col_content = st.columns([1, 1.5])
-        with col_img: clickable_image_html(IMG_URLS["AO"], "AO")
-        with col_content:
-            st.markdown("<div class='tag-minus'>📉 负相位 / Negative (-)</div>", unsafe_allow_html=True)
-            signal_card("极涡崩溃 (Vortex Collapse)", "极地高压控制，冷空气南下。", "广泛的<b>冷空气爆发</b>。",
-                        "利多 (冷源充足)")
-            display_current_index_value("AO")
-
-    with tab_pna:
-        col_img, col_content = st.columns([1, 1.5])
-        with col_img: clickable_image_html(IMG_URLS["PNA"], "PNA")
-        with col_content:
-            st.markdown("<div class='tag-plus'>📈 正相位 / Positive (+)</div>", unsafe_allow_html=True)
-            signal_card("西脊东槽 (Ridge-Trough)", "北美西部高压脊隆起。", "建立<b>经向环流</b>输送冷空气。",
-                        "利多 (通道打开)")
-            display_current_index_value("PNA")
+    *index_tabs, tab_enso = st.tabs([t["label"] for t in styles.TELECONNECTION_TABS] + ["🌊 NOAA ENSO 周报"])
+
+    for tab, panel in zip(index_tabs, styles.TELECONNECTION_TABS):
+        with tab:
+            col_img, col_content = st.columns([1, 1.5])
+            with col_img: clickable_image_html(IMG_URLS[panel["index"]], panel["index"])
+            with col_content:
+                st.markdown(panel["tag"], unsafe_allow_html=True)
+                signal_card(*panel["card"])
+                display_current_index_value(panel["index"])
 
+    render_profiler.begin("live:enso")
     with tab_enso:
-        with st.spinner("正在解析 NOAA 最新周报..."):
-            enso_data = get_enso_summary(IMG_URLS["LANINA"])
-        st.info(f"**Current Status:** {enso_data['status']}")
-        if enso_data['body']:
-            for s in enso_data['body']: st.markdown(f"- {s}")
+        if as_of is not None:
+            st.info("ENSO 周报只读取最新一期，时间回溯时不显示。")
         else:
-            st.warning("未提取到内容，请检查 PDF。")
+            with st.spinner("正在解析 NOAA 最新周报..."):
+                enso_data = get_enso_summary(IMG_URLS["LANINA"])
+            st.info(f"**Current Status:** {enso_data['status']}")
+            if enso_data['body']:
+                for s in enso_data['body']: st.markdown(f"- {s}")
+            else:
+                st.warning("未提取到内容，请检查 PDF。")
+
+    # === 预报修正 (由 climate_collector.py 入库时经 forecast_revisions.py 增量计算) ===
+    render_profiler.begin("live:revisions")
+    rev_df, rev_date = load_forecast_revisions(history_stamp(data_loader.FORECAST_SOURCE), as_of)
+    if rev_df is not None:
+        st.markdown("---")
+        st.subheader("🔁 预报修正 (Forecast Revisions)")
+        st.caption(f"{rev_date} GEFS 集合平均对同一目标日的预报，与上一次运行 (lead + 1) 及 7 天前运行 (lead + 7) 相比。"
+                   "转冷 = AO/NAO 下修或 PNA 上修 (利多)；趋势 = 最近 5 次运行的修正斜率。")
+        st.dataframe(styles.revision_styler(rev_df), width='stretch')
+
+    # === 未来两周 HDD 距平投影 (由 hdd_projection.py 预先计算) ===
+    render_profiler.begin("live:hdd_projection")
+    proj_df, proj_date = load_hdd_projection(change_watch.watch(data_loader.PROJECTION_FILE)) if as_of is None else (None, None)
+    if proj_df is not None:
+        st.markdown("---")
+        st.subheader("🌡️ 未来两周燃气加权 HDD 距平投影 (Teleconnection → HDD)")
+        st.caption(f"基于 {proj_date} GEFS 集合平均轨迹 × 历史回归系数。正值 = 比常年更冷 (利多)。")
+        st.dataframe(styles.projection_styler(proj_df), width='stretch')
+
+    # === GEFS 集合情景 (由 climate_collector.py 聚类后写入) ===
+    render_profiler.begin("live:scenarios")
+    scen_df, scen_date = load_scenarios(history_stamp(data_loader.SCENARIO_SOURCE), as_of)
+    if scen_df is not None:
+        st.markdown("---")
+        st.subheader("🧬 GEFS 集合情景 (Ensemble Scenarios)")
+        st.caption(f"{scen_date} 各成员按 AO/NAO/PNA 联合轨迹 (lead 0-14) 聚类。Δ vs Prev = 与上一次运行的对应情景相比的权重变化 (百分点)。")
+        st.dataframe(styles.scenario_styler(scen_df), width='stretch')
 
     # === 决策矩阵 ===
+    render_profiler.begin("live:static_content")
     st.markdown("---")
     st.subheader("🎯 宏观交易决策矩阵 (Decision Matrix)")
-    m1, m2, m3 = st.columns(3)
-
-    with m1:
-        st.success("🔥 **极寒模式 (Strong Buy)**")
-        st.markdown("""<div class='decision-content'>
-        <span class='decision-label'>信号组合:</span>
-        <span class='tag-minus'>NAO (-)</span> + <span class='tag-minus'>AO (-)</span> + <span class='tag-plus'>PNA (+)</span>
-        <span class='decision-label'>🥶 天气后果:</span>
-        阻寒高压 + 极涡崩溃 + 通道打开。宾州/东北部遭遇持续性暴雪与极寒。
-        <span class='decision-label'>💰 操作建议:</span>
-        <b>押注上涨:</b> 买入 EQT / NG Futures。
-    </div>""", unsafe_allow_html=True)
-
-    with m2:
-        st.error("🟢 **暖冬模式 (Strong Sell)**")
-        st.markdown("""<div class='decision-content'>
-        <span class='decision-label'>信号组合:</span>
-        <span class='tag-bear'>NAO (+)</span> + <span class='tag-bear'>AO (+)</span> + <span class='tag-bear'>PNA (-)</span>
-        <span class='decision-label'>☀️ 天气后果:</span>
-        强劲西风急流 + 东南高压脊。暖湿气流主导美东，不下雪只下雨。
-        <span class='decision-label'>💰 操作建议:</span>
-        <b>押注下跌:</b> 卖出资产 / 观望。
-    </div>""", unsafe_allow_html=True)
-
-    with m3:
-        st.warning("⚖️ **震荡模式 (Neutral)**")
-        st.markdown("""<div class='decision-content'>
-        <span class='decision-label'>信号组合:</span>
-        <span class='tag-neutral'>信号背离 (Mixed)</span>
-        <span class='decision-label'>💨 天气后果:</span>
-        冷源充足但缺乏阻塞。寒潮来去匆匆，气温忽冷忽热。
-        <span class='decision-label'>💰 操作建议:</span>
-        <b>波段操作:</b> 不要长期持有。
-    </div>""", unsafe_allow_html=True)
+    for col, (kind, title, content) in zip(st.columns(3), styles.DECISION_MATRIX):
+        with col:
+            getattr(st, kind)(title)
+            st.markdown(content, unsafe_allow_html=True)
 
     # === 地学原理 ===
     st.markdown("---")
@@ -671,106 +388,39 @@ else:
     # 📅 历史数据回溯分析模式 (History)
     # ==========================================
     st.title("📅 历史数据库 (Historical Data Archive)")
+    lookback = st.radio("回看范围", list(HISTORY_LOOKBACK), index=2, horizontal=True)
 
-    tab_hist_weather, tab_hist_hdd, tab_hist_eia = st.tabs(["☁️ 气象 (Weather)", "🔥 需求 (HDD)", "🏦 库存 (EIA)"])
-
-    # === 辅助函数：格式化日期列 ===
-    def format_date_cols(df):
-        for col in ["Run_Date", "Source_Date", "Report_Date", "Date"]:
-            if col in df.columns:
-                try: df[col] = pd.to_datetime(df[col]).dt.strftime('%Y-%m-%d')
-                except: pass
-        return df
-
-    # === 辅助函数：查找日期列 ===
-    def get_date_col(df):
-        for col in ["Report_Date", "Run_Date", "Date", "date", "Timestamp"]:
-            if col in df.columns: return col
-        return None
+    tab_hist_weather, tab_hist_hdd, tab_hist_eia, tab_hist_rollup, tab_hist_xcorr = st.tabs(
+        ["☁️ 气象 (Weather)", "🔥 需求 (HDD)", "🏦 库存 (EIA)", "📊 汇总 (Rollups)", "🔗 滞后相关 (Lag Corr)"])
 
     # --- 1. 气象历史 (保持三塔布局) ---
+    render_profiler.begin("history:weather")
     with tab_hist_weather:
         st.markdown("### 📡 遥相关趋势追踪")
-        if os.path.exists("history_weather.csv"):
+        df = load_history(data_loader.WEATHER_SOURCE, lookback, history_stamp(data_loader.WEATHER_SOURCE))
+        if not df.empty:
             try:
-                df = pd.read_csv("history_weather.csv")
-                date_col = get_date_col(df)
-                if date_col:
-                    df = df.sort_values(date_col, ascending=False)
-                    df = format_date_cols(df)
-                    df = df.set_index(date_col)
-                    df.index.name = "Run Date"
-
-                    def get_cols(prefix):
-                        target = [f"{prefix}_Obs", f"{prefix}_Day7", f"{prefix}_Day10"]
-                        rename_map = {f"{prefix}_Obs": "Obs", f"{prefix}_Day7": "Day 7", f"{prefix}_Day10": "Day 10"}
-                        available = [c for c in target if c in df.columns]
-                        return df[available].rename(columns=rename_map)
-
-                    df_ao = get_cols("AO")
-                    df_nao = get_cols("NAO")
-                    df_pna = get_cols("PNA")
-
-                    def style_ao_nao(val):
-                        if pd.isna(val): return ''
-                        if val < 0: return 'color: #2e7d32; background-color: #e8f5e9; font-weight: bold'
-                        if val > 0: return 'color: #c62828; background-color: #ffebee'
-                        return ''
-
-                    def style_pna(val):
-                        if pd.isna(val): return ''
-                        if val > 0: return 'color: #2e7d32; background-color: #e8f5e9; font-weight: bold'
-                        if val < 0: return 'color: #c62828; background-color: #ffebee'
-                        return ''
-
+                views = data_loader.build_weather_history_views(df)
+                if views:
                     c1, c2, c3 = st.columns([1.3, 1, 1])
-                    with c1: st.markdown("##### AO"); st.dataframe(df_ao.style.format("{:.2f}").applymap(style_ao_nao), width='stretch', height=500)
-                    with c2: st.markdown("##### NAO"); st.dataframe(df_nao.style.format("{:.2f}").applymap(style_ao_nao), width='stretch', hide_index=True, height=500)
-                    with c3: st.markdown("##### PNA"); st.dataframe(df_pna.style.format("{:.2f}").applymap(style_pna), width='stretch', hide_index=True, height=500)
+                    with c1: st.markdown("##### AO"); st.dataframe(styles.weather_history_styler(views["AO"], "AO"), width='stretch', height=500)
+                    with c2: st.markdown("##### NAO"); st.dataframe(styles.weather_history_styler(views["NAO"], "NAO"), width='stretch', hide_index=True, height=500)
+                    with c3: st.markdown("##### PNA"); st.dataframe(styles.weather_history_styler(views["PNA"], "PNA"), width='stretch', hide_index=True, height=500)
                 else: st.warning("数据异常")
             except: st.info("暂无数据")
         else: st.info("暂无数据")
 
     # --- 2. HDD 历史 (美东补全 Act/Dev/YoY) ---
+    render_profiler.begin("history:hdd")
     with tab_hist_hdd:
         st.markdown("### 🔥 区域需求全览 (HDD)")
         st.caption("Act:实际 | Dev:距平 | YoY:同比 (Run Date = 脚本获取日)")
 
-        if os.path.exists("history_hdd.csv"):
+        df = load_history(data_loader.HDD_SOURCE, lookback, history_stamp(data_loader.HDD_SOURCE))
+        if not df.empty:
             try:
-                df = pd.read_csv("history_hdd.csv")
-                if "Run_Date" in df.columns:
-                    df = df.sort_values("Run_Date", ascending=False)
-                    df = format_date_cols(df)
-
-                # (A) 美东 (East) - 最全数据 (含 Run Date)
-                rename_east = {
-                    "Run_Date": "Run Date", "Source_Date": "Source",
-                    "NE_Actual": "NE Act", "NE_Dev_Norm": "NE Dev", "NE_Dev_Year": "NE YoY",
-                    "MA_Actual": "MA Act", "MA_Dev_Norm": "MA Dev", "MA_Dev_Year": "MA YoY"
-                }
-                # 过滤存在的列
-                valid_east = [c for c in rename_east.keys() if c in df.columns]
-                df_east = df[valid_east].rename(columns=rename_east)
-                if "Run Date" in df_east.columns: df_east = df_east.set_index("Run Date")
-
-                # (B) 中西部
-                df_mw = df[["MW_Actual", "MW_Dev_Norm", "MW_Dev_Year"]].rename(columns={"MW_Actual": "Act", "MW_Dev_Norm": "Dev", "MW_Dev_Year": "YoY"})
-
-                # (C) 全美
-                df_us = df[["US_Actual", "US_Dev_Norm", "US_Dev_Year"]].rename(columns={"US_Actual": "Act", "US_Dev_Norm": "Dev", "US_Dev_Year": "YoY"})
-
-                # 样式
-                def style_hdd(val):
-                    if pd.isna(val): return ''
-                    if isinstance(val, (int, float)):
-                        if val > 0: return 'color: #2e7d32; font-weight: bold; background-color: #e8f5e9'
-                        if val < 0: return 'color: #c62828; font-weight: bold; background-color: #ffebee'
-                    return ''
-
-                # 背景色高亮 (与库存保持一致)
-                def style_bg_hdd(v):
-                    return 'background-color: #fff3cd;'
+                views = data_loader.build_hdd_history_views(df)
+                df_east = views["east"]
 
                 # 布局
                 c1, c2, c3 = st.columns([2.3, 1, 1])
@@ -781,137 +431,84 @@ else:
                     color_cols = [c for c in df_east.columns if "Dev" in c or "YoY" in c]
                     # 找出所有数值列格式化 (排除日期列)
                     num_cols = [c for c in df_east.columns if "Act" in c or "Dev" in c or "YoY" in c]
-
-                    st.dataframe(
-                        df_east.style
-                        .format("{:.0f}", subset=num_cols)
-                        .applymap(style_hdd, subset=color_cols)
-                        .applymap(style_bg_hdd, subset=color_cols), # 加浅黄背景
-                        width='stretch'
-                    )
+                    st.dataframe(styles.hdd_history_styler(df_east, color_cols, num_cols), width='stretch')
                 with c2:
                     st.markdown("**🏭 中西部 (Midwest)**")
-                    st.dataframe(
-                        df_mw.style
-                        .format("{:.0f}")
-                        .applymap(style_hdd, subset=["Dev", "YoY"])
-                        .applymap(style_bg_hdd, subset=["Dev", "YoY"]),
-                        width='stretch', hide_index=True
-                    )
+                    st.dataframe(styles.hdd_history_styler(views["mw"], ["Dev", "YoY"]), width='stretch', hide_index=True)
                 with c3:
                     st.markdown("**🇺🇸 全美 (US Total)**")
-                    st.dataframe(
-                        df_us.style
-                        .format("{:.0f}")
-                        .applymap(style_hdd, subset=["Dev", "YoY"])
-                        .applymap(style_bg_hdd, subset=["Dev", "YoY"]),
-                        width='stretch', hide_index=True
-                    )
+                    st.dataframe(styles.hdd_history_styler(views["us"], ["Dev", "YoY"]), width='stretch', hide_index=True)
             except Exception as e: st.error(f"Error: {e}")
         else: st.info("暂无数据")
 
         # --- 3. EIA 历史 (最终版：去重 + 全维度 + 复刻样式) ---
+        render_profiler.begin("history:eia")
         with tab_hist_eia:
             st.markdown("### 🏦 库存全景 (Detailed Storage Report)")
 
-            if os.path.exists("history_storage.csv"):
+            df = load_history(data_loader.STORAGE_SOURCE, lookback, history_stamp(data_loader.STORAGE_SOURCE))
+            if not df.empty:
                 try:
-                    df = pd.read_csv("history_storage.csv")
-                    # 优先使用 Report_Date
-                    date_col = "Report_Date" if "Report_Date" in df.columns else get_date_col(df)
-
-                    if date_col in df.columns:
-                        # 1. 先按运行日期倒序 (确保最新抓取的在最上面)
-                        if "Run_Date" in df.columns:
-                            df = df.sort_values("Run_Date", ascending=False)
-
-                        # 2. [关键修复] 去重！解决 "non-unique index" 报错
-                        # 只保留每个 Report_Date 的最新一条记录
-                        df = df.drop_duplicates(subset=[date_col], keep='first')
-
-                        # 3. 定义显示顺序 (Total -> East -> Midwest -> SouthCentral)
-                        regions_order = [
-                            ("Total", "Total 48"),
-                            ("East", "East"),
-                            ("Midwest", "Midwest"),
-                            ("SouthCentral", "S.Central")
-                        ]
-
-                        final_data = {}
-
-                        # 4. 遍历并计算 6 个指标
-                        for prefix, display_name in regions_order:
-                            col_stock = f"{prefix}_Stock"
-                            col_net = f"{prefix}_Net_Change"
-                            col_y_ago = f"{prefix}_Year_Ago"
-                            col_5_avg = f"{prefix}_5Yr_Avg"
-
-                            if col_stock not in df.columns: continue
-
-                            # Stock
-                            final_data[(display_name, "Stock")] = df[col_stock]
-
-                            # Net Chg
-                            if col_net in df.columns:
-                                final_data[(display_name, "Net Chg")] = df[col_net]
-
-                            # Year Ago & %
-                            if col_y_ago in df.columns:
-                                final_data[(display_name, "Year Ago")] = df[col_y_ago]
-                                final_data[(display_name, "vs Year %")] = ((df[col_stock] - df[col_y_ago]) / df[
-                                    col_y_ago]) * 100
-
-                            # 5-Yr Avg & %
-                            if col_5_avg in df.columns:
-                                final_data[(display_name, "5-Yr Avg")] = df[col_5_avg]
-                                final_data[(display_name, "vs 5Yr %")] = ((df[col_stock] - df[col_5_avg]) / df[
-                                    col_5_avg]) * 100
-
-                        # 5. 构建 DataFrame
-                        view_df = pd.DataFrame(final_data)
-                        try:
-                            view_df.index = pd.to_datetime(df[date_col]).dt.strftime('%Y-%m-%d')
-                        except:
-                            view_df.index = df[date_col]
-                        view_df.index.name = "Report Date"
-
-
-                        # 6. 样式逻辑
-                        def style_color(v):
-                            if pd.isna(v): return ''
-                            if v < 0: return 'color: #2e7d32; font-weight: bold;'  # Green
-                            if v > 0: return 'color: #c62828; font-weight: bold;'  # Red
-                            return 'color: black;'
-
-
-                        def style_bg(v):
-                            return 'background-color: #fff3cd;'
-
-
-                        styler = view_df.style
-                        all_cols = view_df.columns
-
-                        # 格式化
-                        int_cols = [c for c in all_cols if c[1] in ["Stock", "Year Ago", "5-Yr Avg"]]
-                        styler = styler.format("{:,.0f}", subset=int_cols)
-
-                        net_cols = [c for c in all_cols if c[1] == "Net Chg"]
-                        styler = styler.format("{:+.0f}", subset=net_cols)
-
-                        pct_cols = [c for c in all_cols if "%" in c[1]]
-                        styler = styler.format("{:+.1f}", subset=pct_cols)
-
-                        # 应用样式
-                        target_cols = net_cols + pct_cols
-                        styler = styler.applymap(style_color, subset=target_cols)
-                        styler = styler.applymap(style_bg, subset=target_cols)
-                        styler = styler.set_properties(**{'text-align': 'center'})
-
-                        st.dataframe(styler, width='stretch', height=600)
+                    view_df = data_loader.build_eia_history_view(df)
 
+                    if view_df is not None:
+                        st.dataframe(styles.eia_history_styler(view_df), width='stretch', height=600)
                     else:
                         st.warning("数据异常：缺失 Report_Date")
                 except Exception as e:
                     st.error(f"Error: {e}")
             else:
                 st.info("暂无数据")
+
+    # --- 4. 周 / 月 / 采暖季汇总 (物化表，不受回看范围影响) ---
+    render_profiler.begin("history:rollups")
+    with tab_hist_rollup:
+        st.markdown("### 📊 周期汇总 (Weekly / Monthly / Heating Season)")
+        st.caption("度日与库存净变化为周期内合计 (Sum)，库存期初 / 期末 / 最低 (First / Last / Min)，指数为均值 (Mean)")
+        c1, c2 = st.columns([2, 1])
+        with c1: rollup_label = st.radio("数据源", list(data_loader.ROLLUP_SOURCES), horizontal=True)
+        rollup_source = data_loader.ROLLUP_SOURCES[rollup_label]
+        grains = {k: g for k, g in data_loader.ROLLUP_GRAINS.items() if g in rollups.ROLLUPS[rollup_source]["grains"]}
+        with c2: grain_label = st.radio("粒度", list(grains), horizontal=True)
+        grain = grains[grain_label]
+        rollup_df = load_rollup(rollup_source, grain, change_watch.watch(rollups.rollup_path(rollup_source, grain)))
+        if rollup_df is not None:
+            st.dataframe(styles.rollup_styler(rollup_df), width='stretch', height=600)
+        else:
+            st.info("暂无汇总 (python rollups.py rebuild)")
+
+    # --- 5. 滞后互相关 (全部历史，不受回看范围影响) ---
+    render_profiler.begin("history:xcorr")
+    with tab_hist_xcorr:
+        st.markdown("### 🔗 滞后互相关 (Lagged Cross-Correlation)")
+        st.caption("滞后 k > 0 = A 领先 B k 天，即 corr(A[t], B[t+k])；周度序列 (HDD / 库存) 的值铺满其所在一周。"
+                   "Storage vs 5Yr = 净变化相对 5 年同期的偏差")
+        max_lag = st.slider("最大滞后 (天)", 7, 90, cross_correlation.MAX_LAG_DAYS, step=1)
+        stamp = tuple(history_stamp(s) for s in cross_correlation.sources())
+        curves, peaks, days = load_cross_correlation(max_lag, stamp)
+        if curves:
+            c1, c2 = st.columns(2)
+            names = list(dict.fromkeys(n for pair in curves for n in pair))
+            with c1: xa = st.selectbox("序列 A", names, index=names.index("NAO") if "NAO" in names else 0)
+            with c2:
+                others = [n for n in names if n != xa]
+                xb = st.selectbox("序列 B", others, index=others.index("NE HDD Dev") if "NE HDD Dev" in others else 0)
+            curve = curves.get((xa, xb))
+            if curve is None:  # 反向的序列对: 滞后取反
+                curve = curves[(xb, xa)].set_axis(-curves[(xb, xa)].index, axis=0).sort_index()
+            best = curve.dropna(subset=["r"])
+            if not best.empty:
+                lag = best["r"].abs().idxmax()
+                st.metric(f"{xa} → {xb} 峰值滞后", f"{int(lag):+d} 天", f"r = {best.at[lag, 'r']:+.3f} (n = {best.at[lag, 'n']})",
+                          delta_color="off")
+            st.line_chart(curve["r"], height=300)
+            st.markdown(f"##### 全部序列对的峰值滞后 ({days} 天历史)")
+            st.dataframe(styles.xcorr_styler(peaks), width='stretch', hide_index=True)
+        else:
+            st.info("暂无数据")
+
+# === 渲染剖析面板 (仅在开启时显示) ===
+render_profiler.render()
+
+# === 数据变更检查 (片段定时重跑，只在登记的数据变化时整页刷新) ===
+change_watch.start()
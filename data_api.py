@@ -0,0 +1,315 @@
+import gzip
+import hashlib
+import io
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+import data_loader
+import history_store
+import schemas
+import snapshots
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # 没有 pyarrow 时只提供 csv / json
+    pa = None
+    pq = None
+
+# ==========================================
+# 只读数据接口 (Read-only Data API)
+# ==========================================
+# 给 notebook / 其他服务用的本地 HTTP 接口，和看板读同一份历史库 (优先 Arrow 快照):
+#   GET /sources                       源列表 (主键、列、行数、日期范围)
+#   GET /v1/<source>                   全部或区间数据
+#   GET /v1/<source>/latest            主键日期最新的那一批行
+# 查询参数:
+#   start / end   主键日期区间 (含端点，YYYY-MM-DD)
+#   columns       逗号分隔的列名 (主键列总是带上)
+#   format        csv (默认) | json | parquet | arrow
+#   derived       库存源默认附带 {区域}_vs_Year_Pct / _vs_5Yr_Pct (口径同看板)，derived=0 关闭
+#
+# 缓存: ETag 由源的 history_store.stamp + 规范化后的查询 + 编码组成 (强校验)，
+#       If-None-Match 命中直接 304，无需读数据；响应体按 ETag 放在进程内 LRU 里，重复请求不再重算。
+# 压缩: csv / json 在客户端接受 gzip 时压缩 (parquet / arrow 自带列式编码，不再压缩)。
+#
+# 用法: python data_api.py [--host 127.0.0.1] [--port 8502]
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8502
+
+FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "json": "application/json; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.file",
+}
+COLUMNAR = {"parquet", "arrow"}
+GZIP_MIN_BYTES = 1024  # 更小的响应压缩不划算
+
+# 派生列: 源 -> 函数(DataFrame) -> DataFrame
+DERIVED = {
+    "storage": data_loader.add_storage_pct,
+    "storage_weekly": data_loader.add_storage_pct,
+}
+
+RESPONSE_CACHE_ENTRIES = 128
+
+
+class APIError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# ==========================================
+# 1. 数据与查询 (Data & Queries)
+# ==========================================
+
+_frames = {}
+_frames_lock = threading.Lock()
+
+
+def source_stamp(source):
+    return "%d:%d" % history_store.stamp(history_store.source_dir(source))
+
+
+def load_frame(source, stamp):
+    """整源数据 (按主键升序，只读)。每个源只保留当前 stamp 对应的一份。"""
+    with _frames_lock:
+        cached = _frames.get(source)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+    df = snapshots.load(source)
+    if df is None:
+        df = history_store.read_history(source)
+    key = history_store.SOURCES[source]["key"]
+    if not df.empty and not df[key].is_monotonic_increasing:
+        df = df.sort_values(key, kind="stable", ignore_index=True)
+    with _frames_lock:
+        _frames[source] = (stamp, df)
+    return df
+
+
+def _parse_date(value, name):
+    try:
+        return pd.Timestamp(value)
+    except (ValueError, TypeError):
+        raise APIError(400, f"invalid {name}: {value}")
+
+
+def parse_query(source, latest, params):
+    """规范化查询参数 (同一查询的不同写法得到同一个 ETag)。"""
+    def one(name, default=None):
+        values = params.get(name)
+        return values[-1] if values else default
+
+    fmt = one("format", "csv").lower()
+    if fmt not in FORMATS:
+        raise APIError(400, f"unknown format: {fmt} (csv, json, parquet, arrow)")
+    if fmt in COLUMNAR and pa is None:
+        raise APIError(501, f"{fmt} export requires pyarrow")
+
+    start = one("start")
+    end = one("end")
+    start = None if start is None else _parse_date(start, "start").strftime("%Y-%m-%d")
+    end = None if end is None else _parse_date(end, "end").strftime("%Y-%m-%d")
+
+    columns = one("columns")
+    columns = None if not columns else tuple(c.strip() for c in columns.split(",") if c.strip())
+    derived = source in DERIVED and one("derived", "1") not in ("0", "false", "no")
+    return {"source": source, "latest": latest, "start": start, "end": end,
+            "columns": columns, "derived": derived, "format": fmt}
+
+
+def select(df, query):
+    key = history_store.SOURCES[query["source"]]["key"]
+    if df.empty:
+        return df
+    dates = df[key]
+    if query["latest"]:
+        # 最新一批: 主键日期等于最大值的全部行 (例如情景表同一天有多行)
+        lo = dates.searchsorted(dates.iloc[-1])
+        df = df.iloc[lo:]
+    else:
+        lo = 0 if query["start"] is None else dates.searchsorted(pd.Timestamp(query["start"]))
+        hi = len(df) if query["end"] is None else dates.searchsorted(pd.Timestamp(query["end"]), side="right")
+        df = df.iloc[lo:hi]
+
+    if query["derived"]:
+        df = DERIVED[query["source"]](df)
+    if query["columns"] is not None:
+        missing = [c for c in query["columns"] if c not in df.columns]
+        if missing:
+            raise APIError(400, f"unknown columns: {', '.join(missing)}")
+        wanted = [key] + [c for c in query["columns"] if c != key]
+        df = df[wanted]
+    return df
+
+
+# ==========================================
+# 2. 序列化 (Encoding)
+# ==========================================
+
+def encode(df, query):
+    fmt = query["format"]
+    if fmt in COLUMNAR:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        sink = io.BytesIO()
+        if fmt == "parquet":
+            pq.write_table(table, sink)
+        else:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        return sink.getvalue()
+
+    # 文本格式与历史库 CSV 同一写法: 日期为 YYYY-MM-DD，整数不带 ".0"
+    out = schemas.to_storage(df, query["source"])
+    if fmt == "csv":
+        return out.to_csv(index=False).encode("utf-8")
+    return out.to_json(orient="records", force_ascii=False).encode("utf-8")
+
+
+def etag(stamp, query, gzipped):
+    digest = hashlib.sha1(json.dumps([stamp, query], sort_keys=True).encode()).hexdigest()[:20]
+    return f'"{digest}{"-gz" if gzipped else ""}"'
+
+
+_responses = OrderedDict()
+_responses_lock = threading.Lock()
+
+
+def cached_body(tag, build):
+    """(响应体, Content-Encoding)，按 ETag 缓存。"""
+    with _responses_lock:
+        entry = _responses.get(tag)
+        if entry is not None:
+            _responses.move_to_end(tag)
+            return entry
+    entry = build()
+    with _responses_lock:
+        _responses[tag] = entry
+        while len(_responses) > RESPONSE_CACHE_ENTRIES:
+            _responses.popitem(last=False)
+    return entry
+
+
+def describe_sources():
+    out = []
+    for name, meta in history_store.SOURCES.items():
+        if not history_store.has_history(name):
+            continue
+        df = load_frame(name, source_stamp(name))
+        key = meta["key"]
+        out.append({
+            "source": name,
+            "key": key,
+            "columns": [str(c) for c in df.columns],
+            "derived": name in DERIVED,
+            "rows": len(df),
+            "first": None if df.empty else df[key].iloc[0].strftime("%Y-%m-%d"),
+            "last": None if df.empty else df[key].iloc[-1].strftime("%Y-%m-%d"),
+        })
+    return out
+
+
+# ==========================================
+# 3. HTTP 服务 (Server)
+# ==========================================
+
+class DataAPIHandler(BaseHTTPRequestHandler):
+    server_version = "GasDataAPI/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self._handle(send_body=True)
+
+    def do_HEAD(self):
+        self._handle(send_body=False)
+
+    def _handle(self, send_body):
+        try:
+            url = urlparse(self.path)
+            parts = [p for p in url.path.split("/") if p]
+            if parts == ["sources"]:
+                body = json.dumps(describe_sources(), ensure_ascii=False).encode("utf-8")
+                self._send(200, body, FORMATS["json"], send_body)
+                return
+            if len(parts) not in (2, 3) or parts[0] != "v1" or (len(parts) == 3 and parts[2] != "latest"):
+                raise APIError(404, f"not found: {url.path}")
+            source = parts[1]
+            if source not in history_store.SOURCES or not history_store.has_history(source):
+                raise APIError(404, f"unknown source: {source}")
+
+            query = parse_query(source, len(parts) == 3, parse_qs(url.query))
+            stamp = source_stamp(source)
+            gzipped = query["format"] not in COLUMNAR and "gzip" in self.headers.get("Accept-Encoding", "")
+            tag = etag(stamp, query, gzipped)
+            if tag in [t.strip() for t in self.headers.get("If-None-Match", "").split(",")]:
+                self._send(304, b"", None, send_body, tag)
+                return
+
+            def build():
+                body = encode(select(load_frame(source, stamp), query), query)
+                if gzipped and len(body) >= GZIP_MIN_BYTES:
+                    return gzip.compress(body, 6), "gzip"
+                return body, None
+
+            body, encoding = cached_body(tag, build)
+            self._send(200, body, FORMATS[query["format"]], send_body, tag, encoding)
+        except APIError as e:
+            self._error(e.status, str(e), send_body)
+        except Exception as e:
+            print(f"❌ [Data API] {self.path}: {e}")
+            self._error(500, "internal error", send_body)
+
+    def _send(self, status, body, content_type, send_body, tag=None, encoding=None):
+        self.send_response(status)
+        if content_type:
+            self.send_header("Content-Type", content_type)
+        if tag:
+            self.send_header("ETag", tag)
+            # 客户端每次都带 If-None-Match 来校验，数据未变时只拿到 304
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Vary", "Accept-Encoding")
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if send_body and body:
+            self.wfile.write(body)
+
+    def _error(self, status, message, send_body):
+        body = json.dumps({"error": message}).encode("utf-8")
+        self._send(status, body, FORMATS["json"], send_body)
+
+    def log_message(self, fmt, *args):
+        print(f"   [Data API] {self.address_string()} {fmt % args}")
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT):
+    server = ThreadingHTTPServer((host, port), DataAPIHandler)
+    server.daemon_threads = True
+    print(f"🚀 [Data API] 启动: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} | http://{host}:{port}/sources")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="历史库只读数据接口")
+    parser.add_argument("--host", default=os.environ.get("DATA_API_HOST", DEFAULT_HOST))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("DATA_API_PORT", DEFAULT_PORT)))
+    args = parser.parse_args()
+    serve(args.host, args.port)
@@ -0,0 +1,441 @@
+import pandas as pd
+import numpy as np
+from datetime import datetime, timedelta
+from fnmatch import fnmatch
+import collector_metrics
+import fetch_client
+import history_store
+import rollups
+import schemas
+import snapshots
+import source_engine
+import climate_collector
+import cdd_collector
+import ensemble_scenarios
+import forecast_revisions
+import hdd_collector
+import storage_collector
+
+# ==========================================
+# 数据健康检查与定向补采 (Data Health)
+# ==========================================
+# 采集器出错时只会默默留下空洞: 某个指数失败时 new_row 里是 None、某天 cron 没跑就没有那一行、
+# 度日报表日期解析失败时 Source_Date 为 "Unknown" (入库为空)。这里对全部历史源做向量化扫描:
+#   gap      按源的节奏 (每天 / 每周) 应有而没有的主键
+#   missing  必填列为空
+#   range    数值超出合理范围
+#   stale    陈旧: 与上一条完全相同 (源文件没更新)，或报表日期落后运行日期太多
+# 发现的问题按源映射到定向修复，只处理受影响的主键，不做整表重建:
+#   gefs         weather / forecasts / scenarios: GEFS CSV 覆盖最近 120 天的起报日，
+#                下载一次即可重建窗口内任意日期的行 (更早的日期无法修复)
+#   eia          storage_weekly / storage: EIA JSON 带完整周度序列，合并周度表 (只重写变化的分区)，
+#                并按发布规则为缺失的运行日重建 storage 行 (报告周用官方对比值，与采集器写入的行一致)
+#   degree_days  hdd / cdd: CPC 只发布当期周报，旧日期无法重新下载;
+#                空的 Source_Date 从数值完全相同的同期行推断，前后两天为同一期报表的缺口按前一天补齐，
+#                今天的问题则重跑采集器
+# 修复写入的行带当前 Update_Time (旧版本照常进入 _superseded 存档)，并增量更新汇总与快照。
+#
+# 用法:
+#   python data_health.py            # 扫描最近 SCAN_DAYS 天并打印问题
+#   python data_health.py repair     # 扫描 + 定向修复 (run_all 的派生任务 "health")
+#   python data_health.py --all      # 扫描全部历史
+
+SCAN_DAYS = 120  # 默认扫描窗口 (与 GEFS CSV 的窗口一致)
+GEFS_WINDOW_DAYS = 120
+EIA_RELEASE_LAG_DAYS = 6  # 截至周五的库存周报在下周四发布
+
+# 检查配置: 列名支持通配符
+#   cadence  主键节奏 (天)
+#   required 必填列
+#   range    {列: (下限, 上限)}
+#   repeat   这些列与上一条完全相同视为陈旧
+#   fresh    (日期列, 天数): 主键日期减该列超过天数视为陈旧
+#   repair   修复方式 (REPAIRS)
+CHECKS = {
+    "weather": {
+        "cadence": 1, "required": ["*_Obs", "*_Day7", "*_Day10", "*_Day14"],
+        "range": {"*_Obs": (-6, 6), "*_Day*": (-6, 6)}, "repeat": ["*_Obs"], "repair": "gefs",
+    },
+    "hdd": {
+        "cadence": 1, "required": ["Source_Date", "*_Actual", "*_Dev_Norm", "*_Seas_Total"],
+        "range": {"*_Actual": (0, 600), "*_Dev_Norm": (-250, 250), "*_Seas_Total": (0, 9000)},
+        "fresh": ("Source_Date", 10), "repair": "degree_days",
+    },
+    "cdd": {
+        "cadence": 1, "required": ["Source_Date", "*_Actual", "*_Dev_Norm", "*_Seas_Total"],
+        "range": {"*_Actual": (0, 300), "*_Dev_Norm": (-150, 150), "*_Seas_Total": (0, 6000)},
+        "fresh": ("Source_Date", 10), "repair": "degree_days",
+    },
+    "storage": {
+        "cadence": 1, "required": ["Report_Date", "Total_Stock", "Total_Net_Change"],
+        "range": {"*_Stock": (0, 5000), "*_Net_Change": (-500, 500)},
+        "fresh": ("Report_Date", 14), "repair": "eia",
+    },
+    "storage_weekly": {
+        "cadence": 7, "required": ["Total_Stock", "Total_Net_Change"],
+        "range": {"*_Stock": (0, 5000), "*_Net_Change": (-500, 500)}, "repair": "eia",
+    },
+    "forecasts": {"cadence": 1, "required": ["*_Fcst"], "repair": "gefs"},
+    "scenarios": {"cadence": 1, "required": ["Weight"], "repair": "gefs"},
+}
+
+ISSUE_COLUMNS = ["Source", "Key", "Check", "Columns", "Detail"]
+
+
+# ==========================================
+# 1. 扫描 (Scan)
+# ==========================================
+
+def _expand(patterns, columns):
+    return [c for c in columns if any(fnmatch(c, p) for p in patterns)]
+
+
+def _flagged_columns(mask):
+    """布尔矩阵 -> 每行为 True 的列名 (逗号分隔)，向量化拼接。"""
+    names = np.array([f"{c}," for c in mask.columns], dtype=object)
+    return pd.Series(mask.to_numpy() @ names, index=mask.index).str.rstrip(",")
+
+
+def _issues(source, keys, check, columns="", detail=""):
+    return pd.DataFrame({"Source": source, "Key": pd.DatetimeIndex(keys), "Check": check,
+                         "Columns": columns, "Detail": detail})
+
+
+def _gaps(source, keys, spec, today):
+    present = pd.DatetimeIndex(keys.unique()).sort_values()
+    if present.empty:
+        return None
+    step = timedelta(days=spec["cadence"])
+    # 每日源一直检查到昨天 (今天的运行可能还没发生)；周度源只检查已有范围内部
+    end = max(present[-1], today - step) if spec["cadence"] == 1 else present[-1]
+    expected = pd.date_range(present[0], end, freq=step)
+    missing = expected.difference(present)
+    return _issues(source, missing, "gap", detail=f"缺少主键 (节奏 {spec['cadence']} 天)")
+
+
+def scan_frame(df, source, today=None):
+    """扫描一个源已读入的历史，返回问题表 (每个 主键 x 检查 一行)。"""
+    spec = CHECKS[source]
+    today = pd.Timestamp(today or datetime.now()).normalize()
+    if df.empty:
+        return pd.DataFrame(columns=ISSUE_COLUMNS)
+    key = history_store.SOURCES[source]["key"]
+    df = df.assign(_key=pd.to_datetime(df[key], errors="coerce").dt.normalize()).sort_values("_key", kind="stable")
+    df = df.dropna(subset=["_key"]).reset_index(drop=True)
+    found = [_gaps(source, df["_key"], spec, today)]
+
+    required = _expand(spec.get("required", []), df.columns)
+    if required:
+        mask = df[required].isna()
+        hit = mask.any(axis=1)
+        found.append(_issues(source, df.loc[hit, "_key"], "missing", _flagged_columns(mask[hit]).to_numpy(), "必填列为空"))
+
+    bounds = {}
+    for pattern, (lo, hi) in spec.get("range", {}).items():
+        for col in _expand([pattern], df.columns):
+            bounds.setdefault(col, (lo, hi))
+    if bounds:
+        cols = list(bounds)
+        values = df[cols].apply(pd.to_numeric, errors="coerce")
+        lo = pd.Series({c: b[0] for c, b in bounds.items()})
+        hi = pd.Series({c: b[1] for c, b in bounds.items()})
+        mask = values.lt(lo, axis=1) | values.gt(hi, axis=1)
+        hit = mask.any(axis=1)
+        found.append(_issues(source, df.loc[hit, "_key"], "range", _flagged_columns(mask[hit]).to_numpy(), "超出合理范围"))
+
+    repeat = _expand(spec.get("repeat", []), df.columns)
+    if repeat:
+        # 多行主键 (forecasts / scenarios) 不做逐行比较；这里的源每个主键一行
+        values = df[repeat]
+        same = (values == values.shift()).all(axis=1) & values.notna().all(axis=1)
+        found.append(_issues(source, df.loc[same, "_key"], "stale", ",".join(repeat), "与上一条完全相同"))
+
+    if spec.get("fresh"):
+        col, max_days = spec["fresh"]
+        age = (df["_key"] - pd.to_datetime(df[col], errors="coerce")).dt.days
+        hit = age > max_days
+        found.append(_issues(source, df.loc[hit, "_key"], "stale", col,
+                             age[hit].map(lambda d: f"{col} 落后 {int(d)} 天").to_numpy()))
+
+    found = [f for f in found if f is not None and not f.empty]
+    if not found:
+        return pd.DataFrame(columns=ISSUE_COLUMNS)
+    return pd.concat(found, ignore_index=True).drop_duplicates(["Key", "Check"], ignore_index=True)
+
+
+def scan(sources=None, days=SCAN_DAYS, today=None, root=history_store.HISTORY_ROOT):
+    """扫描各源最近 days 天 (None = 全部历史) 的历史。返回问题表。"""
+    today = pd.Timestamp(today or datetime.now()).normalize()
+    start = None if days is None else today - timedelta(days=days)
+    frames = []
+    for source in sources or CHECKS:
+        if not history_store.has_history(source, root):
+            continue
+        frames.append(scan_frame(history_store.read_history(source, start=start, end=today, root=root), source, today))
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        return pd.DataFrame(columns=ISSUE_COLUMNS)
+    return pd.concat(frames, ignore_index=True).sort_values(["Source", "Key"], kind="stable", ignore_index=True)
+
+
+# ==========================================
+# 2. 修复计划 (Plan)
+# ==========================================
+
+def plan(issues, today=None):
+    """
+    问题表 -> ({修复方式: {源: [主键, ...]}}, 无法修复的问题表)。
+    GEFS 只能修复窗口内的日期；度日报表陈旧 = CPC 尚未发布新一期，重新下载也一样；
+    同一主键多个问题只修一次。
+    """
+    today = pd.Timestamp(today or datetime.now()).normalize()
+    actions, skipped = {}, []
+    for source, group in issues.groupby("Source", sort=False):
+        repair = CHECKS[source]["repair"]
+        if repair == "gefs":
+            outside = group["Key"] < today - timedelta(days=GEFS_WINDOW_DAYS)
+            skipped.append(group[outside].assign(Detail="超出 GEFS 120 天窗口"))
+            group = group[~outside]
+        elif repair == "degree_days":
+            stale = group["Check"] == "stale"
+            skipped.append(group[stale].assign(Detail="当期度日报表尚未更新"))
+            group = group[~stale]
+        keys = group["Key"]
+        if len(keys):
+            actions.setdefault(repair, {})[source] = sorted(set(keys))
+    skipped = [s for s in skipped if not s.empty]
+    return actions, (pd.concat(skipped, ignore_index=True) if skipped else pd.DataFrame(columns=ISSUE_COLUMNS))
+
+
+# ==========================================
+# 3. 定向修复 (Repairs)
+# ==========================================
+
+def _now():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _unchanged(rows, source):
+    """与库中现有版本完全相同的行 (不含 Update_Time)。重建结果没变就不写，避免每次运行重复覆盖、堆积存档。"""
+    key = history_store.SOURCES[source]["key"]
+    keys = pd.to_datetime(rows[key])
+    stored = history_store.read_history(source, start=keys.min(), end=keys.max())
+    if stored.empty:
+        return pd.Series(False, index=rows.index)
+    cols = [c for c in rows.columns if c in stored.columns and c not in (key, "Update_Time")]
+    new = schemas.conform(rows.assign(**{key: keys}), source).set_index(key)[cols]
+    old = stored.drop_duplicates(key, keep="last").set_index(key).reindex(new.index)[cols]
+    same = ((new == old) | (new.isna() & old.isna())).all(axis=1) & new.index.isin(stored[key])
+    return pd.Series(same.to_numpy(), index=rows.index)
+
+
+def _store(rows, source):
+    """写入修复的行 (跳过与现有版本相同的行)，增量更新汇总与快照。"""
+    if rows.empty:
+        return 0
+    rows = rows[~_unchanged(rows, source)]
+    if rows.empty:
+        return 0
+    history_store.upsert_history(rows, source)
+    rollups.update_rows(source, rows)
+    snapshots.publish(source)
+    return len(rows)
+
+
+@fetch_client.with_deadline(climate_collector.FETCH_BUDGET_S)
+def repair_gefs(targets, today=None):
+    """一次下载三个 GEFS CSV，重建窗口内目标日期的 weather 行、预报修正与情景聚类。"""
+    payloads = source_engine.fetch_all(climate_collector.SOURCE)
+    frames = {name: climate_collector.read_index_frame(p) for name, p in payloads.items() if p is not None}
+    if len(frames) < len(payloads):
+        print("   ⚠️ GEFS 下载不完整，跳过 (避免用空值覆盖已有数据)")
+        return {}
+
+    counts, weather_rows = {}, []
+    for date in sorted(set().union(*targets.values())):
+        results = {name: climate_collector.index_on_date(df, name, date) for name, df in frames.items()}
+        if any(r is None for r in results.values()):
+            continue  # 该日不在 CSV 中
+        date_str = date.strftime('%Y-%m-%d')
+        if date in targets.get("weather", ()):
+            weather_rows.append(climate_collector.weather_row(results, date))
+        if date in targets.get(forecast_revisions.SOURCE, ()):
+            means = pd.DataFrame({name: r["trajectory"] for name, r in results.items()})
+            forecast_revisions.update(means.round(4), date_str)
+            counts[forecast_revisions.SOURCE] = counts.get(forecast_revisions.SOURCE, 0) + 1
+        if date in targets.get(ensemble_scenarios.ARCHIVE_SOURCE, ()):
+            members = {name: r["members"] for name, r in results.items() if r["members"] is not None}
+            if ensemble_scenarios.update_archive(members, date_str) is not None:
+                counts[ensemble_scenarios.ARCHIVE_SOURCE] = counts.get(ensemble_scenarios.ARCHIVE_SOURCE, 0) + 1
+
+    if weather_rows:
+        counts["weather"] = _store(pd.DataFrame(weather_rows).assign(Update_Time=_now()), "weather")
+    if forecast_revisions.SOURCE in counts:
+        snapshots.publish(forecast_revisions.SOURCE)
+    return counts
+
+
+def _report_weeks(run_dates, weekly_index, known):
+    """每个运行日当时有效的报告周: 已记录的 Report_Date 优先，否则取发布日 (周次 + 6 天) 不晚于运行日的最新一周。"""
+    cutoff = pd.DatetimeIndex(run_dates) - timedelta(days=EIA_RELEASE_LAG_DAYS)
+    pos = weekly_index.searchsorted(cutoff, side="right") - 1
+    inferred = pd.Series(np.where(pos >= 0, weekly_index[np.clip(pos, 0, None)], pd.NaT), index=run_dates)
+    return known.reindex(run_dates).fillna(inferred)
+
+
+@fetch_client.with_deadline(storage_collector.FETCH_BUDGET_S)
+def repair_eia(targets, today=None):
+    """
+    下载一次 EIA JSON: 合并周度表 (只写变化的分区)，并为目标运行日重建 storage 行。
+    报告周的行与采集器完全一致 (官方 calculated / year_ago)，更早的周次才用序列计算的对比值。
+    """
+    status, payload, _ = fetch_client.get_cached(storage_collector.SOURCE.urls["EIA"], timeout=storage_collector.SOURCE.timeout)
+    if status != 200:
+        print(f"   ❌ EIA 下载失败: HTTP {status}")
+        return {}
+    data_bag, report_date, stocks = storage_collector.parse_eia_report(payload)
+    if stocks is None:
+        return {}
+
+    counts = {}
+    if storage_collector.WEEKLY_SOURCE in targets:
+        storage_collector.update_weekly_history(stocks)
+        snapshots.publish(storage_collector.WEEKLY_SOURCE)
+        have = set(history_store.read_history(storage_collector.WEEKLY_SOURCE,
+                                              start=min(targets[storage_collector.WEEKLY_SOURCE]))["Week_Date"])
+        counts[storage_collector.WEEKLY_SOURCE] = len(set(targets[storage_collector.WEEKLY_SOURCE]) & have)
+
+    run_dates = targets.get(storage_collector.HISTORY_SOURCE)
+    if run_dates:
+        weekly = storage_collector.compute_weekly_deltas(stocks)
+        stored = history_store.read_history(storage_collector.HISTORY_SOURCE, start=run_dates[0], end=run_dates[-1])
+        known = pd.Series(dtype="datetime64[ns]")
+        if not stored.empty:
+            known = pd.to_datetime(stored.set_index("Run_Date")["Report_Date"], errors="coerce").dropna()
+        weeks = _report_weeks(pd.DatetimeIndex(run_dates), weekly.index, known).dropna()
+        weeks = weeks[weeks.isin(weekly.index)]
+        if not weeks.empty:
+            rows = weekly.loc[weeks.to_numpy()].reset_index(drop=True)
+            rows.insert(0, "Run_Date", weeks.index.strftime('%Y-%m-%d'))
+            rows.insert(1, "Report_Date", pd.DatetimeIndex(weeks.to_numpy()).strftime('%Y-%m-%d'))
+            if data_bag and report_date:
+                # 报告周: 与同一周其他运行日 (采集器写入) 保持一致，否则 5 年均值 / 去年同期会跳变
+                official = storage_collector.report_row(data_bag, report_date)
+                current = rows["Report_Date"] == official["Report_Date"]
+                for col, val in official.items():
+                    rows.loc[current, col] = val
+            rows["Update_Time"] = _now()
+            counts[storage_collector.HISTORY_SOURCE] = _store(rows, storage_collector.HISTORY_SOURCE)
+    return counts
+
+
+DEGREE_DAY_COLLECTORS = {"hdd": hdd_collector, "cdd": cdd_collector}
+
+
+def repair_degree_days(targets, today=None):
+    """
+    hdd / cdd 旧报表无法重新下载，只做本地推断:
+      1. Source_Date 为空: 从数值完全相同 (同一期报表) 且日期已知的行复制
+      2. 缺失的运行日: 前后两行是同一期报表时按前一行补齐
+      3. 今天仍有问题: 重跑采集器
+    """
+    today = pd.Timestamp(today or datetime.now()).normalize()
+    counts = {}
+    for source, keys in targets.items():
+        keys = pd.DatetimeIndex(keys)
+        df = history_store.read_history(source, start=keys.min() - timedelta(days=14), end=keys.max() + timedelta(days=14))
+        fixed = []
+        if not df.empty:
+            values = [c for c in df.columns if c not in ("Run_Date", "Source_Date", "Update_Time")]
+            dated = df.dropna(subset=["Source_Date"]).drop_duplicates(values, keep="last")
+
+            # 1. 空 Source_Date -> 同一期报表的日期
+            blank = df[df["Source_Date"].isna() & df["Run_Date"].isin(keys)]
+            if not blank.empty:
+                match = blank.drop(columns=["Source_Date"]).merge(dated[values + ["Source_Date"]], on=values, how="inner")
+                fixed.append(match)
+
+            # 2. 缺口: 前后两行为同一期报表 (Source_Date 与数值都相同)
+            gaps = pd.DataFrame({"Run_Date": keys.difference(pd.DatetimeIndex(df["Run_Date"]))})
+            if not gaps.empty:
+                ordered = df.dropna(subset=["Source_Date"]).sort_values("Run_Date")
+                prev = pd.merge_asof(gaps, ordered, on="Run_Date", direction="backward")
+                nxt = pd.merge_asof(gaps, ordered, on="Run_Date", direction="forward")
+                a, b = prev[["Source_Date"] + values], nxt[["Source_Date"] + values]
+                same = ((a == b) | (a.isna() & b.isna())).all(axis=1) & prev["Source_Date"].notna()
+                fixed.append(prev[same.to_numpy()])
+
+        rows = pd.concat(fixed, ignore_index=True) if fixed else pd.DataFrame()
+        if not rows.empty:
+            rows = rows.assign(Update_Time=_now())
+            counts[source] = _store(rows, source)
+
+        # 3. 今天的问题: 重跑一次采集器 (只有当期报表可下载)
+        done = set(pd.DatetimeIndex(rows["Run_Date"])) if not rows.empty else set()
+        if any(k >= today and k not in done for k in keys):
+            if DEGREE_DAY_COLLECTORS[source].run_collector() is not None:
+                counts[source] = counts.get(source, 0) + 1
+    return counts
+
+
+# 修复方式 -> 函数 (targets = {源: [主键, ...]}, today)
+REPAIRS = {
+    "gefs": repair_gefs,
+    "eia": repair_eia,
+    "degree_days": repair_degree_days,
+}
+
+
+def repair(actions, today=None):
+    """执行修复计划，返回 {源: 修复的主键数}。单个修复出错只打印警告。"""
+    counts = {}
+    for name, targets in actions.items():
+        try:
+            counts.update(REPAIRS[name](targets, today))
+        except Exception as e:
+            print(f"   ❌ [{name}] 修复出错: {e}")
+    return counts
+
+
+# ==========================================
+# 4. 入口 (Entry)
+# ==========================================
+
+def print_issues(issues):
+    if issues.empty:
+        print("   ✅ 未发现问题")
+        return
+    summary = issues.groupby(["Source", "Check"]).agg(Keys=("Key", "size"), First=("Key", "min"), Last=("Key", "max"))
+    for (source, check), r in summary.iterrows():
+        print(f"   ⚠️ {source:<15} {check:<8} {r.Keys:>4} 个主键  ({r.First:%Y-%m-%d} .. {r.Last:%Y-%m-%d})")
+
+
+@collector_metrics.instrumented("health")
+def run_collector(days=SCAN_DAYS, fix=True, today=None):
+    """扫描 (并修复) 最近 days 天。返回修复后仍存在的问题表。"""
+    print(f"🩺 [Data Health] 扫描最近 {days or '全部'} 天: {_now()}")
+    issues = scan(days=days, today=today)
+    print_issues(issues)
+    collector_metrics.add("health_issues", len(issues))
+    if not fix or issues.empty:
+        return issues
+
+    actions, skipped = plan(issues, today)
+    if not skipped.empty:
+        print(f"   ⏭️ {len(skipped)} 个问题无法修复 (" + ", ".join(sorted(set(skipped["Detail"]))) + ")")
+    counts = repair(actions, today)
+    collector_metrics.add("health_repaired", sum(counts.values()))
+    for source, n in counts.items():
+        if n:
+            print(f"   🔧 {source}: 修复 {n} 个主键")
+
+    remaining = scan(days=days, today=today)
+    print(f"   📋 修复后剩余 {len(remaining)} 个问题")
+    return remaining
+
+
+if __name__ == "__main__":
+    import sys
+
+    args = sys.argv[1:]
+    run_collector(days=None if "--all" in args else SCAN_DAYS, fix="repair" in args)
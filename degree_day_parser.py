@@ -0,0 +1,157 @@
+import pandas as pd
+from datetime import datetime
+import re
+
+# ==========================================
+# 1. 报表版式声明 (Layout Specs)
+# ==========================================
+# 每个 CPC 度日产品只需在这里声明：URL、截止日期句式、分段标题 (正则)、数值列含义。
+# 新增产品 = 新增一项配置，解析引擎本身不需要改动。
+
+BASE_URL = "https://www.cpc.ncep.noaa.gov/products/analysis_monitoring/cdus/degree_days"
+
+DATE_PATTERN = r"LAST DATE OF DATA COLLECTION PERIOD IS\s+(\w+)\s+(\d+),\s+(\d{4})"
+
+# 每行数值的列含义 (周值 / 距平 / 同比 / 季累计 / 季累计距平 / 季累计同比)
+WEEKLY_FIELDS = ["Actual", "Dev_Norm", "Dev_Year", "Seas_Total", "Seas_Dev_Norm", "Seas_Dev_Year"]
+
+LAYOUTS = {
+    "HDD": {
+        "url": f"{BASE_URL}/wsahddy.txt",
+        "date_pattern": DATE_PATTERN,
+        # 文件开头默认是人口加权段，遇到标题后切换到燃气用户加权段
+        "default_section": "POP",
+        "sections": {
+            "GAS": "GAS HOME HEATING CUSTOMER WEIGHTED",
+            "POP": r"POPULATION[- ]WEIGHTED",
+        },
+        "fields": WEEKLY_FIELDS,
+        "min_fields": 4,
+    },
+    "CDD": {
+        "url": f"{BASE_URL}/wsacddy.txt",
+        "date_pattern": DATE_PATTERN,
+        "default_section": "POP",
+        "sections": {
+            "POP": r"POPULATION[- ]WEIGHTED",
+        },
+        "fields": WEEKLY_FIELDS,
+        "min_fields": 4,
+    },
+}
+
+# 人口普查分区 (其余行按州处理)
+CENSUS_DIVISIONS = {
+    "NEW ENGLAND", "MIDDLE ATLANTIC", "E N CENTRAL", "W N CENTRAL", "SOUTH ATLANTIC",
+    "E S CENTRAL", "W S CENTRAL", "MOUNTAIN", "PACIFIC",
+}
+NATIONAL = "UNITED STATES"
+
+# 数据行：名称 (大写字母开头) + 若干整数列
+ROW_PATTERN = r"^[ \t]*(?P<name>[A-Z][A-Z.&/' ]*?[A-Z.])[ \t]+(?P<values>-?\d+(?:[ \t]+-?\d+)*)[ \t\r]*$"
+_NUM = re.compile(r"-?\d+")
+
+_compiled = {}
+
+
+# ==========================================
+# 2. 解析引擎 (Engine)
+# ==========================================
+
+def compile_layout(product):
+    """
+    把版式声明编译成一个合并正则 (分段标题 | 数据行)，每个产品只编译一次。
+    整份报表由 finditer 在一次扫描中完成切分。
+    """
+    if product not in _compiled:
+        layout = LAYOUTS[product]
+        section_alts = "|".join(
+            f"(?P<S_{key}>{marker})" for key, marker in layout["sections"].items()
+        )
+        scanner = re.compile(f"{section_alts}|{ROW_PATTERN}", re.MULTILINE)
+        _compiled[product] = (scanner, re.compile(layout["date_pattern"], re.IGNORECASE))
+    return _compiled[product]
+
+
+def parse_source_date(text_content, product="HDD"):
+    """提取报表截止日期，例如 "... PERIOD IS NOV 22, 2025" -> "2025-11-22"。"""
+    _, date_re = compile_layout(product)
+    try:
+        match = date_re.search(text_content)
+        if match:
+            month_str, day_str, year_str = match.groups()
+            return datetime.strptime(f"{month_str} {day_str} {year_str}", "%b %d %Y").strftime("%Y-%m-%d")
+    except Exception as e:
+        print(f"⚠️ 警告: 无法解析源数据日期，错误: {e}")
+    return "Unknown"
+
+
+def region_kind(name):
+    if name == NATIONAL:
+        return "National"
+    if name in CENSUS_DIVISIONS:
+        return "Division"
+    return "State"
+
+
+def parse_report(text_content, product="HDD"):
+    """
+    单次扫描解析一份度日报表。
+    返回：(rows, source_date)
+      - rows: DataFrame，列为 Section / Name / Kind + 版式声明中的数值列
+    """
+    layout = LAYOUTS[product]
+    scanner, _ = compile_layout(product)
+    fields = layout["fields"]
+    min_fields = layout["min_fields"]
+    section_keys = list(layout["sections"])
+
+    section = layout["default_section"]
+    records = []
+    for match in scanner.finditer(text_content):
+        group = match.lastgroup
+        if group and group.startswith("S_"):
+            section = group[2:]
+            continue
+
+        numbers = _NUM.findall(match.group("values"))
+        if len(numbers) < min_fields:
+            continue
+        name = " ".join(match.group("name").split())
+        record = {"Section": section, "Name": name, "Kind": region_kind(name)}
+        record.update(zip(fields, map(int, numbers)))
+        records.append(record)
+
+    rows = pd.DataFrame(records, columns=["Section", "Name", "Kind"] + fields)
+    if not rows.empty:
+        rows["Section"] = pd.Categorical(rows["Section"], categories=section_keys)
+    return rows, parse_source_date(text_content, product)
+
+
+def select_regions(rows, section, regions):
+    """
+    从解析结果中取出指定分段的目标地区。
+    regions: {报表名称: 列前缀}，返回 {前缀: {字段: 值}}
+    """
+    subset = rows[(rows["Section"] == section) & rows["Name"].isin(regions)]
+    subset = subset.drop_duplicates(subset="Name", keep="first").set_index("Name")
+    fields = [c for c in subset.columns if c not in ("Section", "Kind")]
+    return {
+        regions[name]: {f: int(v) for f, v in values.items() if pd.notna(v)}
+        for name, values in subset[fields].iterrows()
+    }
+
+
+def parse_archive(paths, product="HDD"):
+    """
+    批量解析本地归档 (同一产品的多份历史报表)，返回带 Source_Date 列的长表。
+    """
+    frames = []
+    for path in paths:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            rows, source_date = parse_report(f.read(), product)
+        if not rows.empty:
+            frames.append(rows.assign(Source_Date=source_date))
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
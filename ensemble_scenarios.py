@@ -0,0 +1,185 @@
+import pandas as pd
+import numpy as np
+import history_store
+import snapshots
+
+# ==========================================
+# 1. 配置区域 (Configuration)
+# ==========================================
+# 把 GEFS 各成员的 AO/NAO/PNA 联合轨迹 (lead 0-14) 聚成若干情景，
+# 避免集合平均把 "一半强负 NAO + 一半中性" 这种双峰结果抹平。
+# 全部计算为 numpy 向量化，初始化确定 (无随机数)，同样输入必得同样结果。
+
+ARCHIVE_SOURCE = "scenarios"  # history/scenarios/<YYYY-MM>.csv
+
+INDICES = ["AO", "NAO", "PNA"]
+LEADS = list(range(0, 15))
+MAX_K = 4
+MIN_WEIGHT = 0.1  # 任一情景成员占比低于该值则不接受这个 k
+MIN_SILHOUETTE = 0.25  # 轮廓系数低于该值视为单峰 (k = 1)
+MAX_ITER = 50
+
+
+# ==========================================
+# 2. 聚类 (Clustering)
+# ==========================================
+
+def build_member_matrix(members):
+    """
+    members: {指标: DataFrame(index=成员, columns=lead)}
+    返回：(X, member_ids)，X 为 成员 x (指标 x lead) 的矩阵
+    """
+    frames = [members[name].reindex(columns=LEADS) for name in INDICES if name in members]
+    if len(frames) != len(INDICES):
+        return None, None
+    common = frames[0].index
+    for f in frames[1:]:
+        common = common.intersection(f.index)
+    X = np.hstack([f.loc[common].to_numpy(dtype=float) for f in frames])
+    keep = ~np.isnan(X).any(axis=1)
+    return X[keep], list(common[keep])
+
+
+def pairwise_dist(A, B):
+    sq = (A ** 2).sum(1)[:, None] + (B ** 2).sum(1)[None, :] - 2 * A @ B.T
+    return np.sqrt(np.maximum(sq, 0))
+
+
+def init_centers(X, k):
+    """确定性初始化: 从最接近集合平均的成员出发，依次取距离已选中心最远的成员。"""
+    first = int(np.argmin(pairwise_dist(X, X.mean(0, keepdims=True))[:, 0]))
+    chosen = [first]
+    for _ in range(1, k):
+        d = pairwise_dist(X, X[chosen]).min(axis=1)
+        chosen.append(int(np.argmax(d)))
+    return X[chosen].copy()
+
+
+def kmeans(X, k):
+    centers = init_centers(X, k)
+    labels = np.zeros(len(X), dtype=int)
+    for it in range(MAX_ITER):
+        new_labels = pairwise_dist(X, centers).argmin(axis=1)
+        if it > 0 and np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        onehot = np.eye(k)[labels]
+        counts = onehot.sum(0)
+        centers = np.where(counts[:, None] > 0, (onehot.T @ X) / np.maximum(counts, 1)[:, None], centers)
+    return labels, centers
+
+
+def silhouette(X, labels, k):
+    D = pairwise_dist(X, X)
+    onehot = np.eye(k)[labels]
+    counts = onehot.sum(0)
+    sums = D @ onehot  # 每个成员到各簇的距离和
+    own = counts[labels]
+    a = sums[np.arange(len(X)), labels] / np.maximum(own - 1, 1)
+    mean_other = np.where(onehot.astype(bool), np.inf, sums / np.maximum(counts, 1))
+    b = mean_other.min(axis=1)
+    s = np.where(own > 1, (b - a) / np.maximum(a, b), 0)
+    return float(s.mean())
+
+
+def cluster_scenarios(members):
+    """
+    返回：(labels, centers, k, score)；centers 为 k x (指标 x lead)。
+    在 k = 2..MAX_K 中取轮廓系数最高且各簇占比不过小的方案，否则视为单一情景。
+    """
+    X, member_ids = build_member_matrix(members)
+    if X is None or len(X) < 4:
+        return None
+
+    best = (np.zeros(len(X), dtype=int), X.mean(0, keepdims=True), 1, None)
+    best_score = MIN_SILHOUETTE
+    for k in range(2, min(MAX_K, len(X) - 1) + 1):
+        labels, centers = kmeans(X, k)
+        weights = np.bincount(labels, minlength=k) / len(X)
+        if weights.min() < MIN_WEIGHT:
+            continue
+        score = silhouette(X, labels, k)
+        if score > best_score:
+            best, best_score = (labels, centers, k, score), score
+    return best
+
+
+# ==========================================
+# 3. 情景表 (Scenario Table)
+# ==========================================
+
+def scenario_rows(date_str, labels, centers, k, score):
+    """按权重从大到小编号 (S1, S2, ...)，每个情景 x 指标一行，列为各 lead 的质心值。"""
+    weights = np.bincount(labels, minlength=k) / len(labels)
+    order = np.argsort(-weights, kind="stable")
+    rows = []
+    for rank, c in enumerate(order, start=1):
+        path = centers[c].reshape(len(INDICES), len(LEADS))
+        for name, values in zip(INDICES, path):
+            row = {
+                "Date": date_str,
+                "Scenario": f"S{rank}",
+                "Weight": round(float(weights[c]), 3),
+                "Members": int((labels == c).sum()),
+                "Silhouette": None if score is None else round(score, 3),
+                "Index": name,
+            }
+            row.update({f"L{lead}": round(float(v), 4) for lead, v in zip(LEADS, values)})
+            rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def attach_previous_weights(today, archive):
+    """
+    与上一次运行的情景按质心最近距离配对，写入 Prev_Scenario / Prev_Weight，
+    便于逐日比较情景权重的变化。
+    """
+    today = today.copy()
+    today["Prev_Scenario"] = None
+    today["Prev_Weight"] = np.nan
+    if archive is None or archive.empty:
+        return today
+    prev_dates = archive.loc[archive["Date"] < pd.Timestamp(today["Date"].iloc[0]), "Date"]
+    if prev_dates.empty:
+        return today
+    prev = archive[archive["Date"] == prev_dates.max()]
+
+    lead_cols = [f"L{lead}" for lead in LEADS]
+
+    def centroid_matrix(df):
+        wide = df.pivot(index="Scenario", columns="Index", values=lead_cols)
+        wide = wide.reindex(columns=pd.MultiIndex.from_product([lead_cols, INDICES]))
+        return wide.index, wide.to_numpy(dtype=float)
+
+    t_ids, t_mat = centroid_matrix(today)
+    p_ids, p_mat = centroid_matrix(prev)
+    nearest = pairwise_dist(np.nan_to_num(t_mat), np.nan_to_num(p_mat)).argmin(axis=1)
+    prev_weight = prev.drop_duplicates("Scenario").set_index("Scenario")["Weight"]
+
+    match = dict(zip(t_ids, p_ids[nearest]))
+    today["Prev_Scenario"] = today["Scenario"].map(match)
+    today["Prev_Weight"] = today["Prev_Scenario"].map(prev_weight)
+    return today
+
+
+def update_archive(members, date_str):
+    """聚类并写入情景归档 (同一天重复运行则覆盖)。返回当日情景表。"""
+    result = cluster_scenarios(members)
+    if result is None:
+        print("   ⚠️ 成员数据不足，跳过情景聚类")
+        return None
+    labels, centers, k, score = result
+
+    today = scenario_rows(date_str, labels, centers, k, score)
+    # 只需最近一次运行作对比: 读取近两个月的分区即可
+    recent_start = (pd.Timestamp(date_str) - pd.DateOffset(months=1)).strftime("%Y-%m-01")
+    archive = history_store.read_history(ARCHIVE_SOURCE, start=recent_start)
+    today = attach_previous_weights(today, archive)
+    # 同一天重复运行: 该日期的旧情景整体被替换
+    history_store.upsert_history(today.sort_values(["Date", "Scenario", "Index"]), ARCHIVE_SOURCE)
+    snapshots.publish(ARCHIVE_SOURCE)
+
+    summary = today.drop_duplicates("Scenario")[["Scenario", "Weight", "Prev_Weight"]]
+    print(f"   🧬 情景聚类: k={k} | " + ", ".join(
+        f"{r.Scenario} {r.Weight:.0%}" for r in summary.itertuples()))
+    return today
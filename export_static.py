@@ -0,0 +1,363 @@
+import html
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+
+import pandas as pd
+import data_loader
+import history_store
+import schemas
+import styles
+
+# ==========================================
+# 静态快照导出 (Static Site Export)
+# ==========================================
+# 大多数人只看最新状态，没必要每人占一个 streamlit 会话。每次采集完成后运行本脚本，
+# 用看板同一套 loader (data_loader) 与样式 (styles.py) 把页面渲染成静态文件:
+#   site/index.html            实时监控 (侧边栏指标 + 遥相关 + ENSO + 投影 + 情景 + 决策矩阵)
+#   site/history.html          历史回溯 (气象 / HDD / 库存，回看 EXPORT_LOOKBACK_DAYS 天)
+#   site/data/latest.json      实时页用到的数值
+#   site/data/<source>.json    历史页的原始行 (与历史库 CSV 同一写法)
+#   site/manifest.json         生成时间与各源的 history_store.stamp
+# 整个目录先写到临时目录再替换，任何静态文件服务器 (nginx / S3 / python -m http.server) 都能直接托管。
+#
+# 用法: python export_static.py [--out site]
+
+SITE_DIR = os.environ.get("SITE_DIR", "site")
+EXPORT_LOOKBACK_DAYS = 366  # 与看板历史页默认的 "1 年" 一致
+HISTORY_SOURCES = [data_loader.WEATHER_SOURCE, data_loader.HDD_SOURCE, data_loader.STORAGE_SOURCE]
+
+# 静态页的布局 (看板里由 streamlit 提供的部分: 侧边栏、分栏、提示框、表格)
+PAGE_CSS = """
+    <style>
+    body { font-family: "Source Sans Pro", -apple-system, "Segoe UI", sans-serif; margin: 0; color: #31333f; }
+    .layout { display: flex; min-height: 100vh; }
+    .sidebar { width: 340px; flex-shrink: 0; background-color: #f8f9fa; padding: 2rem 1.2rem; box-sizing: border-box; }
+    .main { flex: 1; padding: 1.5rem 3rem 1rem 3rem; min-width: 0; }
+    .nav a { margin-right: 16px; font-weight: 600; text-decoration: none; color: #1565c0; }
+    .nav a.active { color: #212121; border-bottom: 2px solid #1565c0; }
+    .caption { color: #808495; font-size: 0.85em; margin: 4px 0 12px 0; }
+    .row { display: flex; gap: 1.2rem; align-items: flex-start; }
+    .row > div { flex: 1; min-width: 0; }
+    .metric { margin-bottom: 14px; }
+    .metric-label { font-size: 0.85em; color: #555; }
+    .metric-value { font-size: 1.8em; font-weight: 600; }
+    .metric-delta { font-size: 0.85em; color: #555; margin-bottom: 18px; }
+    .alert { padding: 12px 16px; border-radius: 6px; font-weight: 600; }
+    .alert-success { background-color: #e8f5e9; color: #1b5e20; }
+    .alert-error { background-color: #ffebee; color: #b71c1c; }
+    .alert-warning { background-color: #fff8e1; color: #795548; }
+    .alert-info { background-color: #e3f2fd; color: #0d47a1; }
+    .table-wrap { overflow: auto; max-height: 600px; border: 1px solid #eee; border-radius: 4px; }
+    .table-wrap table { border-collapse: collapse; font-size: 0.85em; width: 100%; }
+    .table-wrap th, .table-wrap td { padding: 4px 8px; border-bottom: 1px solid #f0f0f0; white-space: nowrap; }
+    .table-wrap th { background-color: #fafafa; position: sticky; top: 0; }
+    hr { border: none; border-top: 1px solid #e6e6e6; margin: 1.5rem 0; }
+    </style>
+"""
+
+
+# ==========================================
+# 1. 页面片段 (Fragments)
+# ==========================================
+
+def _bold(text):
+    """决策矩阵标题里的 **粗体** (streamlit markdown 语法) 转为 HTML。"""
+    parts = html.escape(text).split("**")
+    return "".join(f"<b>{p}</b>" if i % 2 else p for i, p in enumerate(parts))
+
+
+def _alert(kind, text):
+    return f"<div class='alert alert-{kind}'>{_bold(text)}</div>"
+
+
+def _table(styler):
+    return f"<div class='table-wrap'>{styler.to_html()}</div>"
+
+
+def _metric(label, value, delta=None):
+    delta_html = f"<div class='metric-delta'>{html.escape(str(delta))}</div>" if delta else ""
+    return (f"<div class='metric'><div class='metric-label'>{html.escape(str(label))}</div>"
+            f"<div class='metric-value'>{html.escape(str(value))}</div>{delta_html}</div>")
+
+
+def _page(title, active, sidebar, body, generated):
+    nav = "".join(
+        f"<a href='{href}' class='{'active' if href == active else ''}'>{label}</a>"
+        for href, label in [("index.html", "🚀 实时监控"), ("history.html", "📅 历史回溯")]
+    )
+    return f"""<!DOCTYPE html>
+<html lang="zh-CN">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>{html.escape(title)} · Climate–Natural Gas Analytics</title>
+{styles.DASHBOARD_CSS}
+{PAGE_CSS}
+</head>
+<body>
+<div class="layout">
+<div class="sidebar">{sidebar}</div>
+<div class="main">
+<div class="nav">{nav}</div>
+{body}
+<hr><div class="caption">静态快照生成于 {generated} · 数据: <a href="data/latest.json">latest.json</a> · <a href="manifest.json">manifest.json</a></div>
+</div>
+</div>
+</body>
+</html>
+"""
+
+
+# ==========================================
+# 2. 实时监控页 (Realtime)
+# ==========================================
+
+def render_sidebar(payload):
+    parts = []
+
+    # ---- 度日数据板块 (冬季 HDD / 夏季 CDD 自动切换) ----
+    dd_kind = data_loader.current_season()
+    dd_data, dd_date = data_loader.load_degree_days(dd_kind)
+    if not dd_data:
+        dd_kind = "HDD" if dd_kind == "CDD" else "CDD"
+        dd_data, dd_date = data_loader.load_degree_days(dd_kind)
+    parts.append(f"<h3>{data_loader.DEGREE_DAY_PANELS[dd_kind]['title']}</h3>")
+    if dd_data:
+        cells = []
+        for label, data in dd_data.items():
+            cells.append("<div>" + _metric(label, data.get("actual", "-"), f"{data.get('dev_normal', 0)} (Norm)")
+                         + styles.dev_year_html(data.get("dev_last_year", 0)) + "</div>")
+        rows = ["<div class='row'>" + "".join(cells[i:i + 2]) + "</div>" for i in range(0, len(cells), 2)]
+        parts.append("".join(rows) + f"<div class='caption'>📅 Source Updated: {dd_date}</div>")
+        payload["degree_days"] = {"kind": dd_kind, "source_date": dd_date, "regions": dd_data}
+    else:
+        parts.append(_alert("warning", f"{dd_kind} 数据暂不可用"))
+    parts.append("<hr>")
+
+    # ---- EIA 模块 ----
+    parts.append("<h3>🏦 EIA 天然气库存</h3>")
+    eia_df, eia_date = data_loader.load_eia_total()
+    if eia_df is not None:
+        parts.append(_table(styles.eia_total_styler(eia_df)))
+        parts.append(f"<div class='caption'>📅 Source Updated: {eia_date}</div>")
+        payload["eia"] = {"report_date": eia_date, "table": json.loads(eia_df.to_json(orient="index"))}
+    else:
+        parts.append("<p>未找到 EIA 数据。</p>")
+
+    # ---- 库存预测 ----
+    nowcast, nowcast_prev = data_loader.load_nowcast()
+    if nowcast:
+        band = None
+        if pd.notna(nowcast.get("Lower")) and pd.notna(nowcast.get("Upper")):
+            band = f"90%: {nowcast['Lower']:+.0f} ~ {nowcast['Upper']:+.0f}"
+        parts.append("<h5>📈 下周净变化预测 (Model)</h5>")
+        parts.append(_metric(f"Model {nowcast['Target_Week']}", f"{nowcast['Expected']:+.0f}", band))
+        if nowcast_prev:
+            parts.append(f"<div class='caption'>上期 {nowcast_prev['Target_Week']}: 预测 {nowcast_prev['Expected']:+.0f}"
+                         f" / 实际 {nowcast_prev['Actual']:+.0f}</div>")
+        payload["nowcast"] = {"latest": nowcast, "previous": nowcast_prev}
+    parts.append("<hr>")
+
+    # ---- 其它导航 ----
+    links = styles.LINKS
+    parts.append(f"""<h3>🏛️ 官方数据源</h3>
+<ul><li><a href="{links['NOAA_HOME']}">NOAA CPC 气候预测</a></li>
+<li><a href="{styles.IMG_URLS['LANINA']}"><b>ENSO / 拉尼娜周报</b></a></li></ul>
+<h3>⚡ 能源行情</h3>
+<ul><li><a href="{links['YAHOO_NG']}"><b>NG=F</b> (天然气期货)</a></li>
+<li><a href="{links['YAHOO_EQT']}"><b>EQT</b> (生产商股价)</a></li>
+<li><a href="{links['YAHOO_BOIL']}"><b>BOIL</b> (2倍做多ETF)</a></li></ul>
+<h3>🚂 交通运输</h3>
+<ul><li><a href="{links['YAHOO_CSX']}"><b>CSX</b> (美东铁路)</a></li>
+<li><a href="{links['YAHOO_UNP']}"><b>UNP</b> (联合太平洋)</a></li>
+<li><a href="{links['YAHOO_UAL']}"><b>UAL</b> (联合航空)</a></li></ul>
+<div class='caption'>Geoscience & Financial Analytics MH</div>""")
+    return "".join(parts)
+
+
+def render_realtime(payload, generated):
+    parts = ["<h1>⚛️ 天然气气象分析终端</h1>", f"<div class='caption'><b>数据更新 (Last Updated):</b> {generated}</div><hr>"]
+
+    # === 核心气象板块 ===
+    latest = history_store.read_latest(data_loader.WEATHER_SOURCE)
+    latest_data = None if latest.empty else latest.iloc[-1].to_dict()
+    parts.append("<h2>📡 大气遥相关机制 (Atmospheric Teleconnections)</h2>"
+                 "<div class='caption'>注：图表展示 GEFS 集合预报发散度。红线 (Mean) 代表主流趋势。</div>")
+    for panel in styles.TELECONNECTION_TABS:
+        index = panel["index"]
+        value_card = styles.index_value_card_html(index, latest_data) if latest_data else \
+            _alert("warning", "⚠️ 数据库尚未更新，请运行 'climate_collector.py' 获取数据。")
+        parts.append(f"""<h3>{panel['label']}</h3>
+<div class='row'><div style='flex:1'>{styles.clickable_image_html(styles.IMG_URLS[index], index)}</div>
+<div style='flex:1.5'>{panel['tag']}{styles.signal_card_html(*panel['card'])}{value_card}</div></div>""")
+    if latest_data:
+        # 历史库数值列为 float32，按 CSV 的 4 位小数写出 (避免 0.29219999 之类的尾数)
+        payload["teleconnections"] = {k: round(float(v), 4) if isinstance(v, float) else v
+                                      for k, v in latest_data.items()}
+
+    # === ENSO ===
+    enso = data_loader.fetch_enso_summary(styles.IMG_URLS["LANINA"])
+    parts.append("<h3>🌊 NOAA ENSO 周报</h3>" + _alert("info", f"**Current Status:** {enso['status']}"))
+    if enso["body"]:
+        parts.append("<ul>" + "".join(f"<li>{html.escape(s)}</li>" for s in enso["body"]) + "</ul>")
+    payload["enso"] = enso
+
+    # === 未来两周 HDD 距平投影 ===
+    proj_df, proj_date = data_loader.load_hdd_projection()
+    if proj_df is not None:
+        parts.append("<hr><h2>🌡️ 未来两周燃气加权 HDD 距平投影 (Teleconnection → HDD)</h2>"
+                     f"<div class='caption'>基于 {proj_date} GEFS 集合平均轨迹 × 历史回归系数。正值 = 比常年更冷 (利多)。</div>"
+                     + _table(styles.projection_styler(proj_df)))
+        payload["hdd_projection"] = {"run_date": proj_date, "table": json.loads(proj_df.to_json(orient="index"))}
+
+    # === GEFS 集合情景 ===
+    scen_df, scen_date = data_loader.load_scenarios()
+    if scen_df is not None:
+        parts.append("<hr><h2>🧬 GEFS 集合情景 (Ensemble Scenarios)</h2>"
+                     f"<div class='caption'>{scen_date} 各成员按 AO/NAO/PNA 联合轨迹 (lead 0-14) 聚类。"
+                     "Δ vs Prev = 与上一次运行的对应情景相比的权重变化 (百分点)。</div>"
+                     + _table(styles.scenario_styler(scen_df)))
+        payload["scenarios"] = {"date": scen_date, "table": json.loads(scen_df.to_json(orient="index"))}
+
+    # === 决策矩阵 ===
+    cells = "".join(f"<div>{_alert(kind, title)}{content}</div>" for kind, title, content in styles.DECISION_MATRIX)
+    parts.append(f"<hr><h2>🎯 宏观交易决策矩阵 (Decision Matrix)</h2><div class='row'>{cells}</div>")
+    return "".join(parts)
+
+
+# ==========================================
+# 3. 历史回溯页 (History)
+# ==========================================
+
+def render_history(frames):
+    parts = [f"<h1>📅 历史数据库 (Historical Data Archive)</h1>"
+             f"<div class='caption'>回看 {EXPORT_LOOKBACK_DAYS} 天 · 原始数据见 data/&lt;source&gt;.json</div>"]
+
+    # --- 1. 气象历史 (三塔布局) ---
+    parts.append("<h2>☁️ 气象 (Weather)</h2><h3>📡 遥相关趋势追踪</h3>")
+    df = frames[data_loader.WEATHER_SOURCE]
+    views = data_loader.build_weather_history_views(df) if not df.empty else None
+    if views:
+        cells = "".join(f"<div><h5>{name}</h5>{_table(styles.weather_history_styler(views[name], name))}</div>"
+                        for name in ["AO", "NAO", "PNA"])
+        parts.append(f"<div class='row'>{cells}</div>")
+    else:
+        parts.append(_alert("info", "暂无数据"))
+
+    # --- 2. HDD 历史 ---
+    parts.append("<h2>🔥 需求 (HDD)</h2><div class='caption'>Act:实际 | Dev:距平 | YoY:同比 (Run Date = 脚本获取日)</div>")
+    df = frames[data_loader.HDD_SOURCE]
+    if not df.empty:
+        views = data_loader.build_hdd_history_views(df)
+        east = views["east"]
+        color_cols = [c for c in east.columns if "Dev" in c or "YoY" in c]
+        num_cols = [c for c in east.columns if "Act" in c or "Dev" in c or "YoY" in c]
+        parts.append(f"""<div class='row'>
+<div style='flex:2.3'><b>🏙 美东 (East)</b>{_table(styles.hdd_history_styler(east, color_cols, num_cols))}</div>
+<div><b>🏭 中西部 (Midwest)</b>{_table(styles.hdd_history_styler(views['mw'], ['Dev', 'YoY']).hide(axis='index'))}</div>
+<div><b>🇺🇸 全美 (US Total)</b>{_table(styles.hdd_history_styler(views['us'], ['Dev', 'YoY']).hide(axis='index'))}</div>
+</div>""")
+    else:
+        parts.append(_alert("info", "暂无数据"))
+
+    # --- 3. EIA 历史 ---
+    parts.append("<h2>🏦 库存 (EIA)</h2><h3>🏦 库存全景 (Detailed Storage Report)</h3>")
+    df = frames[data_loader.STORAGE_SOURCE]
+    view_df = data_loader.build_eia_history_view(df) if not df.empty else None
+    parts.append(_table(styles.eia_history_styler(view_df)) if view_df is not None else _alert("info", "暂无数据"))
+    return "".join(parts)
+
+
+# ==========================================
+# 4. 导出 (Export)
+# ==========================================
+
+def _plain(value):
+    """转为可写入 JSON 的值: numpy 标量转 Python 数值，NaN / NaT 转 null，日期转字符串。"""
+    if isinstance(value, dict):
+        return {str(k): _plain(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(v) for v in value]
+    if value is None or isinstance(value, (str, bool)):
+        return value
+    if pd.isna(value):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.strftime("%Y-%m-%d") if value == value.normalize() else value.strftime("%Y-%m-%d %H:%M:%S")
+    if hasattr(value, "item"):
+        value = value.item()
+    return value if isinstance(value, (int, float)) else str(value)
+
+
+def _write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def _replace_dir(tmp, target):
+    """用新目录替换旧目录 (两次 rename，服务器只会短暂看到缺失，不会看到半成品)。"""
+    old = None
+    if os.path.exists(target):
+        old = f"{target}.old"
+        shutil.rmtree(old, ignore_errors=True)
+        os.replace(target, old)
+    os.replace(tmp, target)
+    if old:
+        shutil.rmtree(old, ignore_errors=True)
+
+
+def export(site_dir=SITE_DIR):
+    """渲染全部页面到 site_dir。返回写出的文件数。"""
+    generated = datetime.now().astimezone().strftime('%Y-%m-%d %H:%M %Z')
+    parent = os.path.dirname(os.path.abspath(site_dir))
+    os.makedirs(parent, exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix=".site.", dir=parent)
+    try:
+        payload = {"generated": generated}
+        sidebar = render_sidebar(payload)
+        _write(os.path.join(tmp, "index.html"),
+               _page("实时监控", "index.html", sidebar, render_realtime(payload, generated), generated))
+        _write(os.path.join(tmp, "data", "latest.json"), json.dumps(_plain(payload), ensure_ascii=False, allow_nan=False))
+
+        start = datetime.now() - timedelta(days=EXPORT_LOOKBACK_DAYS)
+        frames, stamps = {}, {}
+        for source in HISTORY_SOURCES:
+            stamps[source] = "%d:%d" % history_store.stamp(history_store.source_dir(source))
+            frames[source] = history_store.read_history(source, start=start)
+            rows = schemas.to_storage(frames[source], source) if not frames[source].empty else frames[source]
+            _write(os.path.join(tmp, "data", f"{source}.json"), rows.to_json(orient="records", force_ascii=False))
+        _write(os.path.join(tmp, "history.html"),
+               _page("历史回溯", "history.html", sidebar, render_history(frames), generated))
+        _write(os.path.join(tmp, "manifest.json"),
+               json.dumps({"generated": generated, "lookback_days": EXPORT_LOOKBACK_DAYS, "history_stamps": stamps},
+                          ensure_ascii=False, indent=2))
+
+        count = sum(len(files) for _, _, files in os.walk(tmp))
+        os.chmod(tmp, 0o755)
+        _replace_dir(tmp, site_dir)
+        return count
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+
+def run_export(site_dir=SITE_DIR):
+    print(f"🚀 [Static Export] 任务启动: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    try:
+        count = export(site_dir)
+        print(f"✅ 静态快照已导出: {site_dir}/ ({count} 个文件)")
+    except Exception as e:
+        print(f"❌ 静态快照导出失败: {e}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="把看板渲染为静态 HTML/JSON")
+    parser.add_argument("--out", default=SITE_DIR, help="输出目录 (默认 site/)")
+    args = parser.parse_args()
+    run_export(args.out)
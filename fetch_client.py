@@ -0,0 +1,353 @@
+import requests
+import hashlib
+import json
+import os
+import tempfile
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from urllib.parse import urlparse
+import collector_metrics
+import history_store
+
+# ==========================================
+# 统一抓取层 (Fetch Client)
+# ==========================================
+# 所有采集器的 HTTP 下载都走 get():
+#   1. 重试: 连接错误 / 超时 / 429 / 5xx 时按 "全抖动" 指数退避重试
+#   2. 对冲: 首个请求超过对冲阈值仍未返回时，再并发发一个相同请求，谁先成功用谁
+#   3. 预算: 每次 run 有一个总截止时间 (with_deadline)，单次超时与退避都不会超出剩余预算
+#   4. 直方图: 按主机记录请求耗时 (带衰减)，对冲阈值取该主机的 p95，随时间自适应
+# 直方图保存在 metrics/fetch_latency.json，随 workflow 一起提交，下次运行继续累积；
+# 只在采集器运行 (with_deadline) 结束时写出，看板等临时调用不会改动该文件。
+#
+# get_cached() 在 get() 之上加条件请求缓存: 响应带 ETag / Last-Modified 时把正文存到
+# FETCH_CACHE_DIR，下次带 If-None-Match / If-Modified-Since 请求，304 直接用本地正文。
+
+LATENCY_FILE = os.path.join(collector_metrics.METRICS_DIR, "fetch_latency.json")
+
+RETRIES = 3  # 首次之外的最大重试次数
+BACKOFF_BASE = 1.0  # 秒
+BACKOFF_CAP = 20.0
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+HEDGE_QUANTILE = 0.95
+HEDGE_MIN = 1.0  # 对冲阈值下限 (秒)
+HEDGE_MIN_SAMPLES = 20  # 样本不足时使用 timeout 的 1/3
+
+# 耗时直方图桶上界 (秒)，最后一个桶收纳超时
+BUCKETS = [0.1, 0.25, 0.5, 1, 2, 4, 8, 15, 30, 60, 120]
+DECAY = 0.99  # 每次观测前旧计数乘以该系数，近期表现权重更高
+
+FETCH_CACHE_DIR = os.environ.get("FETCH_CACHE_DIR", ".fetch_cache")  # 派生文件，不进 git
+
+
+class DeadlineExceeded(requests.exceptions.Timeout):
+    """本次 run 的抓取预算已用完。"""
+
+
+# ==========================================
+# 1. 运行预算 (Deadline Budget)
+# ==========================================
+
+# 截止时间随上下文走 (ContextVar): 并行运行的采集器各有各的预算
+_deadline = ContextVar("fetch_deadline", default=None)
+
+
+def remaining():
+    current = _deadline.get()
+    return None if current is None else current - time.monotonic()
+
+
+@contextmanager
+def deadline(seconds):
+    previous = _deadline.get()
+    limit = time.monotonic() + seconds
+    if previous is not None:
+        limit = min(limit, previous)
+    token = _deadline.set(limit)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def with_deadline(seconds):
+    """装饰 run_collector: 整个运行期间的全部下载共享 seconds 秒预算，结束后保存耗时直方图。"""
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                with deadline(seconds):
+                    return func(*args, **kwargs)
+            finally:
+                save_histograms()
+
+        return wrapper
+
+    return decorator
+
+
+# ==========================================
+# 2. 主机耗时直方图 (Latency Histograms)
+# ==========================================
+
+_lock = threading.Lock()
+_histograms = None
+
+
+def _load():
+    global _histograms
+    if _histograms is None:
+        try:
+            with open(LATENCY_FILE, encoding="utf-8") as f:
+                data = json.load(f)
+            _histograms = {h: v for h, v in data.get("hosts", {}).items()
+                           if len(v.get("counts", [])) == len(BUCKETS)}
+        except Exception:
+            _histograms = {}
+    return _histograms
+
+
+def observe(host, seconds):
+    with _lock:
+        hist = _load().setdefault(host, {"counts": [0.0] * len(BUCKETS), "n": 0})
+        hist["counts"] = [c * DECAY for c in hist["counts"]]
+        idx = next((i for i, edge in enumerate(BUCKETS) if seconds <= edge), len(BUCKETS) - 1)
+        hist["counts"][idx] += 1
+        hist["n"] += 1
+
+
+def quantile(host, q):
+    """按桶上界给出该主机耗时的 q 分位数；样本不足返回 None。"""
+    with _lock:
+        hist = _load().get(host)
+        if not hist or hist["n"] < HEDGE_MIN_SAMPLES:
+            return None
+        total = sum(hist["counts"])
+        cum = 0.0
+        for edge, c in zip(BUCKETS, hist["counts"]):
+            cum += c
+            if cum >= q * total:
+                return edge
+        return BUCKETS[-1]
+
+
+def save_histograms():
+    with _lock:
+        if not _histograms:
+            return
+        payload = {
+            "buckets": BUCKETS,
+            "hosts": {h: {"counts": [round(c, 4) for c in v["counts"]], "n": v["n"]}
+                      for h, v in sorted(_histograms.items())},
+        }
+    try:
+        history_store.write_json(payload, LATENCY_FILE, versioned=False)
+    except Exception as e:
+        print(f"⚠️ 耗时直方图写入失败: {e}")
+
+
+def hedge_delay(host, timeout):
+    p = quantile(host, HEDGE_QUANTILE)
+    if p is None:
+        return max(HEDGE_MIN, timeout / 3)
+    return min(max(HEDGE_MIN, p), timeout / 2)
+
+
+# ==========================================
+# 3. 请求 (Requests)
+# ==========================================
+
+def _attempt(index, url, timeout, kwargs, results):
+    host = urlparse(url).netloc
+    t = time.perf_counter()
+    try:
+        response = requests.get(url, timeout=timeout, **kwargs)
+        observe(host, time.perf_counter() - t)
+        results.put((index, response, None))
+    except Exception as e:
+        if isinstance(e, requests.exceptions.Timeout):
+            observe(host, time.perf_counter() - t)
+        results.put((index, None, e))
+
+
+def _hedged_get(url, timeout, hedge_after, kwargs):
+    """
+    先发一个请求；hedge_after 秒内没有返回则再发一个 (超时不超过剩余预算)。
+    返回最先成功 (非可重试状态码) 的响应；全部失败时返回最后一个响应或抛出最后一个异常。
+    等待同样受运行预算约束: 预算用完仍无结果时抛出 DeadlineExceeded。
+    输掉的请求在守护线程里自然结束，不会拖住进程退出。
+    """
+    results = queue.Queue()
+
+    def launch(index, attempt_timeout):
+        threading.Thread(target=_attempt, args=(index, url, attempt_timeout, kwargs, results), daemon=True).start()
+
+    def out_of_budget():
+        if fallback is not None:
+            return fallback
+        raise DeadlineExceeded(f"fetch budget exhausted waiting for {url}")
+
+    launch(0, timeout)
+    in_flight, hedged = 1, False
+    fallback, error = None, None
+
+    while in_flight:
+        left = remaining()
+        if left is not None and left <= 0:
+            return out_of_budget()
+        can_hedge = not hedged and hedge_after < timeout
+        wait = hedge_after if can_hedge else left
+        if can_hedge and left is not None:
+            wait = min(wait, left)
+        try:
+            index, response, e = results.get(timeout=wait)
+        except queue.Empty:
+            left = remaining()
+            if not can_hedge or (left is not None and left <= 0):
+                return out_of_budget()
+            hedged = True
+            in_flight += 1
+            collector_metrics.add("fetch_hedges")
+            launch(1, timeout if left is None else min(timeout, left))
+            continue
+
+        in_flight -= 1
+        if response is not None and response.status_code not in RETRY_STATUS:
+            if index == 1:
+                collector_metrics.add("fetch_hedge_wins")
+            return response
+        if response is not None:
+            fallback = response
+        if e is not None:
+            error = e
+
+    if fallback is not None:
+        return fallback
+    raise error
+
+
+def get(url, timeout=30, retries=RETRIES, hedge=True, **kwargs):
+    """
+    requests.get 的替代: 带重试、对冲与运行预算。
+    返回 requests.Response (最终仍为 4xx/5xx 时照常返回，由调用方判断)；
+    网络错误在重试耗尽后抛出。
+    """
+    host = urlparse(url).netloc
+    for attempt in range(retries + 1):
+        left = remaining()
+        if left is not None and left <= 0:
+            raise DeadlineExceeded(f"fetch budget exhausted before {url}")
+        attempt_timeout = timeout if left is None else min(timeout, left)
+
+        collector_metrics.add("fetch_attempts")
+        error, response = None, None
+        try:
+            if hedge:
+                response = _hedged_get(url, attempt_timeout, hedge_delay(host, timeout), kwargs)
+            else:
+                response = requests.get(url, timeout=attempt_timeout, **kwargs)
+        except requests.exceptions.RequestException as e:
+            error = e
+
+        retryable = error is not None or response.status_code in RETRY_STATUS
+        if not retryable or attempt == retries:
+            if error is not None:
+                raise error
+            return response
+
+        # 全抖动指数退避，且不超过剩余预算
+        sleep = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+        left = remaining()
+        if left is not None and sleep >= left:
+            if error is not None:
+                raise error
+            return response
+        reason = type(error).__name__ if error is not None else f"HTTP {response.status_code}"
+        print(f"      ↻ {host} 第 {attempt + 1} 次请求失败 ({reason})，{sleep:.1f}s 后重试")
+        collector_metrics.add("fetch_retries")
+        time.sleep(sleep)
+
+
+# ==========================================
+# 4. 条件请求缓存 (Conditional Request Cache)
+# ==========================================
+
+def _cache_paths(url, cache_dir):
+    digest = hashlib.sha1(url.encode("utf-8")).hexdigest()[:20]
+    base = os.path.join(cache_dir, digest)
+    return base + ".body", base + ".json"
+
+
+def _read_cache(url, cache_dir):
+    body_path, meta_path = _cache_paths(url, cache_dir)
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("url") != url:
+            return None, None
+        with open(body_path, "rb") as f:
+            return meta, f.read()
+    except (OSError, ValueError):
+        return None, None
+
+
+def _write_bytes(path, data):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _write_cache(url, response, cache_dir):
+    meta = {"url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified")}
+    if not meta["etag"] and not meta["last_modified"]:
+        return
+    body_path, meta_path = _cache_paths(url, cache_dir)
+    try:
+        with history_store.locked(body_path):
+            # 先写正文再写元数据: 元数据可见时正文一定是对应的那份
+            _write_bytes(body_path, response.content)
+            _write_bytes(meta_path, json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+    except Exception as e:
+        print(f"⚠️ 抓取缓存写入失败 ({url}): {e}")
+
+
+def get_cached(url, timeout=30, cache_dir=None, **kwargs):
+    """
+    带条件请求的 get()。返回 (状态码, 正文 bytes, 是否来自缓存)；
+    304 时状态码按 200 返回、正文取自缓存。网络错误照常抛出。
+    """
+    cache_dir = cache_dir or FETCH_CACHE_DIR
+    meta, cached = _read_cache(url, cache_dir)
+    headers = dict(kwargs.pop("headers", None) or {})
+    if meta is not None:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    response = get(url, timeout=timeout, headers=headers, **kwargs)
+    if response.status_code == 304 and cached is not None:
+        collector_metrics.add("fetch_not_modified")
+        return 200, cached, True
+    if response.status_code == 200:
+        collector_metrics.add("bytes_downloaded", len(response.content))
+        _write_cache(url, response, cache_dir)
+    return response.status_code, response.content, False
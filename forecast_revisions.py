@@ -0,0 +1,175 @@
+import pandas as pd
+import numpy as np
+from datetime import timedelta
+import collector_metrics
+import history_store
+import schemas
+
+# ==========================================
+# 预报修正追踪 (Forecast Revisions)
+# ==========================================
+# 每日一行的 weather 历史只保留 Day 7/10/14，无法回答 "今天对某目标日的 Day 7
+# 与昨天的 Day 8、一周前的 Day 14 相比变了多少"。这里把每次运行的全部 lead 按目标日重排:
+#   history/forecasts/<YYYY-MM>.csv   (主键 Issue_Date，每次运行 x 每个 lead 一行)
+#   {指数}_Fcst   该次运行对 Target_Date 的集合平均预报
+#   {指数}_Rev1   相对上一次运行 (通常是昨天、lead + 1) 对同一目标日的修正
+#   {指数}_Rev7   相对 7 天前那次运行 (lead + 7) 对同一目标日的修正
+#   {指数}_Trend  最近 TREND_RUNS 次运行对同一目标日预报的线性斜率 (每天)
+# 增量计算: 每次运行只读最近 LOOKBACK_DAYS 天的修正表 (一两个月分区)，不重扫历史。
+#
+# 用法:
+#   climate_collector 入库后自动调用 update(trajectory, issue_date)
+#   python forecast_revisions.py backfill    # 用 weather 历史的 Obs/Day7/10/14 补种旧日期
+
+SOURCE = "forecasts"
+WEATHER_SOURCE = "weather"
+INDICES = schemas.TELECONNECTIONS
+TREND_RUNS = 5  # 趋势用的运行次数 (含本次)
+TREND_MIN_RUNS = 3  # 少于该次数不计算趋势
+LOOKBACK_DAYS = 10  # 读取的历史运行范围 (覆盖 7 天前那次 + 趋势窗口)
+
+# 指数偏向 "冷" 的方向: AO/NAO 负相位、PNA 正相位 (与看板配色一致)
+COLD_SIGN = {"AO": -1, "NAO": -1, "PNA": 1}
+
+# 从 weather 历史补种时使用的列 -> lead
+WEATHER_LEADS = {"Obs": 0, "Day7": 7, "Day10": 10, "Day14": 14}
+
+
+def forecast_rows(trajectory, issue_date):
+    """一次运行的全部 lead 集合平均 (index = Lead, 列 = 指数) -> 修正表的行 (尚未计算修正)。"""
+    issue = pd.Timestamp(issue_date).normalize()
+    leads = pd.Index(trajectory.index, name="Lead").astype(int)
+    rows = pd.DataFrame({
+        "Issue_Date": issue,
+        "Target_Date": issue + pd.to_timedelta(leads, unit="D"),
+        "Lead": leads,
+    })
+    for name in INDICES:
+        rows[f"{name}_Fcst"] = trajectory[name].to_numpy(dtype=float) if name in trajectory else np.nan
+    return rows.reset_index(drop=True)
+
+
+def _slope(frame, value_col):
+    """按 Target_Date 分组，对 (Issue_Date 天数, 预报值) 做最小二乘斜率 (向量化)。"""
+    data = frame[["Target_Date", "Issue_Date", value_col]].dropna()
+    x = (data["Issue_Date"] - pd.Timestamp("1970-01-01")).dt.days.astype(float)
+    y = data[value_col].astype(float)
+    g = pd.DataFrame({"t": data["Target_Date"], "x": x, "y": y, "xx": x * x, "xy": x * y}).groupby("t")
+    s = g.sum()
+    n = g.size()
+    var = s["xx"] - s["x"] ** 2 / n
+    slope = (s["xy"] - s["x"] * s["y"] / n) / var.where(var > 0)
+    return slope.where(n >= TREND_MIN_RUNS)
+
+
+def compute_revisions(new, prior):
+    """new: 本次运行的行；prior: 之前若干次运行的行 (含 *_Fcst)。返回补上 Rev1 / Rev7 / Trend 的 new。"""
+    out = new.copy()
+    issue = out["Issue_Date"].iloc[0]
+    prior = out.iloc[:0] if prior is None or prior.empty else prior[prior["Issue_Date"] < issue]
+    fcst_cols = [f"{name}_Fcst" for name in INDICES]
+
+    def aligned(run):
+        """某次运行的预报，按本次的 Target_Date 对齐 (没有该次运行时全为 NaN)。"""
+        by_target = run.drop_duplicates("Target_Date", keep="last").set_index("Target_Date")
+        return by_target.reindex(out["Target_Date"])[fcst_cols].set_axis(out.index)
+
+    prev = aligned(prior[prior["Issue_Date"] == prior["Issue_Date"].max()])
+    week_ago = aligned(prior[prior["Issue_Date"] == issue - timedelta(days=7)])
+
+    runs = sorted(prior["Issue_Date"].unique())[-(TREND_RUNS - 1):]
+    window = pd.concat([prior[prior["Issue_Date"].isin(runs)], out], ignore_index=True)
+    for name in INDICES:
+        col = f"{name}_Fcst"
+        out[f"{name}_Rev1"] = out[col] - prev[col]
+        out[f"{name}_Rev7"] = out[col] - week_ago[col]
+        out[f"{name}_Trend"] = out["Target_Date"].map(_slope(window, col)).astype(float)
+    return out
+
+
+def read_recent(issue_date, days=LOOKBACK_DAYS, root=history_store.HISTORY_ROOT):
+    """本次运行之前 days 天内的修正表 (只打开相关月份分区)。"""
+    issue = pd.Timestamp(issue_date).normalize()
+    return history_store.read_history(SOURCE, start=issue - timedelta(days=days),
+                                      end=issue - timedelta(days=1), root=root)
+
+
+def update(trajectory, issue_date, root=history_store.HISTORY_ROOT):
+    """增量入库一次运行的全部 lead 及其修正。返回写入的行数。"""
+    new = forecast_rows(trajectory, issue_date)
+    with history_store.locked(history_store.source_dir(SOURCE, root)):
+        rows = compute_revisions(new, read_recent(issue_date, root=root))
+        history_store.upsert_history(rows, SOURCE, root=root)
+    collector_metrics.add("revision_rows", len(rows))
+    return len(rows)
+
+
+def summarize(rows, leads=(7, 10, 14)):
+    """最新一次运行在若干 lead 上的修正 (看板用)。rows 为同一 Issue_Date 的修正表行。"""
+    if rows is None or rows.empty:
+        return None
+    latest = rows[rows["Issue_Date"] == rows["Issue_Date"].max()].set_index("Lead")
+    records = []
+    for name in INDICES:
+        for lead in leads:
+            if lead not in latest.index:
+                continue
+            r = latest.loc[lead]
+            rev1, rev7 = r.get(f"{name}_Rev1"), r.get(f"{name}_Rev7")
+            rev = rev1 if pd.notna(rev1) else rev7  # 方向: 优先看相对上一次运行的修正
+            direction = None
+            if pd.notna(rev):
+                direction = "colder" if rev * COLD_SIGN[name] > 0 else "warmer" if rev != 0 else "flat"
+            records.append({
+                "Index": name, "Lead": int(lead), "Target_Date": r["Target_Date"],
+                "Fcst": r.get(f"{name}_Fcst"), "Rev1": rev1,
+                "Rev7": rev7, "Trend": r.get(f"{name}_Trend"),
+                "Direction": direction,
+            })
+    return pd.DataFrame(records)
+
+
+# ==========================================
+# 补种 (Backfill)
+# ==========================================
+
+def backfill(root=history_store.HISTORY_ROOT):
+    """
+    用 weather 历史 (每天 Obs/Day7/Day10/Day14 四个 lead) 为尚无修正记录的日期补种
+    (Rev7 可用: 今天的 Day7 对比一周前的 Day14)。逐日在内存中计算，最后一次写入。返回补种的运行数。
+    """
+    weather = history_store.read_history(WEATHER_SOURCE, root=root)
+    if weather.empty:
+        return 0
+    runs = {}  # Issue_Date -> 该次运行的行
+    if history_store.has_history(SOURCE, root):
+        stored = history_store.read_history(SOURCE, root=root)
+        runs = {issue: part for issue, part in stored.groupby("Issue_Date")}
+
+    added = []
+    for _, row in weather.sort_values("Date").iterrows():
+        issue = pd.Timestamp(row["Date"]).normalize()
+        if issue in runs:
+            continue
+        trajectory = pd.DataFrame({
+            name: {lead: row.get(f"{name}_{suffix}") for suffix, lead in WEATHER_LEADS.items()}
+            for name in INDICES
+        })
+        window = [runs[d] for d in (issue - timedelta(days=k) for k in range(1, LOOKBACK_DAYS + 1)) if d in runs]
+        prior = pd.concat(window, ignore_index=True) if window else pd.DataFrame()
+        runs[issue] = compute_revisions(forecast_rows(trajectory, issue), prior)
+        added.append(runs[issue])
+
+    if added:
+        history_store.upsert_history(pd.concat(added, ignore_index=True), SOURCE, root=root)
+    return len(added)
+
+
+if __name__ == "__main__":
+    import sys
+
+    if sys.argv[1:2] == ["backfill"]:
+        n = backfill()
+        print(f"✅ [Forecast Revisions] 补种 {n} 次运行 -> {history_store.source_dir(SOURCE)}/")
+    else:
+        print("用法: python forecast_revisions.py backfill")
@@ -0,0 +1,149 @@
+import pandas as pd
+import numpy as np
+from datetime import datetime
+import os
+import collector_metrics
+import history_store
+import schemas
+
+# ==========================================
+# 1. 配置区域 (Configuration)
+# ==========================================
+# 把 GEFS 集合平均轨迹 (AO/NAO/PNA) 映射为未来两周各区域燃气加权 HDD 距平。
+# 系数: 历史周度 HDD 距平 ~ 同周遥相关观测均值 (多输出最小二乘，一次求解全部区域)。
+# 投影: 周均轨迹矩阵 (2 x 4) @ 系数矩阵 (4 x 区域数)。
+
+WEATHER_SOURCE = "weather"  # history/weather/
+HDD_SOURCE = "hdd"  # history/hdd/
+TRAJECTORY_FILE = "forecast_trajectory.csv"
+
+COEF_FILE = "hdd_projection_coefs.json"
+OUTPUT_FILE = "hdd_projection.csv"
+
+INDICES = ["AO", "NAO", "PNA"]
+REGIONS = ["NE", "MA", "MW", "US"]  # 与 hdd_collector.TARGET_REGIONS 一致
+
+# 预报周: 第 1 周 = lead 1-7，第 2 周 = lead 8-14
+WEEK_LEADS = {1: range(1, 8), 2: range(8, 15)}
+MIN_WEEKS = 8  # 样本周数不足时不拟合
+
+
+# ==========================================
+# 2. 系数拟合 (Fit)
+# ==========================================
+
+def build_training_set():
+    """
+    周度样本: 每个 HDD 周 (Source_Date 为周六，覆盖前 7 天) 对应该周每日遥相关观测的均值。
+    返回：(X, Y, weeks)，X 含截距列
+    """
+    weather = history_store.read_history(WEATHER_SOURCE, usecols=schemas.only("Date", *[f"{i}_Obs" for i in INDICES]))
+    obs = weather.set_index("Date")[[f"{i}_Obs" for i in INDICES]]
+
+    hdd = history_store.read_history(
+        HDD_SOURCE, usecols=schemas.only("Run_Date", "Source_Date", *[f"{r}_Dev_Norm" for r in REGIONS]))
+    hdd = hdd[hdd["Source_Date"].notna()]
+    hdd = hdd.sort_values("Run_Date").drop_duplicates("Source_Date", keep="last")
+    hdd = hdd.set_index("Source_Date")[[f"{r}_Dev_Norm" for r in REGIONS]].sort_index()
+
+    # 每个观测日归入其所在 HDD 周 (以周六结束)
+    weekly_obs = obs.resample("W-SAT").mean()
+    joined = weekly_obs.join(hdd, how="inner").dropna()
+
+    X = np.column_stack([np.ones(len(joined)), joined[[f"{i}_Obs" for i in INDICES]].to_numpy()])
+    Y = joined[[f"{r}_Dev_Norm" for r in REGIONS]].to_numpy(dtype=float)
+    return X, Y, joined.index
+
+
+def fit_coefficients(X, Y):
+    """一次 lstsq 同时求解全部区域的系数，并给出各区域 R²。"""
+    B, *_ = np.linalg.lstsq(X, Y, rcond=None)
+    resid = Y - X @ B
+    ss_tot = ((Y - Y.mean(axis=0)) ** 2).sum(axis=0)
+    r2 = 1 - (resid ** 2).sum(axis=0) / np.where(ss_tot == 0, np.nan, ss_tot)
+    return B, r2, resid.std(axis=0, ddof=X.shape[1])
+
+
+# ==========================================
+# 3. 投影 (Projection)
+# ==========================================
+
+def weekly_trajectory(trajectory):
+    """把 lead 轨迹压缩为 (周数 x 指标) 的周均矩阵。"""
+    traj = trajectory.set_index("Lead").reindex(columns=INDICES)
+    return np.vstack([traj.reindex(list(leads)).mean().to_numpy() for leads in WEEK_LEADS.values()])
+
+
+def project(trajectory, B):
+    W = weekly_trajectory(trajectory)
+    X = np.column_stack([np.ones(len(W)), W])
+    return X @ B
+
+
+# ==========================================
+# 4. 主流程 (Main)
+# ==========================================
+
+@collector_metrics.instrumented("projection")
+def run_collector():
+    run_time_str = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    print(f"🚀 [HDD Projection] 任务启动: {run_time_str}")
+
+    if not (history_store.has_history(WEATHER_SOURCE) and history_store.has_history(HDD_SOURCE)
+            and os.path.exists(TRAJECTORY_FILE)):
+        print("❌ 历史数据或预报轨迹缺失，跳过投影。")
+        collector_metrics.mark_failed("missing inputs")
+        return
+
+    # 1. 用完整历史重新估计系数 (样本量很小，一次 lstsq 即可)
+    with collector_metrics.stage("load"):
+        X, Y, weeks = build_training_set()
+    collector_metrics.add("rows_parsed", len(weeks))
+    if len(weeks) < MIN_WEEKS:
+        print(f"❌ 样本周数不足 ({len(weeks)} < {MIN_WEEKS})，跳过投影。")
+        collector_metrics.mark_failed("too few weeks")
+        return
+    with collector_metrics.stage("fit"):
+        B, r2, resid_std = fit_coefficients(X, Y)
+    print(f"   🧮 训练样本: {len(weeks)} 周 | R²: " + ", ".join(f"{r}={v:.2f}" for r, v in zip(REGIONS, r2)))
+
+    coefs = {
+        "fitted_at": run_time_str,
+        "n_weeks": int(len(weeks)),
+        "terms": ["Intercept"] + INDICES,
+        "regions": REGIONS,
+        "B": B.round(4).tolist(),
+        "r2": [None if np.isnan(v) else round(float(v), 3) for v in r2],
+        "resid_std": resid_std.round(2).tolist(),
+    }
+    history_store.write_json(coefs, COEF_FILE)
+
+    # 2. 应用到最新预报轨迹
+    trajectory = pd.read_csv(TRAJECTORY_FILE)
+    run_date = pd.Timestamp(trajectory["Date"].iloc[0])
+    proj = project(trajectory, B)
+    if np.isnan(proj).any():
+        print("❌ 预报轨迹不完整 (指标缺失)，跳过投影。")
+        collector_metrics.mark_failed("incomplete trajectory")
+        return
+
+    rows = []
+    for (week_no, leads), values in zip(WEEK_LEADS.items(), proj):
+        row = {
+            "Run_Date": run_date.strftime("%Y-%m-%d"),
+            "Week": week_no,
+            "Start": (run_date + pd.Timedelta(days=leads[0])).strftime("%Y-%m-%d"),
+            "End": (run_date + pd.Timedelta(days=leads[-1])).strftime("%Y-%m-%d"),
+        }
+        for region, v, sd in zip(REGIONS, values, resid_std):
+            row[f"{region}_Dev_Proj"] = round(float(v), 1)
+            row[f"{region}_Resid_Std"] = round(float(sd), 1)
+        rows.append(row)
+        print(f"   📈 Week {week_no}: " + ", ".join(f"{r} {row[f'{r}_Dev_Proj']:+.1f}" for r in REGIONS))
+
+    history_store.write_csv(pd.DataFrame(rows), OUTPUT_FILE)
+    print(f"✅ [成功] 投影已保存至 {OUTPUT_FILE}")
+
+
+if __name__ == "__main__":
+    run_collector()
@@ -0,0 +1,454 @@
+import pandas as pd
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+import schemas
+
+try:
+    import fcntl
+except ImportError:  # Windows: 没有 flock，锁退化为进程内锁
+    fcntl = None
+
+# ==========================================
+# 历史库读写协调 (History Store)
+# ==========================================
+# 所有 history_*.csv / 派生输出的写入都经过这里:
+#   1. 原子写: 先写同目录临时文件 + fsync，再 os.replace，读者永远看到完整的旧文件或新文件
+#   2. 咨询锁: <文件>.lock 上的 flock，"读-改-写" 整个过程持锁，多个采集器可并发运行
+#   3. 版本戳: 每次写入后 history_versions.json 中该文件的版本号 +1 (单调递增)，
+#      看板缓存以 stamp() 作为缓存键的一部分，文件一变缓存即失效
+#
+# 用法:
+#   with history_store.locked(HISTORY_FILE):
+#       df = pd.read_csv(HISTORY_FILE) ...
+#       history_store.write_csv(df, HISTORY_FILE)
+
+VERSIONS_FILE = "history_versions.json"
+
+_local = threading.local()
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+
+def _held():
+    if not hasattr(_local, "held"):
+        _local.held = set()
+    return _local.held
+
+
+@contextmanager
+def locked(path):
+    """对 path 加排他咨询锁 (同一线程内可重入)。"""
+    key = os.path.abspath(path)
+    if key in _held():
+        yield
+        return
+
+    with _thread_locks_guard:
+        thread_lock = _thread_locks.setdefault(key, threading.Lock())
+    with thread_lock:
+        lock_dir = os.path.dirname(key)
+        os.makedirs(lock_dir, exist_ok=True)
+        with open(key + ".lock", "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            _held().add(key)
+            try:
+                yield
+            finally:
+                _held().discard(key)
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def _atomic_write(path, write):
+    """write(f) 写入临时文件，完成后原子替换 path。"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp, 0o644)  # mkstemp 默认 0600
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _bump_version(path, rows=None):
+    name = os.path.basename(path)
+    versions_path = os.path.join(os.path.dirname(os.path.abspath(path)), VERSIONS_FILE)
+    with locked(versions_path):
+        versions = _read_versions(versions_path)
+        entry = versions.get(name, {})
+        versions[name] = {
+            "version": int(entry.get("version", 0)) + 1,
+            "updated": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "rows": rows,
+        }
+        _atomic_write(versions_path, lambda f: json.dump(versions, f, indent=2, sort_keys=True))
+    return versions[name]["version"]
+
+
+def write_csv(df, path, **kwargs):
+    """原子写 CSV 并递增版本号。返回新版本号。"""
+    kwargs.setdefault("index", False)
+    with locked(path):
+        _atomic_write(path, lambda f: df.to_csv(f, **kwargs))
+        return _bump_version(path, rows=len(df))
+
+
+def write_json(obj, path, versioned=True, **kwargs):
+    """原子写 JSON (模型状态 / 系数等)；versioned=False 用于不需要版本戳的运行指标文件。"""
+    kwargs.setdefault("indent", 2)
+    with locked(path):
+        _atomic_write(path, lambda f: json.dump(obj, f, **kwargs))
+        return _bump_version(path) if versioned else None
+
+
+# ==========================================
+# 读者侧 (Readers)
+# ==========================================
+
+def _read_versions(versions_path=VERSIONS_FILE):
+    try:
+        with open(versions_path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def version(path):
+    """
+    文件的单调版本号 (从未经 history_store 写入过则为 0)。
+    path 为分区目录时返回目录内各分区版本号之和 (同样单调递增)。
+    """
+    if os.path.isdir(path):
+        versions = _read_versions(os.path.join(path, VERSIONS_FILE))
+        return sum(int(v.get("version", 0)) for v in versions.values())
+    versions_path = os.path.join(os.path.dirname(os.path.abspath(path)), VERSIONS_FILE)
+    return int(_read_versions(versions_path).get(os.path.basename(path), {}).get("version", 0))
+
+
+def stamp(path):
+    """
+    缓存键: (版本号, mtime_ns)。
+    版本号覆盖经 history_store 的写入，mtime 兜底覆盖 git pull 等外部更新 (目录取其中最新的文件)。
+    不存在时为 (0, 0)。
+    """
+    try:
+        mtime = os.stat(path).st_mtime_ns
+        if os.path.isdir(path):
+            mtime = max([mtime] + [os.stat(os.path.join(path, n)).st_mtime_ns for n in os.listdir(path)])
+    except OSError:
+        mtime = 0
+    return version(path), mtime
+
+
+# ==========================================
+# 按月分区的历史库 (Partitioned History)
+# ==========================================
+# history/<source>/<YYYY-MM>.csv，按各源的主键日期列分月:
+#   - 新数据只改动所属月份的分区，每日提交只产生一个很小的新 blob
+#   - 读取时只打开与日期范围相交的分区 (看板只加载要显示的时间段)
+#   - 整表重算的源 (例如周度库存) 用 replace_history，内容未变的分区不会重写
+
+HISTORY_ROOT = "history"
+SCHEMA_FILE = "schema.json"  # 每个源目录下记录存储格式版本 (见 schemas.py)
+
+SOURCES = {
+    "weather": {"key": "Date", "legacy": "history_weather.csv"},
+    "hdd": {"key": "Run_Date", "legacy": "history_hdd.csv"},
+    "cdd": {"key": "Run_Date", "legacy": "history_cdd.csv"},
+    "storage": {"key": "Run_Date", "legacy": "history_storage.csv"},
+    "storage_weekly": {"key": "Week_Date", "legacy": "history_storage_weekly.csv"},
+    "scenarios": {"key": "Date", "legacy": "history_scenarios.csv"},
+    "forecasts": {"key": "Issue_Date", "legacy": "history_forecasts.csv"},
+}
+
+
+def source_dir(source, root=HISTORY_ROOT):
+    return os.path.join(root, source)
+
+
+def list_partitions(source, root=HISTORY_ROOT):
+    """[(YYYY-MM, 路径)]，按月份升序。"""
+    directory = source_dir(source, root)
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        (name[:-len(".csv")], os.path.join(directory, name))
+        for name in os.listdir(directory)
+        if name.endswith(".csv") and len(name) == len("YYYY-MM.csv")
+    )
+
+
+def has_history(source, root=HISTORY_ROOT):
+    legacy = os.path.join(os.path.dirname(os.path.abspath(root)), SOURCES[source]["legacy"])
+    return bool(list_partitions(source, root)) or os.path.exists(legacy)
+
+
+def _month(value):
+    return None if value is None else str(pd.Timestamp(value).date())[:7]
+
+
+def _day(value):
+    return None if value is None else str(pd.Timestamp(value).date())
+
+
+def schema_version(source, root=HISTORY_ROOT):
+    """分区当前的存储格式版本 (schema.json)；尚未记录版本的旧分区视为 1。"""
+    try:
+        with open(os.path.join(source_dir(source, root), SCHEMA_FILE), encoding="utf-8") as f:
+            return int(json.load(f).get("version", 1))
+    except (OSError, ValueError):
+        return 1
+
+
+def _set_schema_version(source, root):
+    path = os.path.join(source_dir(source, root), SCHEMA_FILE)
+    version = schemas.current_version(source)
+    _atomic_write(path, lambda f: json.dump({"version": version, "columns": schemas.columns(source)}, f, indent=2))
+
+
+def _iter_raw(source, start, end, root, read_kwargs):
+    """逐个分区读取并按主键日期过滤 (主键仍为字符串)；尚未迁移的目录回退读取旧的单文件。"""
+    key = SOURCES[source]["key"]
+    parts = list_partitions(source, root)
+    if not parts:
+        legacy = os.path.join(os.path.dirname(os.path.abspath(root)), SOURCES[source]["legacy"])
+        parts = [(None, legacy)] if os.path.exists(legacy) else []
+
+    lo, hi = _day(start), _day(end)
+    for month, path in parts:
+        if month is not None and ((lo and month < lo[:7]) or (hi and month > hi[:7])):
+            continue
+        df = pd.read_csv(path, **read_kwargs)
+        if (lo or hi) and key in df.columns:
+            days = df[key].astype(str).str[:10]
+            mask = pd.Series(True, index=df.index)
+            if lo:
+                mask &= days >= lo
+            if hi:
+                mask &= days <= hi
+            df = df[mask]
+        yield df
+
+
+def _typed(df, source, root):
+    version = schema_version(source, root)
+    if version < schemas.current_version(source):
+        df = schemas.migrate(df, source, version)
+    return schemas.conform(df, source)
+
+
+def iter_history(source, start=None, end=None, root=HISTORY_ROOT, typed=True, **read_kwargs):
+    """
+    逐个分区读取 (惰性)：只打开与 [start, end] 相交的月份，行按主键日期再过滤一次。
+    typed=True 时每个分区按 schemas 整理列顺序与类型。
+    """
+    for df in _iter_raw(source, start, end, root, read_kwargs):
+        yield _typed(df, source, root) if typed else df
+
+
+def read_history(source, start=None, end=None, root=HISTORY_ROOT, typed=True, **read_kwargs):
+    """拼接 [start, end] 范围内的分区 (拼接后统一转换一次类型)；没有数据时返回空 DataFrame。"""
+    frames = [df for df in _iter_raw(source, start, end, root, read_kwargs) if not df.empty]
+    if not frames:
+        return pd.DataFrame()
+    df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0].reset_index(drop=True)
+    return _typed(df, source, root) if typed else df
+
+
+def read_latest(source, root=HISTORY_ROOT, typed=True, **read_kwargs):
+    """最新一个非空分区 (侧边栏等只需要最新几行的场景)。"""
+    parts = list_partitions(source, root)
+    if not parts:
+        return read_history(source, root=root, typed=typed, **read_kwargs)
+    for _, path in reversed(parts):
+        df = pd.read_csv(path, **read_kwargs)
+        if not df.empty:
+            return _typed(df, source, root) if typed else df
+    return pd.DataFrame()
+
+
+def _write_partition(df, path):
+    """df 须已是存储格式 (schemas.to_storage)；内容未变化时不重写 (不产生新 blob，也不递增版本)。"""
+    content = df.to_csv(index=False)
+    if os.path.exists(path):
+        with open(path, encoding="utf-8", newline="") as f:
+            if f.read() == content:
+                return False
+    _atomic_write(path, lambda f: f.write(content))
+    _bump_version(path, rows=len(df))
+    return True
+
+
+def _split_by_month(df, key):
+    months = df[key].astype(str).str[:7]
+    return {m: part for m, part in df.groupby(months, sort=True)}
+
+
+def _ensure_migrated(source, root):
+    """写入前: 旧单文件拆分为分区，旧版本分区升级到当前存储格式。"""
+    if not list_partitions(source, root):
+        legacy = os.path.join(os.path.dirname(os.path.abspath(root)), SOURCES[source]["legacy"])
+        if os.path.exists(legacy):
+            migrate_legacy(sources=[source], root=root)
+    migrate_schema(source, root)
+
+
+def migrate_schema(source, root=HISTORY_ROOT):
+    """把版本落后的分区逐个迁移并按当前格式重写。返回重写的分区数。"""
+    version = schema_version(source, root)
+    if version >= schemas.current_version(source):
+        return 0
+    written = 0
+    with locked(source_dir(source, root)):
+        parts = list_partitions(source, root)
+        for _, path in parts:
+            df = schemas.migrate(pd.read_csv(path), source, version)
+            written += _write_partition(schemas.to_storage(df, source), path)
+        if parts:
+            _set_schema_version(source, root)
+    if written:
+        print(f"   🧬 {source_dir(source, root)}/: 存储格式 v{version} -> v{schemas.current_version(source)} "
+              f"({written} 个分区重写)")
+    return written
+
+
+def upsert_history(rows, source, root=HISTORY_ROOT):
+    """
+    按主键写入若干行: 同一主键的旧行被替换 (旧行移入 _superseded/ 存档，见下)。
+    只读写这些行所属月份的分区。列顺序与存储格式由 schemas 决定。返回被替换的旧行数。
+    """
+    key = SOURCES[source]["key"]
+    rows = schemas.to_storage(rows, source)
+    replaced = 0
+    with locked(source_dir(source, root)):
+        _ensure_migrated(source, root)
+        parts = dict(list_partitions(source, root))
+
+        for month, new in _split_by_month(rows, key).items():
+            path = os.path.join(source_dir(source, root), f"{month}.csv")
+            if month in parts:
+                old = pd.read_csv(path)
+                hit = old[key].astype(str).isin(new[key].astype(str))
+                replaced += int(hit.sum())
+                if hit.any():
+                    _archive_superseded(old[hit], source, month, root)
+                merged = pd.concat([old[~hit], new], ignore_index=True)
+            else:
+                merged = new
+            # 旧分区按原始 CSV 读入 (含空值的整数列会变成浮点)，合并后再规范化一次
+            _write_partition(schemas.to_storage(merged, source).sort_values(key, kind="stable"), path)
+        if not parts:
+            _set_schema_version(source, root)
+    return replaced
+
+
+def replace_history(df, source, root=HISTORY_ROOT):
+    """用完整数据集覆盖整个源: 逐月比较，只重写有变化的分区，删除已不存在的月份。"""
+    key = SOURCES[source]["key"]
+    df = schemas.to_storage(df, source)
+    written = 0
+    with locked(source_dir(source, root)):
+        old_parts = dict(list_partitions(source, root))
+        new_parts = _split_by_month(df, key)
+        for month, part in new_parts.items():
+            written += _write_partition(part, os.path.join(source_dir(source, root), f"{month}.csv"))
+        for month in set(old_parts) - set(new_parts):
+            os.remove(old_parts[month])
+            written += 1
+        _set_schema_version(source, root)
+    return written
+
+
+# ==========================================
+# 被覆盖版本存档 (Superseded Versions)
+# ==========================================
+# upsert_history 覆盖同一主键的旧行时，旧行不丢弃，而是追加到
+#   history/_superseded/<source>/<YYYY-MM>.csv   (按主键月份分区，多一列 Superseded_At)
+# 当前分区 + 存档 = 双时态历史: 主键日期 (有效时间) x 入库时间 (Update_Time ~ Superseded_At)。
+# 存档目录下的 index.json 记录每个月份分区最后一次覆盖的时间，
+# 按时刻回看 (bitemporal.py) 时只需打开在该时刻之后仍有覆盖的分区。
+
+SUPERSEDED_DIR = "_superseded"
+SUPERSEDED_COLUMN = "Superseded_At"
+SUPERSEDED_INDEX = "index.json"
+
+
+def superseded_dir(source, root=HISTORY_ROOT):
+    return os.path.join(root, SUPERSEDED_DIR, source)
+
+
+def superseded_index(source, root=HISTORY_ROOT):
+    """{YYYY-MM: 该分区最后一次覆盖时间 (字符串)}。"""
+    try:
+        with open(os.path.join(superseded_dir(source, root), SUPERSEDED_INDEX), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _archive_superseded(rows, source, month, root):
+    """在源目录锁内调用: 把即将被覆盖的旧行追加到存档分区，并更新索引。"""
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    directory = superseded_dir(source, root)
+    path = os.path.join(directory, f"{month}.csv")
+    rows = rows.assign(**{SUPERSEDED_COLUMN: now})
+    if os.path.exists(path):
+        rows = pd.concat([pd.read_csv(path), rows], ignore_index=True)
+    _write_partition(schemas.to_storage(rows, source), path)
+
+    index = superseded_index(source, root)
+    index[month] = now
+    _atomic_write(os.path.join(directory, SUPERSEDED_INDEX),
+                  lambda f: json.dump(dict(sorted(index.items())), f, indent=2))
+
+
+def read_superseded(source, months, root=HISTORY_ROOT):
+    """读取指定月份的存档分区 (按 schemas 转换类型，Superseded_At 为 datetime64)。"""
+    frames = []
+    for month in sorted(months):
+        path = os.path.join(superseded_dir(source, root), f"{month}.csv")
+        if os.path.exists(path):
+            frames.append(pd.read_csv(path))
+    if not frames:
+        return pd.DataFrame()
+    df = schemas.conform(pd.concat(frames, ignore_index=True), source)
+    df[SUPERSEDED_COLUMN] = pd.to_datetime(df[SUPERSEDED_COLUMN], errors="coerce")
+    return df
+
+
+def migrate_legacy(sources=None, root=HISTORY_ROOT, remove=False):
+    """把旧的单文件 history_*.csv 拆分为月分区。remove=True 时迁移后删除旧文件。"""
+    base = os.path.dirname(os.path.abspath(root))
+    for source in sources or SOURCES:
+        legacy = os.path.join(base, SOURCES[source]["legacy"])
+        if not os.path.exists(legacy):
+            continue
+        df = schemas.migrate(pd.read_csv(legacy), source, 1)
+        key = SOURCES[source]["key"]
+        df = df.sort_values(key, kind="stable")
+        with locked(source_dir(source, root)):
+            n = replace_history(df, source, root)
+        print(f"   📦 {SOURCES[source]['legacy']} -> {source_dir(source, root)}/ ({n} 个分区)")
+        if remove:
+            os.remove(legacy)
+
+
+if __name__ == "__main__":
+    import sys
+
+    if sys.argv[1:2] == ["migrate"]:
+        migrate_legacy(remove="--remove" in sys.argv)
+        for name in SOURCES:
+            migrate_schema(name)
@@ -0,0 +1,137 @@
+import streamlit as st
+import pandas as pd
+import functools
+import os
+import threading
+import time
+from datetime import datetime
+
+# ==========================================
+# 页面渲染性能剖析 (Render Profiler)
+# ==========================================
+# 开启方式: URL 加 ?profile=1，或设置环境变量 DASHBOARD_PROFILE=1。
+# 关闭时所有调用都是空操作，不影响正常页面。
+#
+# 用法:
+#   render_profiler.start()                 # 脚本开头
+#   render_profiler.begin("sidebar:eia")    # 进入一个区块 (自动结束上一个区块)
+#   @render_profiler.cache_data(ttl=60)     # 替代 @st.cache_data，额外记录耗时与命中/未命中
+#   render_profiler.render()                # 脚本结尾，显示折叠面板
+
+ENV_FLAG = "DASHBOARD_PROFILE"
+HISTORY_KEY = "_render_profile_history"
+MAX_HISTORY = 20
+
+# 每个会话的脚本在各自线程中运行，状态按线程隔离
+_local = threading.local()
+
+
+def _state():
+    if not hasattr(_local, "state"):
+        _local.state = {"enabled": False, "t0": None, "current": None, "sections": [], "loaders": [], "hit": True}
+    return _local.state
+
+
+def enabled():
+    try:
+        flag = st.query_params.get("profile", "")
+    except Exception:
+        flag = ""
+    return str(flag).lower() in ("1", "true", "yes") or os.environ.get(ENV_FLAG, "") == "1"
+
+
+def start():
+    _state().update(enabled=enabled(), t0=time.perf_counter(), current=None, sections=[], loaders=[])
+
+
+def _close_current(state, now):
+    if state["current"]:
+        name, t = state["current"]
+        state["sections"].append((name, now - t))
+        state["current"] = None
+
+
+def begin(name):
+    """结束上一个区块并开始计时新区块。"""
+    state = _state()
+    if not state["enabled"]:
+        return
+    now = time.perf_counter()
+    _close_current(state, now)
+    state["current"] = (name, now)
+
+
+def cache_data(**cache_kwargs):
+    """
+    等价于 @st.cache_data(**cache_kwargs)，额外记录每次调用的耗时与缓存命中情况。
+    被缓存的函数体只在未命中时执行，借此在线程局部变量里打标记。
+    """
+    return _instrumented(st.cache_data, cache_kwargs)
+
+
+def cache_resource(**cache_kwargs):
+    """同 cache_data，但基于 @st.cache_resource: 返回值在所有会话间共享 (不复制)。"""
+    return _instrumented(st.cache_resource, cache_kwargs)
+
+
+def _instrumented(st_cache, cache_kwargs):
+    def decorator(func):
+        @functools.wraps(func)
+        def body(*args, **kwargs):
+            _state()["hit"] = False
+            return func(*args, **kwargs)
+
+        cached = st_cache(**cache_kwargs)(body)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            state = _state()
+            if not state["enabled"]:
+                return cached(*args, **kwargs)
+            state["hit"] = True
+            t = time.perf_counter()
+            result = cached(*args, **kwargs)
+            state["loaders"].append({
+                "Loader": func.__name__,
+                "ms": round((time.perf_counter() - t) * 1000, 2),
+                "Cache": "hit" if state["hit"] else "miss",
+            })
+            return result
+
+        wrapper.clear = cached.clear
+        return wrapper
+
+    return decorator
+
+
+def render():
+    """脚本结尾调用: 汇总本次 rerun 并在侧边栏显示折叠面板。"""
+    state = _state()
+    if not state["enabled"]:
+        return
+    now = time.perf_counter()
+    _close_current(state, now)
+    total_ms = (now - state["t0"]) * 1000
+
+    sections = pd.DataFrame(state["sections"], columns=["Section", "seconds"])
+    sections["ms"] = (sections.pop("seconds") * 1000).round(2)
+    sections = sections.groupby("Section", sort=False, as_index=False)["ms"].sum()
+    loaders = pd.DataFrame(state["loaders"], columns=["Loader", "ms", "Cache"])
+
+    history = st.session_state.setdefault(HISTORY_KEY, [])
+    history.append({
+        "Rerun": datetime.now().strftime("%H:%M:%S"),
+        "Total ms": round(total_ms, 1),
+        "Slowest": sections.sort_values("ms").iloc[-1]["Section"] if not sections.empty else "-",
+        "Cache miss": int((loaders["Cache"] == "miss").sum()),
+    })
+    del history[:-MAX_HISTORY]
+
+    with st.sidebar:
+        with st.expander(f"⏱️ Render Profile — {total_ms:.0f} ms", expanded=False):
+            st.markdown("**区块耗时 (Sections)**")
+            st.dataframe(sections.sort_values("ms", ascending=False), hide_index=True, width='stretch')
+            st.markdown("**缓存加载 (Cached Loaders)**")
+            st.dataframe(loaders, hide_index=True, width='stretch')
+            st.markdown("**本会话 Rerun 记录**")
+            st.dataframe(pd.DataFrame(history[::-1]), hide_index=True, width='stretch')
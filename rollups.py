@@ -0,0 +1,221 @@
+import pandas as pd
+import os
+from datetime import timedelta
+from fnmatch import fnmatch
+import collector_metrics
+import history_store
+
+# ==========================================
+# 物化汇总 (Materialized Rollups)
+# ==========================================
+# 周 / 月 / 采暖季 (11 月 - 次年 3 月) 粒度的汇总表，直接给看板读取，聚合视图不再扫原始历史:
+#   history/_rollups/<source>/<grain>.csv     Period (周期起始日), Rows, <列>_<聚合>...
+# 增量维护: 采集器写入若干行后调用 update(source, dates)，
+#   只重算这些行所属的周期，且只读从这些周期起点开始的月分区 (日常运行只涉及最近一两个)。
+# 首次 (汇总文件不存在) 或 `python rollups.py rebuild` 时整表重建。
+#
+# 配置 (ROLLUPS):
+#   date    分桶用的日期列 (度日按报表的 Source_Date，而不是每天运行的 Run_Date)
+#   dedupe  同一日期有多行时只保留最后一行 (每天运行、每周一期的报表会重复入库)
+#   lagged  主键 (Run_Date) 不早于分桶日期但可能晚任意天 (报表补采)，读取分区时读到最新月份为止
+#   agg     聚合 -> 列名通配符
+#   grains  需要的粒度
+
+GRAINS = ["week", "month", "season"]
+SEASON_MONTHS = {11, 12, 1, 2, 3}  # 采暖季
+ROLLUP_DIR = "_rollups"
+
+AGG_SUFFIX = {"mean": "Mean", "sum": "Sum", "first": "First", "last": "Last", "min": "Min", "max": "Max"}
+
+ROLLUPS = {
+    "weather": {
+        "date": "Date", "dedupe": None, "lagged": False,
+        "agg": {"mean": ["*_Obs", "*_Day7", "*_Day10", "*_Day14"], "min": ["*_Obs"], "max": ["*_Obs"]},
+        "grains": GRAINS,
+    },
+    "hdd": {
+        "date": "Source_Date", "dedupe": "Source_Date", "lagged": True,
+        "agg": {"sum": ["*_Actual", "*_Dev_Norm", "*_Dev_Year"], "last": ["*_Seas_Total"]},
+        "grains": GRAINS,
+    },
+    "cdd": {
+        "date": "Source_Date", "dedupe": "Source_Date", "lagged": True,
+        "agg": {"sum": ["*_Actual", "*_Dev_Norm", "*_Dev_Year"], "last": ["*_Seas_Total"]},
+        "grains": ["week", "month"],  # 制冷需求没有采暖季
+    },
+    "storage_weekly": {
+        "date": "Week_Date", "dedupe": None, "lagged": False,
+        # 净变化求和 = 周期内的注入 (+) / 抽取 (-) 总量，例如整个采暖季的库存消耗
+        "agg": {"sum": ["*_Net_Change"], "first": ["*_Stock"], "last": ["*_Stock", "*_5Yr_Avg"],
+                "min": ["*_Stock"]},
+        "grains": GRAINS,
+    },
+}
+
+
+def rollup_path(source, grain, root=history_store.HISTORY_ROOT):
+    return os.path.join(root, ROLLUP_DIR, source, f"{grain}.csv")
+
+
+# ==========================================
+# 1. 周期 (Periods)
+# ==========================================
+
+def period_start(dates, grain):
+    """日期 -> 所属周期的起始日 (周一 / 月初 / 11 月 1 日)；不在采暖季的日期为 NaT。"""
+    dates = pd.to_datetime(pd.Series(dates), errors="coerce").dt.normalize()
+    if grain == "week":
+        return dates - pd.to_timedelta(dates.dt.weekday, unit="D")
+    if grain == "month":
+        return dates.dt.to_period("M").dt.start_time
+    year = dates.dt.year - (dates.dt.month <= 3).astype(int)
+    start = pd.to_datetime(year.astype("Int64").astype(str) + "-11-01", errors="coerce")
+    return start.where(dates.dt.month.isin(SEASON_MONTHS))
+
+
+def period_end(starts, grain):
+    if grain == "week":
+        return starts + timedelta(days=6)
+    if grain == "month":
+        return starts + pd.offsets.MonthEnd(0)
+    return starts + pd.DateOffset(months=5) - timedelta(days=1)  # 次年 3 月 31 日
+
+
+def period_label(start, grain):
+    start = pd.Timestamp(start)
+    if grain == "week":
+        return start.strftime("%Y-%m-%d")
+    if grain == "month":
+        return start.strftime("%Y-%m")
+    return f"{start.year}-{(start.year + 1) % 100:02d}"
+
+
+# ==========================================
+# 2. 聚合 (Aggregation)
+# ==========================================
+
+def _named_aggs(columns, spec):
+    """{输出列: (源列, 聚合)}，按声明顺序展开通配符。"""
+    out = {}
+    for col in columns:
+        for how, patterns in spec["agg"].items():
+            if any(fnmatch(col, p) for p in patterns):
+                out[f"{col}_{AGG_SUFFIX[how]}"] = (col, how)
+    return out
+
+
+def aggregate(df, source, grain):
+    """原始行 -> 周期汇总 (Period 升序)。"""
+    spec = ROLLUPS[source]
+    date_col = spec["date"]
+    if df.empty:
+        return pd.DataFrame()
+    if spec["dedupe"]:
+        df = df.drop_duplicates(spec["dedupe"], keep="last")
+    df = df.assign(Period=period_start(df[date_col], grain).to_numpy()).dropna(subset=["Period"])
+    df = df.sort_values(date_col, kind="stable")
+    aggs = _named_aggs([c for c in df.columns if c not in ("Period", date_col)], spec)
+    grouped = df.groupby("Period", sort=True)
+    out = grouped.agg(**aggs) if aggs else pd.DataFrame(index=grouped.size().index)
+    out.insert(0, "Rows", grouped.size())
+    return out.round(4).reset_index()
+
+
+# ==========================================
+# 3. 维护 (Maintenance)
+# ==========================================
+
+def _read_rollup(path):
+    if not os.path.exists(path):
+        return None
+    df = pd.read_csv(path)
+    df["Period"] = pd.to_datetime(df["Period"])
+    return df
+
+
+def _write_rollup(df, path):
+    out = df.sort_values("Period", kind="stable").copy()
+    out["Period"] = out["Period"].dt.strftime("%Y-%m-%d")
+    history_store.write_csv(out, path)
+
+
+def rebuild(source, root=history_store.HISTORY_ROOT):
+    """整表重建该源全部粒度的汇总。返回 {粒度: 周期数}。"""
+    raw = history_store.read_history(source, root=root)
+    counts = {}
+    with history_store.locked(os.path.join(root, ROLLUP_DIR, source)):
+        for grain in ROLLUPS[source]["grains"]:
+            table = aggregate(raw, source, grain)
+            if not table.empty:
+                _write_rollup(table, rollup_path(source, grain, root))
+            counts[grain] = len(table)
+    return counts
+
+
+def update(source, dates, root=history_store.HISTORY_ROOT):
+    """
+    dates: 本次写入 (或被修订) 的行的分桶日期。只重算它们所属的周期并写回汇总文件。
+    返回重算的周期数。
+    """
+    spec = ROLLUPS.get(source)
+    dates = pd.to_datetime(pd.Series(list(dates)), errors="coerce").dropna()
+    if spec is None or dates.empty:
+        return 0
+    grains = spec["grains"]
+    if any(not os.path.exists(rollup_path(source, g, root)) for g in grains):
+        recomputed = sum(rebuild(source, root).values())
+        collector_metrics.add("rollup_periods", recomputed)
+        return recomputed
+
+    # 受影响周期的日期范围 -> 只读覆盖该范围的分区
+    spans = []
+    for grain in grains:
+        starts = period_start(dates, grain).dropna().unique()
+        if len(starts):
+            starts = pd.DatetimeIndex(starts)
+            spans.append((grain, starts, starts.min(), period_end(starts, grain).max()))
+    if not spans:
+        return 0
+    lo = min(s[2] for s in spans)
+    hi = max(s[3] for s in spans)
+    raw = history_store.read_history(source, start=lo, end=None if spec["lagged"] else hi, root=root)
+    if not raw.empty:
+        raw = raw[pd.to_datetime(raw[spec["date"]]).between(lo, hi)]
+
+    recomputed = 0
+    with history_store.locked(os.path.join(root, ROLLUP_DIR, source)):
+        for grain, starts, _, _ in spans:
+            path = rollup_path(source, grain, root)
+            fresh = aggregate(raw, source, grain)
+            fresh = fresh[fresh["Period"].isin(starts)] if not fresh.empty else fresh
+            table = _read_rollup(path)
+            table = table[~table["Period"].isin(starts)]
+            _write_rollup(pd.concat([table, fresh], ignore_index=True), path)
+            recomputed += len(fresh)
+    collector_metrics.add("rollup_periods", recomputed)
+    return recomputed
+
+
+def update_rows(source, rows, root=history_store.HISTORY_ROOT):
+    """采集器入库后调用: 用本次写入行的分桶日期列增量更新。未配置汇总的源直接返回 0。"""
+    spec = ROLLUPS.get(source)
+    if spec is None or rows is None or rows.empty or spec["date"] not in rows.columns:
+        return 0
+    return update(source, rows[spec["date"]], root=root)
+
+
+def load(source, grain, root=history_store.HISTORY_ROOT):
+    """读取汇总表 (看板用)；不存在时返回 None。"""
+    return _read_rollup(rollup_path(source, grain, root))
+
+
+if __name__ == "__main__":
+    import sys
+
+    if sys.argv[1:2] == ["rebuild"]:
+        for name in sys.argv[2:] or ROLLUPS:
+            if history_store.has_history(name):
+                counts = rebuild(name)
+                print(f"✅ [Rollups] {name}: " + ", ".join(f"{g} {n}" for g, n in counts.items()))
+    else:
+        print("用法: python rollups.py rebuild [source ...]")
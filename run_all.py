@@ -0,0 +1,86 @@
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import source_engine
+import climate_collector
+import hdd_collector
+import cdd_collector
+import storage_collector
+import data_health
+import storage_nowcast
+import hdd_projection
+
+# ==========================================
+# 统一调度 (Run All Sources)
+# ==========================================
+# 取代 workflow 里逐个串行执行的采集器步骤:
+#   1. 全部 SOURCES 并发运行 (各自的下载预算 / 指标互不干扰，写入各自的历史库分区)
+#   2. 全部完成后按顺序运行依赖它们输出的派生任务 (数据健康检查与定向补采、库存 nowcast、HDD 投影)
+# 新数据源只需在自己的模块里声明 source_engine.Source，并加入下面的 SOURCES。
+# 并发数可用环境变量 RUN_ALL_WORKERS 调整。
+#
+# 用法: python run_all.py
+
+SOURCES = [
+    climate_collector.SOURCE,
+    hdd_collector.SOURCE,
+    cdd_collector.SOURCE,
+    storage_collector.SOURCE,
+]
+
+# 派生任务: 名称 -> 函数 (按顺序执行；health 先补齐空洞，后面的任务读到的是修复后的历史)
+DERIVED_JOBS = {
+    "health": data_health.run_collector,
+    "nowcast": storage_nowcast.run_collector,
+    "projection": hdd_projection.run_collector,
+}
+
+MAX_WORKERS = int(os.environ.get("RUN_ALL_WORKERS", "8"))
+
+
+def _run_source(source):
+    t = time.perf_counter()
+    try:
+        rows = source_engine.run(source)
+        status = "ok" if rows is not None else "no data"
+    except Exception as e:
+        print(f"❌ [{source.name}] 运行出错: {e}")
+        status = "error"
+    return source.name, status, time.perf_counter() - t
+
+
+def run_all(sources=None, derived=None):
+    """运行全部数据源与派生任务，返回 [(名称, 状态, 耗时秒)]。"""
+    sources = SOURCES if sources is None else sources
+    derived = DERIVED_JOBS if derived is None else derived
+    print(f"🚀 [Run All] 启动: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} | "
+          f"{len(sources)} 个数据源, 并发 {min(MAX_WORKERS, len(sources))}")
+
+    # 1. 数据源并发运行 (各线程的输出可能交错，以最后的汇总为准)
+    with ThreadPoolExecutor(max_workers=max(1, min(MAX_WORKERS, len(sources)))) as pool:
+        summary = list(pool.map(_run_source, sources))
+
+    # 2. 派生任务依赖上面的历史库，串行执行
+    for name, job in derived.items():
+        t = time.perf_counter()
+        try:
+            job()
+            status = "ok"
+        except Exception as e:
+            print(f"❌ [{name}] 运行出错: {e}")
+            status = "error"
+        summary.append((name, status, time.perf_counter() - t))
+
+    print("📋 [Run All] 汇总:")
+    for name, status, seconds in summary:
+        mark = "✅" if status == "ok" else ("⚠️" if status == "no data" else "❌")
+        print(f"   {mark} {name:<12} {status:<8} {seconds:6.2f}s")
+    return summary
+
+
+if __name__ == "__main__":
+    results = run_all()
+    # 与原先逐步执行的 workflow 一致: 只有异常才让任务失败 ("无新数据" 不算)
+    sys.exit(1 if any(status == "error" for _, status, _ in results) else 0)
@@ -0,0 +1,209 @@
+import numpy as np
+import pandas as pd
+
+# ==========================================
+# 历史库列定义 (History Schemas)
+# ==========================================
+# 每个历史源声明: 列顺序 + 紧凑类型 + 版本号。
+#   - 读取: 分区按原样 read_csv (传 dtype 字典反而让每个小文件多出约 0.5ms 的开销)，
+#           拼接后 conform() 一次性统一列顺序、数值降位 (int16/int32/float32)、日期解析为 datetime64
+#   - 写入: to_storage() 按声明顺序输出列，日期写回 YYYY-MM-DD，整数列不带 ".0"
+#   - 版本: 存储格式变化时递增 version 并在 MIGRATIONS 登记迁移函数，
+#           history_store 会在写入前 (或 `python history_store.py migrate`) 把旧分区升级
+#
+# 类型:
+#   "date"      datetime64，存储为 %Y-%m-%d
+#   "timestamp" datetime64，存储为 %Y-%m-%d %H:%M:%S
+#   "int16" / "int32"  含缺失值时退回 float32 (避免可空整数在 Styler / numpy 运算中出错)
+#   "float32"
+#   "category"  低基数字符串 (情景编号、指标名)
+
+DATE_FORMATS = {"date": "%Y-%m-%d", "timestamp": "%Y-%m-%d %H:%M:%S"}
+INT_RANGES = {"int16": np.iinfo(np.int16), "int32": np.iinfo(np.int32)}
+
+
+def _regional(prefixes, fields):
+    return [(f"{p}_{name}", dtype) for p in prefixes for name, dtype in fields]
+
+
+DEGREE_DAY_FIELDS = [("Actual", "int16"), ("Dev_Norm", "int16"), ("Dev_Year", "int16"), ("Seas_Total", "int16")]
+STORAGE_FIELDS = [("Stock", "int32"), ("Net_Change", "int16"), ("Year_Ago", "int32"), ("5Yr_Avg", "float32")]
+STORAGE_REGIONS = ["Total", "East", "Midwest", "Mountain", "Pacific", "SouthCentral", "Salt", "NonSalt"]
+TELECONNECTIONS = ["AO", "NAO", "PNA"]
+
+SCHEMAS = {
+    "weather": {
+        "version": 2,
+        "columns": [("Date", "date")]
+                   + _regional(TELECONNECTIONS, [("Obs", "float32"), ("Day7", "float32"),
+                                                 ("Day10", "float32"), ("Day14", "float32")])
+                   + [("Update_Time", "timestamp")],
+    },
+    "hdd": {
+        "version": 2,
+        "columns": [("Run_Date", "date"), ("Source_Date", "date"), ("Update_Time", "timestamp")]
+                   + _regional(["NE", "MA", "MW", "US"], DEGREE_DAY_FIELDS),
+    },
+    "cdd": {
+        "version": 2,
+        "columns": [("Run_Date", "date"), ("Source_Date", "date"), ("Update_Time", "timestamp")]
+                   + _regional(["SA", "WSC", "MW", "US"], DEGREE_DAY_FIELDS),
+    },
+    "storage": {
+        "version": 2,
+        "columns": [("Run_Date", "date"), ("Report_Date", "date"), ("Update_Time", "timestamp")]
+                   + _regional(STORAGE_REGIONS, STORAGE_FIELDS),
+    },
+    "storage_weekly": {
+        "version": 2,
+        # 周度表由库存序列推算，Net Change 在首周为空、Year Ago / 5 年均值在前几年为空
+        "columns": [("Week_Date", "date")]
+                   + _regional(STORAGE_REGIONS, [("Stock", "int32"), ("Net_Change", "float32"),
+                                                 ("Year_Ago", "float32"), ("5Yr_Avg", "float32")]),
+    },
+    "forecasts": {
+        "version": 2,
+        # 预报修正表 (forecast_revisions.py): 每次运行 x 每个 lead 一行
+        "columns": [("Issue_Date", "date"), ("Target_Date", "date"), ("Lead", "int16")]
+                   + _regional(TELECONNECTIONS, [("Fcst", "float32"), ("Rev1", "float32"),
+                                                 ("Rev7", "float32"), ("Trend", "float32")]),
+    },
+    "scenarios": {
+        "version": 2,
+        "columns": [("Date", "date"), ("Scenario", "category"), ("Weight", "float32"), ("Members", "int16"),
+                    ("Silhouette", "float32"), ("Index", "category")]
+                   + [(f"L{lead}", "float32") for lead in range(15)]
+                   + [("Prev_Scenario", "category"), ("Prev_Weight", "float32")],
+    },
+}
+
+
+# ==========================================
+# 迁移 (Migrations)
+# ==========================================
+# MIGRATIONS[源][目标版本] = 函数(原始 DataFrame) -> DataFrame，作用于未转换类型的分区内容。
+# 版本 1 = 引入列定义之前的 CSV (列顺序随历史演变，整数列可能写成 "3116.0")；
+# 1 -> 2 的列重排与整数格式由 to_storage 统一完成，这里只登记需要改写取值的步骤。
+
+def _drop_unknown_source_date(df):
+    """度日报表日期解析失败时曾写入 "Unknown"，改为空值以便按日期类型存储。"""
+    if "Source_Date" in df.columns:
+        df = df.copy()
+        df["Source_Date"] = df["Source_Date"].replace("Unknown", np.nan)
+    return df
+
+
+MIGRATIONS = {
+    "hdd": {2: _drop_unknown_source_date},
+    "cdd": {2: _drop_unknown_source_date},
+}
+
+
+def current_version(source):
+    return SCHEMAS[source]["version"]
+
+
+def migrate(df, source, from_version):
+    """依次执行 from_version 之后的迁移步骤。"""
+    for target in range(from_version + 1, current_version(source) + 1):
+        step = MIGRATIONS.get(source, {}).get(target)
+        if step is not None:
+            df = step(df)
+    return df
+
+
+# ==========================================
+# 类型转换 (Conversion)
+# ==========================================
+
+def columns(source):
+    return [name for name, _ in SCHEMAS[source]["columns"]]
+
+
+def only(*names):
+    """read_csv 的 usecols: 只解析需要的列 (分区缺少某列时不报错)。"""
+    wanted = set(names)
+    return lambda col: col in wanted
+
+
+def column_types(source):
+    return dict(SCHEMAS[source]["columns"])
+
+
+def order(df, source):
+    """声明的列按声明顺序在前，未声明的列保持原顺序排在后面。"""
+    declared = [c for c in columns(source) if c in df.columns]
+    extra = [c for c in df.columns if c not in declared]
+    ordered = declared + extra
+    return df if ordered == list(df.columns) else df[ordered]
+
+
+def _numeric_block(df):
+    """把若干列一次性取成 float64 矩阵 (非数值列先 to_numeric)。"""
+    if not all(pd.api.types.is_numeric_dtype(t) for t in df.dtypes):
+        df = df.apply(pd.to_numeric, errors="coerce")
+    return df.to_numpy(dtype="float64", na_value=np.nan)
+
+
+def _integral(block):
+    """每列是否全部为有限整数值。"""
+    return np.isfinite(block).all(axis=0) & (block == np.round(block)).all(axis=0)
+
+
+def conform(df, source):
+    """按声明的列顺序与紧凑类型整理 DataFrame (未声明的列排在后面，数值列降为 float32)。"""
+    types = column_types(source)
+    df = order(df, source)
+    # 数值列整块在 numpy 上判断与转换，最后一次性组装 (避免逐列 pandas 运算的开销)
+    numeric = [c for c in df.columns if types.get(c) == "float32" or types.get(c) in INT_RANGES]
+    block = _numeric_block(df[numeric])
+    integral = _integral(block)
+    has_rows = len(block) > 0
+    lo = block.min(axis=0) if has_rows else np.zeros(len(numeric))
+    hi = block.max(axis=0) if has_rows else np.zeros(len(numeric))
+    position = {c: j for j, c in enumerate(numeric)}
+
+    out = {}
+    for col in df.columns:
+        dtype = types.get(col)
+        if col in position:
+            j = position[col]
+            info = INT_RANGES.get(dtype)
+            if info is not None and integral[j] and info.min <= lo[j] and hi[j] <= info.max:
+                values = block[:, j].astype(dtype)
+            else:
+                values = block[:, j].astype("float32")
+        elif dtype in DATE_FORMATS:
+            values = df[col]
+            if not pd.api.types.is_datetime64_any_dtype(values):
+                values = pd.to_datetime(values, format=DATE_FORMATS[dtype], errors="coerce")
+        elif dtype == "category":
+            values = df[col].astype("category")
+        elif dtype is None and pd.api.types.is_float_dtype(df[col]):
+            values = df[col].to_numpy(dtype="float32")
+        else:
+            values = df[col]
+        out[col] = values
+    return pd.DataFrame(out, index=df.index)
+
+
+def to_storage(df, source):
+    """
+    写入前的规范化: 声明的列顺序、日期写回字符串、整数值列不带小数点。
+    浮点列保持原精度 (不经 float32)，避免写回时出现 0.17890000343 之类的尾数。
+    """
+    types = column_types(source)
+    df = order(df, source).copy()
+    ints = [c for c in df.columns if types.get(c) in INT_RANGES]
+    block = _numeric_block(df[ints])
+    whole = (np.isnan(block) | (block == np.round(block))).all(axis=0)
+    for j, col in enumerate(ints):
+        if whole[j]:
+            df[col] = pd.array(block[:, j], dtype="Int64") if np.isnan(block[:, j]).any() \
+                else block[:, j].astype("int64")
+    for col in df.columns:
+        dtype = types.get(col)
+        if dtype in DATE_FORMATS:
+            parsed = pd.to_datetime(df[col], errors="coerce")
+            df[col] = parsed.dt.strftime(DATE_FORMATS[dtype]).where(parsed.notna(), None)
+    return df
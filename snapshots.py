@@ -0,0 +1,107 @@
+import os
+import tempfile
+import pandas as pd
+import history_store
+
+try:
+    import pyarrow as pa
+except ImportError:  # 没有 pyarrow 时快照功能关闭，读者回退到 CSV 分区
+    pa = None
+
+# ==========================================
+# Arrow 快照 (Memory-Mapped Snapshots)
+# ==========================================
+# 采集器写完历史库后，把整个源 (按 schemas 转好类型) 发布为一个未压缩的 Arrow IPC 文件:
+#   snapshots/<source>.arrow
+# 看板用 pa.memory_map 打开: 不解析 CSV，数值 / 日期列直接引用映射的页面 (零拷贝)，
+# 同一台机器上的多个 streamlit 进程共享同一份物理内存 (操作系统页缓存)。
+#
+# 新鲜度: 快照元数据记录发布时源目录的 history_store.stamp() (版本号 + mtime)，
+# 与当前不一致即视为过期，load() 会先重新发布再映射 (例如 git pull 带来新分区时)。
+# 快照是派生文件，不进 git。
+#
+# 零拷贝的前提: 数值列的 NaN / 日期列的 NaT 作为普通值写入 (不生成 null 位图)，
+# 这样 to_pandas 无需填充缺失值，可以直接包装映射的缓冲区。
+
+SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR", "snapshots")
+
+
+def available():
+    return pa is not None
+
+
+def snapshot_path(source, directory=SNAPSHOT_DIR):
+    return os.path.join(directory, f"{source}.arrow")
+
+
+def _to_table(df, metadata):
+    arrays = []
+    for col in df.columns:
+        values = df[col]
+        if isinstance(values.dtype, pd.CategoricalDtype) or not (
+                pd.api.types.is_numeric_dtype(values) or pd.api.types.is_datetime64_any_dtype(values)):
+            arrays.append(pa.array(values, from_pandas=True))
+        else:
+            arrays.append(pa.array(values.to_numpy()))  # NaN / NaT 作为值保留
+    table = pa.Table.from_arrays(arrays, names=[str(c) for c in df.columns])
+    return table.replace_schema_metadata({k: str(v) for k, v in metadata.items()})
+
+
+def publish(source, root=history_store.HISTORY_ROOT, directory=SNAPSHOT_DIR):
+    """把源的完整历史写成 Arrow 快照 (原子替换)。返回行数；没有 pyarrow 或没有数据时返回 None。"""
+    if pa is None:
+        return None
+    src = history_store.source_dir(source, root)
+    with history_store.locked(src):
+        stamp = _stamp_str(src)
+        df = history_store.read_history(source, root=root)
+    if df.empty:
+        return None
+
+    table = _to_table(df, {"source": source, "history_stamp": stamp, "rows": len(df)})
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=f"{source}.", suffix=".tmp", dir=directory)
+    os.close(fd)
+    try:
+        with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, snapshot_path(source, directory))
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return len(df)
+
+
+def _stamp_str(src):
+    return "%d:%d" % history_store.stamp(src)
+
+
+def _open(path):
+    reader = pa.ipc.open_file(pa.memory_map(path, "r"))
+    meta = reader.schema.metadata or {}
+    return reader, meta.get(b"history_stamp", b"").decode()
+
+
+def load(source, root=history_store.HISTORY_ROOT, directory=SNAPSHOT_DIR):
+    """
+    以内存映射方式读取快照为 DataFrame (数值 / 日期列零拷贝，只读)。
+    快照过期时先重新发布；pyarrow 不可用或发布失败时返回 None，由调用方回退到 CSV。
+    """
+    if pa is None:
+        return None
+    path = snapshot_path(source, directory)
+    current = _stamp_str(history_store.source_dir(source, root))
+    try:
+        reader, stamp = _open(path) if os.path.exists(path) else (None, None)
+        if stamp != current:
+            if publish(source, root, directory) is None:
+                return None
+            reader, stamp = _open(path)
+        # split_blocks: 每列单独成块，避免 pandas 把同类型列合并成新数组 (那会触发复制)
+        return reader.read_all().to_pandas(split_blocks=True)
+    except Exception as e:
+        print(f"⚠️ 快照读取失败 ({source}): {e}")
+        return None
+
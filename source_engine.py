@@ -0,0 +1,194 @@
+import pandas as pd
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import alerts
+import collector_metrics
+import fetch_client
+import history_store
+import rollups
+import schemas
+import snapshots
+
+# ==========================================
+# 数据源引擎 (Source Engine)
+# ==========================================
+# 各采集器原本各自实现 "下载 -> 解析 -> 构造 new_row -> 去重判断 -> 入库 -> 快照" 的同一条流水线。
+# 现在采集器只声明一个 Source (URL、解析函数、历史库源名、去重列)，其余由引擎统一处理:
+#   1. 下载: 多个 URL 并发抓取 (fetch_client.get_cached: 重试 / 对冲 / 预算 / 条件请求缓存)
+#   2. 解析: parse(payloads, ctx) 返回一行 (dict)、多行 (list / DataFrame) 或 None (无有效数据)
+#   3. 补列: 模式里声明了 Run_Date / Update_Time 而解析结果没有时，按本次运行时间补上
+#   4. 去重: dedupe 列的值已在库中 = 缓存命中 (本次运行没有带来新数据)，计入指标
+#   5. 入库: history_store.upsert_history (按主键覆盖)，增量更新周 / 月 / 采暖季汇总 (rollups)，
+#      之后调用 after_store(ctx) 处理附属输出
+#   6. 告警: 用本次写入的行评估 alerts.RULES (只看新数据，状态翻转才告警)
+#   7. 快照: 发布该源及 extra_snapshots 的 Arrow 快照
+# 每次运行自动带 collector_metrics 指标与 fetch_client 预算。新数据源只需写解析函数。
+#
+# 用法:
+#   SOURCE = source_engine.Source("hdd", "hdd", {"HDD": URL}, parse, dedupe="Source_Date")
+#   source_engine.run(SOURCE)
+
+
+class Source:
+    """
+    一个数据源的声明。
+      name            指标 / 日志里的名字
+      history         history_store 源名 (history/<history>/)
+      urls            {标签: URL}，标签即 parse 收到的 payloads 的键
+      parse           parse(payloads, ctx) -> 行；payloads 为 {标签: bytes 或 None (下载失败)}
+      dedupe          判断 "该期数据已入库" 的列 (默认用主键)
+      after_store     入库后调用 after_store(ctx)，写轨迹 / 周度表等附属输出
+      extra_snapshots 除 history 外还要发布快照的源
+      timeout         单个 URL 的请求超时 (秒)
+      budget          本次运行全部下载的总预算 (秒)
+    """
+
+    def __init__(self, name, history, urls, parse, dedupe=None, after_store=None,
+                 extra_snapshots=(), timeout=30, budget=120):
+        self.name = name
+        self.history = history
+        self.urls = urls
+        self.parse = parse
+        self.dedupe = dedupe or history_store.SOURCES[history]["key"]
+        self.after_store = after_store
+        self.extra_snapshots = tuple(extra_snapshots)
+        self.timeout = timeout
+        self.budget = budget
+
+    def __repr__(self):
+        return f"Source({self.name!r}, history={self.history!r}, urls={list(self.urls)})"
+
+
+def decode(payload):
+    """报表正文 bytes -> str (去掉 BOM；非 UTF-8 时按 latin-1 兜底)。"""
+    try:
+        return payload.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        return payload.decode("latin-1")
+
+
+# ==========================================
+# 1. 下载 (Fetch)
+# ==========================================
+
+def _fetch_one(source, label, url):
+    stage = "download" if len(source.urls) == 1 else f"download:{label}"
+    try:
+        with collector_metrics.stage(stage):
+            status, content, from_cache = fetch_client.get_cached(url, timeout=source.timeout)
+        if status != 200:
+            print(f"❌ {label} 下载失败: HTTP {status}")
+            return None
+        if from_cache:
+            print(f"   ♻️ {label} 未更新 (304)，使用本地缓存")
+        return content
+    except Exception as e:
+        print(f"❌ {label} 下载失败: {e}")
+        return None
+
+
+def fetch_all(source):
+    """并发下载全部 URL，返回 {标签: bytes 或 None}。下载线程继承本次运行的指标与预算。"""
+    items = list(source.urls.items())
+    if len(items) == 1:
+        label, url = items[0]
+        return {label: _fetch_one(source, label, url)}
+    with ThreadPoolExecutor(max_workers=len(items)) as pool:
+        futures = {label: pool.submit(contextvars.copy_context().run, _fetch_one, source, label, url)
+                   for label, url in items}
+        return {label: future.result() for label, future in futures.items()}
+
+
+# ==========================================
+# 2. 流水线 (Pipeline)
+# ==========================================
+
+def _as_frame(rows):
+    if rows is None:
+        return None
+    if isinstance(rows, dict):
+        rows = [rows]
+    df = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(list(rows))
+    return None if df.empty else df
+
+
+def _fill_run_columns(df, source, ctx):
+    declared = schemas.columns(source.history)
+    for col, value in (("Run_Date", ctx["run_date"]), ("Update_Time", ctx["run_time"])):
+        if col in declared and col not in df.columns:
+            df[col] = value
+    return df
+
+
+def already_stored(df, source):
+    """本次的 dedupe 值是否全部已在库中。主键不早于 dedupe 日期，只需读之后的分区。"""
+    values = df[source.dedupe].astype(str)
+    start = pd.to_datetime(values, errors="coerce").min()
+    key = history_store.SOURCES[source.history]["key"]
+    stored = history_store.read_history(source.history, start=None if pd.isna(start) else start,
+                                        usecols=schemas.only(key, source.dedupe))
+    if stored.empty or source.dedupe not in stored.columns:
+        return False
+    return bool(values.isin(stored[source.dedupe].astype(str)).all())
+
+
+def _pipeline(source):
+    now = datetime.now()
+    ctx = {"run_date": now.strftime('%Y-%m-%d'), "run_time": now.strftime('%Y-%m-%d %H:%M:%S')}
+    print(f"🚀 [{source.name}] 任务启动: {ctx['run_time']}")
+
+    # 1. 下载
+    payloads = fetch_all(source)
+    if all(p is None for p in payloads.values()):
+        print("❌ 所有数据源均下载失败，任务终止。")
+        collector_metrics.mark_failed("all sources failed")
+        return None
+
+    # 2. 解析
+    try:
+        with collector_metrics.stage("parse"):
+            rows = _as_frame(source.parse(payloads, ctx))
+    except Exception as e:
+        print(f"❌ 解析过程出错: {e}")
+        rows = None
+    if rows is None:
+        print("❌ 未获取到有效数据，任务终止。")
+        collector_metrics.mark_failed("no data")
+        return None
+    rows = _fill_run_columns(rows, source, ctx)
+
+    # 3. 去重判断 + 入库 (列顺序与类型由 schemas.py 统一)
+    with collector_metrics.stage("store"):
+        collector_metrics.record_cache(already_stored(rows, source))
+        if history_store.upsert_history(rows, source.history):
+            print("   🔄 已覆盖旧记录")
+    print(f"✅ [成功] 数据已保存至 {history_store.source_dir(source.history)}/")
+
+    # 只重算本次写入行所属的周期
+    with collector_metrics.stage("rollups"):
+        rollups.update_rows(source.history, rows)
+
+    if source.after_store is not None:
+        source.after_store(ctx)
+
+    # 4. 告警: 只看本次写入的行，延迟即入库延迟
+    with collector_metrics.stage("alerts"):
+        alerts.evaluate(source.history, rows)
+
+    # 5. 看板 / 数据接口内存映射读取的 Arrow 快照
+    with collector_metrics.stage("snapshot"):
+        for name in (source.history,) + source.extra_snapshots:
+            snapshots.publish(name)
+    return len(rows)
+
+
+def run(source):
+    """运行一个数据源: 返回写入的行数，失败返回 None。"""
+
+    @collector_metrics.instrumented(source.name)
+    @fetch_client.with_deadline(source.budget)
+    def _run():
+        return _pipeline(source)
+
+    return _run()
@@ -1,28 +1,110 @@
 import pandas as pd
-import requests
+import numpy as np
 import json
-from datetime import datetime
-import os
+import re
+import collector_metrics
+import history_store
+import rollups
+import source_engine
 
 # === 配置区域 ===
-HISTORY_FILE = "history_storage.csv"
+HISTORY_SOURCE = "storage"  # history/storage/<YYYY-MM>.csv
+WEEKLY_SOURCE = "storage_weekly"  # 全部区域 x 全部周次 (history/storage_weekly/)
 URL_EIA = "https://ir.eia.gov/ngs/wngsr.json"
+FETCH_BUDGET_S = 120  # 本次运行全部下载 (含重试 / 对冲) 的总预算
+
+# EIA 序列名 (归一化后) -> 列前缀
+EIA_REGIONS = {
+    "total lower 48": "Total",
+    "east": "East",
+    "midwest": "Midwest",
+    "mountain": "Mountain",
+    "pacific": "Pacific",
+    "south central": "SouthCentral",
+    "salt": "Salt",
+    "nonsalt": "NonSalt",
+}
+
+YEAR_AGO_OFFSET = pd.Timedelta(weeks=52)  # EIA 的 Year Ago 即 52 周前的同一周
+AVG_YEARS = 5
+
+
+def region_prefix(series_name):
+    """把 EIA 序列名归一化为列前缀，例如 "South Central Region" -> "SouthCentral"。"""
+    norm = re.sub(r"[^a-z0-9 ]", "", series_name.lower())
+    norm = " ".join(w for w in norm.split() if w != "region")
+    if norm in EIA_REGIONS:
+        return EIA_REGIONS[norm]
+    if norm.startswith("total lower 48"):
+        return "Total"
+    # 未登记的新序列: 按单词拼成驼峰前缀，保证不会被丢弃
+    return "".join(w.capitalize() for w in norm.split()) or None
+
+
+def index_eia_series(json_data):
+    """
+    单次遍历 JSON，把所有序列按 (周次, 区域) 建立索引。
+    返回：(stocks, calc)
+      - stocks: DataFrame，index 为周次 (datetime)，列为区域前缀
+      - calc:   {前缀: 官方 calculated 字段}
+    """
+    records = []
+    calc = {}
+    for series in json_data.get("series", []):
+        prefix = region_prefix(series.get("name", ""))
+        if not prefix or prefix in calc:
+            continue
+        calc[prefix] = series.get("calculated") or {}
+        records.extend((date_str, prefix, val) for date_str, val in series.get("data", []))
+
+    if not records:
+        return pd.DataFrame(), calc
+
+    long_df = pd.DataFrame(records, columns=["Week_Date", "Region", "Stock"])
+    long_df["Week_Date"] = pd.to_datetime(long_df["Week_Date"])
+    long_df["Stock"] = pd.to_numeric(long_df["Stock"], errors="coerce")
+    stocks = long_df.pivot_table(index="Week_Date", columns="Region", values="Stock", aggfunc="last")
+    stocks.columns.name = None
+    return stocks.reindex(columns=[p for p in calc if p in stocks.columns]).sort_index(), calc
+
+
+def compute_weekly_deltas(stocks):
+    """
+    对所有区域、所有周次一次性计算 Net Change / Year Ago / 5-Yr Avg (向量化)。
+    5 年均值要求过去 5 年同一周的数据齐全，否则留空。
+    """
+    idx = stocks.index
 
+    def shifted(offset):
+        return stocks.reindex(idx - offset).to_numpy(dtype=float)
+
+    values = stocks.to_numpy(dtype=float)
+    past = np.stack([shifted(YEAR_AGO_OFFSET * k) for k in range(1, AVG_YEARS + 1)])
+
+    fields = {
+        "Stock": values,
+        "Net_Change": values - shifted(pd.Timedelta(weeks=1)),
+        "Year_Ago": past[0],
+        "5Yr_Avg": past.mean(axis=0),  # 任一年缺失 -> NaN
+    }
 
-def fetch_eia_data():
+    out = {}
+    for j, prefix in enumerate(stocks.columns):
+        for field, arr in fields.items():
+            out[f"{prefix}_{field}"] = arr[:, j]
+    weekly = pd.DataFrame(out, index=idx)
+    weekly.index.name = "Week_Date"
+    return weekly
+
+
+def parse_eia_report(payload):
     """
-    抓取 EIA 最新库存报告。
-    增强逻辑：手动查找 Year Ago 数据，防止 API 漏传。
+    解析 EIA 最新库存报告。
+    一次遍历索引全部区域与全部周次，再向量化计算 Year Ago / 5-Yr 等对比值。
+    返回：(data_bag, report_date, stocks)
     """
-    print(f"   -> 正在连接 EIA 服务器...")
     try:
-        response = requests.get(URL_EIA, timeout=30)
-        if response.status_code != 200:
-            print(f"❌ 连接失败: {response.status_code}")
-            return None, None
-
-        raw_data = response.content.decode("utf-8-sig")
-        json_data = json.loads(raw_data)
+        json_data = json.loads(payload.decode("utf-8-sig"))
 
         # 1. 获取关键日期
         report_date = json_data.get("current_week")  # 本周数据日期
@@ -31,107 +113,142 @@ def fetch_eia_data():
         print(f"   📅 EIA 报告日期: {report_date}")
         print(f"   🔙 去年对比日期: {year_ago_date}")
 
-        data_bag = {}
+        # 2. 单次遍历建立 (周次, 区域) 索引
+        stocks, calc = index_eia_series(json_data)
+        collector_metrics.add("rows_parsed", int(stocks.notna().sum().sum()) if not stocks.empty else 0)
+        if stocks.empty:
+            print("❌ JSON 中没有任何序列数据")
+            return None, report_date, None
+        print(f"   🗂️ 区域: {len(stocks.columns)} 个 | 周次: {len(stocks)} 周")
+
+        with collector_metrics.stage("compute"):
+            weekly = compute_weekly_deltas(stocks)
+        report_ts = pd.Timestamp(report_date) if report_date else None
+        if report_ts is None or report_ts not in weekly.index:
+            # current_week 在序列里没有数据点: 退回最新一周，官方 calculated / year_ago 对应的是报告周，不再使用
+            latest = weekly.index.max()
+            print(f"   ⚠️ 报告周 {report_date} 不在序列中，改用最新一周 {latest.date()} (对比值按序列计算)")
+            report_date, year_ago_date, calc = latest.strftime("%Y-%m-%d"), None, {}
+            report_ts = latest
+        current = weekly.reindex([report_ts]).iloc[0]
+
+        # 3. 提取本周各区域数值
+        #    Net Change / 5-Yr 优先用官方算好的值; Year Ago 按 JSON 给出的日期直接取
+        year_ago_row = None
+        if year_ago_date and pd.Timestamp(year_ago_date) in stocks.index:
+            year_ago_row = stocks.loc[pd.Timestamp(year_ago_date)]
+
+        def clean(val):
+            return None if val is None or pd.isna(val) else val
 
-        # 2. 遍历区域
-        for series in json_data.get("series", []):
-            name_raw = series.get("name", "").lower()
-
-            prefix = None
-            if name_raw.startswith("total lower 48"):
-                prefix = "Total"
-            elif name_raw.startswith("east"):
-                prefix = "East"
-            elif name_raw.startswith("midwest"):
-                prefix = "Midwest"
-            elif name_raw.startswith("south central"):
-                prefix = "SouthCentral"
-
-            if prefix:
-                # === 核心修改：手动查找当前值和去年值 ===
-                stock_val = None
-                year_ago_val = None
-
-                # 遍历该区域的所有历史数据
-                for date_str, val in series.get("data", []):
-                    if date_str == report_date:
-                        stock_val = val
-                    elif date_str == year_ago_date:
-                        year_ago_val = val
-
-                # 获取计算字段 (Net Change 还是直接用官方算好的比较稳)
-                calc = series.get("calculated", {})
-
-                # 如果手动没找到 year_ago (极少情况)，再尝试用 calc 里的补救
-                if year_ago_val is None:
-                    year_ago_val = calc.get("year_ago")
-
-                data_bag[prefix] = {
-                    "Stock": stock_val,
-                    "Net_Change": calc.get("net_change"),
-                    "Year_Ago": year_ago_val,  # 这里现在应该是实打实的数值了
-                    "Avg_5Yr": calc.get("5yr-avg")
-                }
-
-        return data_bag, report_date
+        data_bag = {}
+        for prefix in stocks.columns:
+            c = calc.get(prefix, {})
+            year_ago_val = year_ago_row.get(prefix) if year_ago_row is not None else None
+            if year_ago_val is None or pd.isna(year_ago_val):
+                year_ago_val = c.get("year_ago") if c.get("year_ago") is not None else current.get(f"{prefix}_Year_Ago")
+
+            net_change = c.get("net_change")
+            avg_5yr = c.get("5yr-avg")
+            data_bag[prefix] = {
+                "Stock": clean(current.get(f"{prefix}_Stock")),
+                "Net_Change": clean(net_change if net_change is not None else current.get(f"{prefix}_Net_Change")),
+                "Year_Ago": clean(year_ago_val),
+                "Avg_5Yr": clean(avg_5yr if avg_5yr is not None else current.get(f"{prefix}_5Yr_Avg")),
+            }
+
+        return data_bag, report_date, stocks
 
     except Exception as e:
         print(f"❌ 解析错误: {e}")
-        return None, None
+        return None, None, None
 
 
-def run_collector():
-    run_time_str = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    run_date_str = datetime.now().strftime('%Y-%m-%d')
-
-    print(f"🚀 [Storage Collector V2] 任务启动: {run_time_str}")
-
-    current_data, report_date = fetch_eia_data()
-
+def update_weekly_history(stocks):
+    """
+    合并 JSON 中的全部周次到周度库存表 (新数据覆盖同周旧值，以吸收 EIA 修订)，
+    并在完整历史上重新计算全部对比值。只有数值变化的周次会触发汇总 (rollups) 重算。
+    """
+    with history_store.locked(history_store.source_dir(WEEKLY_SOURCE)):
+        changed_weeks = _merge_weekly_history(stocks)
+    rollups.update(WEEKLY_SOURCE, changed_weeks)
+
+
+def _changed_weeks(old, weekly):
+    """与旧表相比有数值变化 (新增 / 修订) 的周次。"""
+    if old.empty or set(weekly.columns) - set(old.columns):
+        return weekly.index
+    cols = list(weekly.columns)
+    before = old.reindex(weekly.index)[cols].to_numpy(dtype=float)
+    same = np.isclose(weekly[cols].to_numpy(dtype=float), before, atol=1e-3, equal_nan=True).all(axis=1)
+    return weekly.index[~same]
+
+
+def _merge_weekly_history(stocks):
+    old = history_store.read_history(WEEKLY_SOURCE)
+    if not old.empty:
+        old = old.set_index("Week_Date")
+        old_stocks = old[[c for c in old.columns if c.endswith("_Stock")]]
+        old_stocks.columns = [c[:-len("_Stock")] for c in old_stocks.columns]
+        cols = list(dict.fromkeys(list(stocks.columns) + list(old_stocks.columns)))
+        stocks = stocks.combine_first(old_stocks)[cols]
+
+    weekly = compute_weekly_deltas(stocks.sort_index())
+    out = weekly.reset_index()
+    # 整表重算，但只有内容变化的月份 (通常是最近几周的修订) 会被重写
+    changed = history_store.replace_history(out, WEEKLY_SOURCE)
+    print(f"   🗄️ 周度库存表: {len(weekly)} 周 x {len(stocks.columns)} 区域 -> "
+          f"{history_store.source_dir(WEEKLY_SOURCE)}/ ({changed} 个分区有变化)")
+    return _changed_weeks(old, weekly)
+
+
+def report_row(data_bag, report_date):
+    """parse_eia_report 的 data_bag -> 库存表的一行 (不含 Run_Date / Update_Time)。"""
+    row = {'Report_Date': report_date}
+    for prefix, values in data_bag.items():
+        row[f"{prefix}_Stock"] = values.get("Stock")
+        row[f"{prefix}_Net_Change"] = values.get("Net_Change")
+        row[f"{prefix}_Year_Ago"] = values.get("Year_Ago")
+        row[f"{prefix}_5Yr_Avg"] = values.get("Avg_5Yr")
+    return row
+
+
+def parse_storage(payloads, ctx):
+    """EIA 报告 -> 一行 (本周各区域数值)。全部周次的库存留在 ctx 里写周度表。"""
+    payload = payloads["EIA"]
+    if payload is None:
+        return None
+    current_data, report_date, stocks = parse_eia_report(payload)
     if not current_data or not report_date:
-        print("❌ 未获取到有效数据")
-        return
-
-    # 构造保存行
-    new_row = {
-        'Run_Date': run_date_str,
-        'Report_Date': report_date,
-        'Update_Time': run_time_str
-    }
+        return None
+    ctx["stocks"] = stocks
 
-    # 填充数据
-    for prefix, values in current_data.items():
-        new_row[f"{prefix}_Stock"] = values.get("Stock")
-        new_row[f"{prefix}_Net_Change"] = values.get("Net_Change")
-        new_row[f"{prefix}_Year_Ago"] = values.get("Year_Ago")
-        new_row[f"{prefix}_5Yr_Avg"] = values.get("Avg_5Yr")
+    # 构造保存行 (Run_Date / Update_Time 由引擎补上)
+    new_row = report_row(current_data, report_date)
 
     print("   📊 数据校验:")
     print(f"      - Total Stock: {new_row.get('Total_Stock')}")
     print(f"      - Total Year Ago: {new_row.get('Total_Year_Ago')} (应有数值)")
+    return new_row
 
-    # 存入 CSV
-    if os.path.exists(HISTORY_FILE):
-        df = pd.read_csv(HISTORY_FILE)
-        if run_date_str in df['Run_Date'].values:
-            print("   🔄 覆盖今日旧数据...")
-            df = df[df['Run_Date'] != run_date_str]
-        new_df = pd.DataFrame([new_row])
-        df = pd.concat([df, new_df], ignore_index=True)
-    else:
-        print(f"   ✨ 初始化数据库: {HISTORY_FILE}")
-        df = pd.DataFrame([new_row])
-
-    # 排序与保存
-    cols = list(df.columns)
-    priority = ['Run_Date', 'Report_Date']
-    for c in priority:
-        if c in cols: cols.remove(c)
-    final_cols = priority + cols
-
-    df = df[final_cols].sort_values(by='Run_Date')
-    df.to_csv(HISTORY_FILE, index=False)
-    print(f"✅ [成功] EIA 数据已保存 (包含 Year Ago)。")
+
+def store_weekly(ctx):
+    """入库后: 全部周次另存一份周度库存表。"""
+    with collector_metrics.stage("store_weekly"):
+        update_weekly_history(ctx["stocks"])
+
+
+# === 数据源声明 ===
+# 按 Run_Date 存入按月分区的历史库 (只改动 Run_Date 所在月份)；
+# 同一期报告 (Report_Date) 已入库过即记为缓存命中
+SOURCE = source_engine.Source(
+    "storage", HISTORY_SOURCE, {"EIA": URL_EIA}, parse_storage,
+    dedupe="Report_Date", after_store=store_weekly, extra_snapshots=(WEEKLY_SOURCE,),
+    timeout=30, budget=FETCH_BUDGET_S)
+
+
+def run_collector():
+    return source_engine.run(SOURCE)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,225 @@
+import pandas as pd
+import numpy as np
+from datetime import datetime
+import json
+import os
+import collector_metrics
+import history_store
+import schemas
+
+# ==========================================
+# 1. 配置区域 (Configuration)
+# ==========================================
+# EIA 周度净变化 (Total_Net_Change) 的即时预测 (Nowcast)。
+# 特征: 燃气加权 HDD (全美) + 提前一周发布的 AO/NAO/PNA Day7 预测。
+# 模型: 递推最小二乘 (RLS)，每来一周新数据只做一次 O(k^2) 的增量更新，不重新拟合全部历史。
+
+# 输入: history/<source>/ 月分区
+STORAGE_SOURCE = "storage"
+HDD_SOURCE = "hdd"
+WEATHER_SOURCE = "weather"
+
+STATE_FILE = "nowcast_state.json"  # 模型状态 (系数 / 协方差 / 残差方差 / 已训练到的周)
+OUTPUT_FILE = "nowcast_storage.csv"  # 预测记录 (侧边栏直接读取)
+
+FEATURES = ["US_Actual", "AO_Day7", "NAO_Day7", "PNA_Day7"]
+TARGET = "Total_Net_Change"
+
+FORGETTING = 0.97  # 遗忘因子: 越小越偏重近期 (季节切换更快)
+PRIOR_SCALE = 1e4  # 初始协方差 (近似无信息先验)
+MIN_OBS = 8  # 少于该样本数时不给出置信区间
+BAND_Z = 1.645  # 90% 置信带
+
+
+# ==========================================
+# 2. 特征对齐 (Feature Alignment)
+# ==========================================
+
+def load_weekly_frame():
+    """
+    把三份历史表对齐到 EIA 报告周 (周五结束):
+      - HDD: Source_Date (周六) 与报告周相差 1 天，容差 3 天
+      - 遥相关: 取报告周前 7 天及以前最近一次运行的 Day7 预测 (即当时能看到的预报)
+    """
+    storage = history_store.read_history(STORAGE_SOURCE, usecols=schemas.only("Run_Date", "Report_Date", TARGET))
+    storage = storage.sort_values("Run_Date").drop_duplicates("Report_Date", keep="last")
+    weeks = pd.DataFrame({
+        "Week": storage["Report_Date"],
+        TARGET: storage[TARGET].astype(float),
+    }).sort_values("Week")
+
+    hdd = history_store.read_history(HDD_SOURCE, usecols=schemas.only("Run_Date", "Source_Date", "US_Actual"))
+    hdd = hdd[hdd["Source_Date"].notna()]
+    hdd = hdd.sort_values("Run_Date").drop_duplicates("Source_Date", keep="last")
+    hdd = pd.DataFrame({
+        "HDD_Week": hdd["Source_Date"],
+        "US_Actual": hdd["US_Actual"].astype(float),
+    }).sort_values("HDD_Week")
+
+    weather = history_store.read_history(
+        WEATHER_SOURCE, usecols=schemas.only("Date", "AO_Day7", "NAO_Day7", "PNA_Day7"))
+    weather = weather.rename(columns={"Date": "Issued"})
+    weather = weather[["Issued", "AO_Day7", "NAO_Day7", "PNA_Day7"]].sort_values("Issued")
+
+    return weeks, hdd, weather
+
+
+def build_features(weeks, hdd, weather):
+    """为任意一组目标周 (含尚未发布的下一周) 拼出特征行。"""
+    frame = weeks.copy()
+    frame["HDD_Key"] = frame["Week"] + pd.Timedelta(days=1)
+    frame = pd.merge_asof(frame, hdd, left_on="HDD_Key", right_on="HDD_Week",
+                          direction="nearest", tolerance=pd.Timedelta(days=3))
+    frame["Issue_Key"] = frame["Week"] - pd.Timedelta(days=7)
+    frame = pd.merge_asof(frame, weather, left_on="Issue_Key", right_on="Issued", direction="backward")
+    return frame.drop(columns=["HDD_Key", "Issue_Key"])
+
+
+# ==========================================
+# 3. 递推最小二乘 (Recursive Least Squares)
+# ==========================================
+
+def new_state():
+    k = len(FEATURES) + 1
+    return {
+        "features": FEATURES,
+        "theta": [0.0] * k,
+        "P": (np.eye(k) * PRIOR_SCALE).tolist(),
+        "sigma2": None,
+        "n_obs": 0,
+        "last_week": None,
+    }
+
+
+def load_state():
+    if os.path.exists(STATE_FILE):
+        with open(STATE_FILE, encoding="utf-8") as f:
+            state = json.load(f)
+        if state.get("features") == FEATURES:
+            return state
+        print("   ⚠️ 特征定义已变更，模型从头训练")
+    return new_state()
+
+
+def design_row(row):
+    return np.concatenate([[1.0], row[FEATURES].to_numpy(dtype=float)])
+
+
+def rls_update(state, x, y):
+    """单步 RLS 更新；残差方差用更新后的残差做指数加权。"""
+    theta = np.asarray(state["theta"])
+    P = np.asarray(state["P"])
+
+    err = y - x @ theta
+    Px = P @ x
+    gain = Px / (FORGETTING + x @ Px)
+    theta = theta + gain * err
+    P = (P - np.outer(gain, Px)) / FORGETTING
+
+    # 系数尚未可识别 (样本数 <= 参数个数) 时的误差不计入残差方差
+    sigma2 = state["sigma2"]
+    if state["n_obs"] >= len(x):
+        resid = y - x @ theta
+        sigma2 = resid ** 2 if sigma2 is None else FORGETTING * sigma2 + (1 - FORGETTING) * resid ** 2
+        sigma2 = float(sigma2)
+
+    state.update(theta=theta.tolist(), P=P.tolist(), sigma2=sigma2, n_obs=state["n_obs"] + 1)
+    return state
+
+
+def predict(state, x):
+    """返回 (预测值, 下界, 上界)；样本不足时不给区间。"""
+    theta = np.asarray(state["theta"])
+    P = np.asarray(state["P"])
+    expected = float(x @ theta)
+    if state["n_obs"] < MIN_OBS or state["sigma2"] is None:
+        return expected, None, None
+    half = BAND_Z * np.sqrt(state["sigma2"] * (1 + x @ P @ x))
+    return expected, expected - half, expected + half
+
+
+# ==========================================
+# 4. 主流程 (Main)
+# ==========================================
+
+@collector_metrics.instrumented("nowcast")
+def run_collector():
+    run_time_str = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    print(f"🚀 [Storage Nowcast] 任务启动: {run_time_str}")
+
+    # 模型状态与预测记录都是 "读-改-写"，整个运行期间持锁
+    with history_store.locked(STATE_FILE), history_store.locked(OUTPUT_FILE):
+        update_nowcast(run_time_str)
+
+
+def update_nowcast(run_time_str):
+
+    if not all(history_store.has_history(s) for s in [STORAGE_SOURCE, HDD_SOURCE, WEATHER_SOURCE]):
+        print("❌ 历史数据不全，跳过预测。")
+        collector_metrics.mark_failed("missing inputs")
+        return
+
+    with collector_metrics.stage("load"):
+        weeks, hdd, weather = load_weekly_frame()
+    if weeks.empty:
+        print("❌ 尚无 EIA 数据")
+        collector_metrics.mark_failed("no EIA data")
+        return
+    frame = build_features(weeks, hdd, weather)
+
+    # 1. 只用新周次做增量更新
+    state = load_state()
+    train = frame.dropna(subset=FEATURES + [TARGET])
+    if state["last_week"]:
+        train = train[train["Week"] > pd.Timestamp(state["last_week"])]
+
+    with collector_metrics.stage("fit"):
+        for _, row in train.iterrows():
+            rls_update(state, design_row(row), row[TARGET])
+            state["last_week"] = row["Week"].strftime("%Y-%m-%d")
+    collector_metrics.add("rows_parsed", len(train))
+    print(f"   🧮 新增训练周: {len(train)} | 累计样本: {state['n_obs']}")
+
+    history_store.write_json(state, STATE_FILE)
+
+    # 2. 预测下一份 EIA 报告
+    next_week = weeks["Week"].max() + pd.Timedelta(weeks=1)
+    target = build_features(pd.DataFrame({"Week": [next_week]}), hdd, weather).iloc[0]
+    if target[FEATURES].isna().any():
+        # 目标周的 HDD 尚未发布时，用最近一周的 HDD 顶替
+        target["US_Actual"] = hdd["US_Actual"].iloc[-1] if not hdd.empty else np.nan
+    if target[FEATURES].isna().any():
+        print("❌ 预测特征缺失，跳过。")
+        collector_metrics.mark_failed("missing features")
+        return
+
+    expected, lower, upper = predict(state, design_row(target))
+    new_row = {
+        "Target_Week": next_week.strftime("%Y-%m-%d"),
+        "Expected": round(expected, 1),
+        "Lower": None if lower is None else round(lower, 1),
+        "Upper": None if upper is None else round(upper, 1),
+        "N_Obs": state["n_obs"],
+        "Update_Time": run_time_str,
+    }
+    print(f"   📈 {new_row['Target_Week']} 预期净变化: {new_row['Expected']} Bcf "
+          f"[{new_row['Lower']}, {new_row['Upper']}]")
+
+    # 3. 写入预测记录 (同一目标周覆盖; 已发布的周回填实际值)
+    if os.path.exists(OUTPUT_FILE):
+        df = pd.read_csv(OUTPUT_FILE)
+        df = df[df["Target_Week"] != new_row["Target_Week"]]
+        df = pd.concat([df, pd.DataFrame([new_row])], ignore_index=True)
+    else:
+        df = pd.DataFrame([new_row])
+
+    actuals = weeks.set_index(weeks["Week"].dt.strftime("%Y-%m-%d"))[TARGET]
+    df["Actual"] = df["Target_Week"].map(actuals)
+    df = df.sort_values("Target_Week")
+    df = df[["Target_Week", "Expected", "Lower", "Upper", "Actual", "N_Obs", "Update_Time"]]
+    history_store.write_csv(df, OUTPUT_FILE)
+    print(f"✅ [成功] 预测已保存至 {OUTPUT_FILE}")
+
+
+if __name__ == "__main__":
+    run_collector()
@@ -0,0 +1,392 @@
+import os
+import pandas as pd
+
+# ==========================================
+# 看板样式与页面片段 (Shared Styles)
+# ==========================================
+# dashboard.py 与 export_static.py 共用: 全局 CSS、链接、涨跌配色、表格 Styler 与 HTML 片段，
+# 静态导出与在线看板因此保持同一套外观。这里不依赖 Streamlit。
+#
+# [核心颜色统一] Bullish (利多) = 绿；Bearish (利空) = 红
+
+GREEN = "#2e7d32"
+RED = "#c62828"
+GREEN_BG = "#e8f5e9"
+RED_BG = "#ffebee"
+HIGHLIGHT_BG = "#fff3cd"
+
+# === 外部图片与链接 ===
+IMG_URLS = {
+    "AO": "https://www.cpc.ncep.noaa.gov/products/precip/CWlink/daily_ao_index/ao.gefs.sprd2.png",
+    "NAO": "https://www.cpc.ncep.noaa.gov/products/precip/CWlink/pna/nao.gefs.sprd2.png",
+    "PNA": "https://www.cpc.ncep.noaa.gov/products/precip/CWlink/pna/pna.gefs.sprd2.png",
+    # 可用环境变量 ENSO_PDF_URL 覆盖 (压测 / 离线环境指向本地副本)
+    "LANINA": os.environ.get("ENSO_PDF_URL", "https://www.cpc.ncep.noaa.gov/products/analysis_monitoring/lanina/enso_evolution-status-fcsts-web.pdf")
+}
+
+LINKS = {
+    "NOAA_HOME": "https://www.cpc.ncep.noaa.gov/",
+    "YAHOO_NG": "https://finance.yahoo.com/quote/NG=F",
+    "YAHOO_EQT": "https://finance.yahoo.com/quote/EQT",
+    "YAHOO_BOIL": "https://finance.yahoo.com/quote/BOIL",
+    "YAHOO_CSX": "https://finance.yahoo.com/quote/CSX",
+    "YAHOO_UNP": "https://finance.yahoo.com/quote/UNP",
+    "YAHOO_UAL": "https://finance.yahoo.com/quote/UAL",
+}
+
+# === 全局 CSS (已修改以缩小顶部空间) ===
+DASHBOARD_CSS = """
+    <style>
+    /* [新增] 强行缩小主页面顶部空白 */
+    .block-container {
+        padding-top: 1.5rem !important; /* 默认通常是 6rem，这里改为 1.5rem */
+        padding-bottom: 1rem !important;
+        margin-top: 0rem !important;
+    }
+
+    /* 侧边栏背景 */
+    [data-testid="stSidebar"] { background-color: #f8f9fa; }
+
+    /* 侧边栏顶部紧凑模式 */
+    section[data-testid="stSidebar"] .block-container {
+        padding-top: 2rem;
+        padding-bottom: 2rem;
+    }
+
+    /* Tabs 样式 */
+    .stTabs [data-baseweb="tab-list"] { gap: 8px; }
+    .stTabs [data-baseweb="tab"] {
+        height: 45px; white-space: pre-wrap; padding: 8px 16px;
+        background-color: #fff; border-radius: 4px; border: 1px solid #e0e0e0;
+    }
+    .stTabs [aria-selected="true"] {
+        background-color: #e3f2fd; border-left: 4px solid #1565c0; color: #1565c0;
+    }
+
+    /* [核心颜色统一] Bullish (Negative/Cold) = Green; Bearish (Positive/Warm) = Red */
+    .tag-minus {
+        background-color: #e8f5e9; color: #2e7d32; /* 绿色: 负相位/寒冷/利多 */
+        padding: 4px 12px; border-radius: 6px; font-weight: 700; font-size: 1.1em;
+        border: 1px solid #c8e6c9; display: inline-block; margin: 4px 0;
+    }
+    .tag-plus {
+        background-color: #e8f5e9; color: #2e7d32; /* [FIXED] 绿色: 正相位/PNA/利多 */
+        padding: 4px 12px; border-radius: 6px; font-weight: 700; font-size: 1.1em;
+        border: 1px solid #c8e6c9; display: inline-block; margin: 4px 0;
+    }
+
+    .tag-bear {
+        background-color: #ffebee;
+        color: #c62828;               /* 红色：暖冬/利空 */
+        padding: 4px 12px;
+        border-radius: 6px;
+        font-weight: 700;
+        font-size: 1.1em;
+        border: 1px solid #ffcdd2;
+        display: inline-block;
+        margin: 4px 0;
+    }
+
+    .tag-neutral {
+        background-color: #f5f5f5; color: #616161;
+        padding: 4px 12px; border-radius: 6px; font-weight: 700; font-size: 1.1em;
+        border: 1px solid #e0e0e0; display: inline-block; margin: 4px 0;
+    }
+
+    /* 信号框样式 */
+    .signal-box-bull {
+        background-color: #fff; border-left: 4px solid #c62828;
+        padding: 16px; border-radius: 8px; margin-top: 10px;
+        box-shadow: 0 2px 5px rgba(0,0,0,0.05);
+        border: 1px solid #f0f0f0;
+    }
+
+    /* 决策矩阵排版样式 */
+    .decision-content {
+        margin-top: 10px;
+        font-size: 0.95em;
+        line-height: 1.6;
+    }
+    .decision-label {
+        font-weight: 700;
+        color: #212121;
+        display: block;
+        margin-top: 10px;
+        margin-bottom: 4px;
+    }
+
+    .zoom-img:hover { opacity: 0.9; cursor: zoom-in; transition: 0.3s; }
+    </style>
+"""
+
+
+# ==========================================
+# 1. HTML 片段 (Fragments)
+# ==========================================
+
+def clickable_image_html(img_url, alt_text):
+    return f'''
+    <a href="{img_url}" target="_blank">
+        <img src="{img_url}" class="zoom-img" style="width:100%; border-radius:5px; border:1px solid #ddd;" alt="{alt_text}">
+    </a>
+    '''
+
+
+def signal_card_html(title, dynamics, impact, signal_text):
+    return f"""
+<div class="signal-box-bull">
+    <div style="font-size: 1.15em; font-weight: bold; margin-bottom: 12px; color: #212121;">{title}</div>
+    <div style="margin-bottom: 8px; color: #424242;">
+        🌪️ <b>动力学:</b> {dynamics}
+    </div>
+    <div style="margin-bottom: 12px; color: #424242;">
+        🥶 <b>影响:</b> {impact.replace('**', '')}
+    </div>
+    <div style="background-color: #ffebee; padding: 8px; border-radius: 4px; color: #c62828; font-weight: bold;">
+        🔥 信号: {signal_text}
+    </div>
+</div>
+"""
+
+
+def index_value_style(index_name, value):
+    """AO / NAO 负值利多，PNA 正值利多。返回 (CSS, 箭头)。"""
+    if value is None or pd.isna(value):
+        return "color: #888;", "-"
+    is_positive = value > 0
+    is_bullish = not is_positive if index_name in ["NAO", "AO"] else is_positive
+    color = GREEN if is_bullish else RED
+    arrow = "▲" if is_bullish else "▼"
+    return f"color: {color};", arrow
+
+
+def index_value_card_html(index_name, latest_data):
+    """遥相关标签页下方的 实况 / Day 7 / Day 10 数值条。"""
+    cells = []
+    for i, (field, label) in enumerate([("Obs", "OBSERVED (Today)"), ("Day7", "DAY 7 FORECAST"),
+                                        ("Day10", "DAY 10 FORECAST")]):
+        value = latest_data.get(f"{index_name}_{field}")
+        style, _ = index_value_style(index_name, value)
+        border = " border-right: 1px solid #eee;" if i < 2 else ""
+        text = "-" if value is None or pd.isna(value) else f"{value:.3f}"
+        cells.append(f"""
+                <div style='flex:1;{border}'>
+                    <span style='font-weight: bold; color: #555;'>{label}</span><br>
+                    <span style='font-size: 1.3em; {style}; font-weight: bold;'>{text}</span>
+                </div>""")
+    return f"""
+            <div style='
+                margin-top: 15px;
+                border: 1px solid #e0e0e0;
+                border-radius: 6px;
+                padding: 8px;
+                background-color: #f8f8f8;
+                display: flex;
+                justify-content: space-around;
+                text-align: center;
+                font-size: 0.95em;
+            '>{''.join(cells)}
+            </div>
+            """
+
+
+def dev_year_html(dev_year):
+    """侧边栏度日卡片下方的 vs Year 小字。"""
+    color = GREEN if dev_year > 0 else RED
+    arrow = "▲" if dev_year > 0 else "▼"
+    if dev_year == 0:
+        color = "#666"
+        arrow = "-"
+    return f"""<div style="margin-top: -15px; font-size: 0.85em; color: #555;">vs Year: <span style="color: {color}; font-weight: bold;">{arrow} {dev_year}</span></div>"""
+
+
+# === 遥相关标签页内容 ===
+TELECONNECTION_TABS = [
+    {"index": "NAO", "label": "1. 北大西洋涛动 (NAO)", "tag": "<div class='tag-minus'>📉 负相位 / Negative (-)</div>",
+     "card": ("阻塞效应 (Blocking)", "西风急流弯曲，格陵兰高压形成。", "冷气团在美东<b>停滞不前</b>。", "极强利多 (寒潮持续)")},
+    {"index": "AO", "label": "2. 北极涛动 (AO)", "tag": "<div class='tag-minus'>📉 负相位 / Negative (-)</div>",
+     "card": ("极涡崩溃 (Vortex Collapse)", "极地高压控制，冷空气南下。", "广泛的<b>冷空气爆发</b>。", "利多 (冷源充足)")},
+    {"index": "PNA", "label": "3. 太平洋-北美模式 (PNA)", "tag": "<div class='tag-plus'>📈 正相位 / Positive (+)</div>",
+     "card": ("西脊东槽 (Ridge-Trough)", "北美西部高压脊隆起。", "建立<b>经向环流</b>输送冷空气。", "利多 (通道打开)")},
+]
+
+# === 决策矩阵: (提示框类型, 标题, 内容 HTML) ===
+DECISION_MATRIX = [
+    ("success", "🔥 **极寒模式 (Strong Buy)**", """<div class='decision-content'>
+        <span class='decision-label'>信号组合:</span>
+        <span class='tag-minus'>NAO (-)</span> + <span class='tag-minus'>AO (-)</span> + <span class='tag-plus'>PNA (+)</span>
+        <span class='decision-label'>🥶 天气后果:</span>
+        阻寒高压 + 极涡崩溃 + 通道打开。宾州/东北部遭遇持续性暴雪与极寒。
+        <span class='decision-label'>💰 操作建议:</span>
+        <b>押注上涨:</b> 买入 EQT / NG Futures。
+    </div>"""),
+    ("error", "🟢 **暖冬模式 (Strong Sell)**", """<div class='decision-content'>
+        <span class='decision-label'>信号组合:</span>
+        <span class='tag-bear'>NAO (+)</span> + <span class='tag-bear'>AO (+)</span> + <span class='tag-bear'>PNA (-)</span>
+        <span class='decision-label'>☀️ 天气后果:</span>
+        强劲西风急流 + 东南高压脊。暖湿气流主导美东，不下雪只下雨。
+        <span class='decision-label'>💰 操作建议:</span>
+        <b>押注下跌:</b> 卖出资产 / 观望。
+    </div>"""),
+    ("warning", "⚖️ **震荡模式 (Neutral)**", """<div class='decision-content'>
+        <span class='decision-label'>信号组合:</span>
+        <span class='tag-neutral'>信号背离 (Mixed)</span>
+        <span class='decision-label'>💨 天气后果:</span>
+        冷源充足但缺乏阻塞。寒潮来去匆匆，气温忽冷忽热。
+        <span class='decision-label'>💰 操作建议:</span>
+        <b>波段操作:</b> 不要长期持有。
+    </div>"""),
+]
+
+
+# ==========================================
+# 2. 单元格配色 (Cell Styles)
+# ==========================================
+
+def style_ao_nao(val):
+    if pd.isna(val): return ''
+    if val < 0: return f'color: {GREEN}; background-color: {GREEN_BG}; font-weight: bold'
+    if val > 0: return f'color: {RED}; background-color: {RED_BG}'
+    return ''
+
+
+def style_pna(val):
+    if pd.isna(val): return ''
+    if val > 0: return f'color: {GREEN}; background-color: {GREEN_BG}; font-weight: bold'
+    if val < 0: return f'color: {RED}; background-color: {RED_BG}'
+    return ''
+
+
+def style_hdd(val):
+    """度日距平: 偏冷 (正) 利多为绿。"""
+    if pd.isna(val): return ''
+    if isinstance(val, (int, float)):
+        if val > 0: return f'color: {GREEN}; font-weight: bold; background-color: {GREEN_BG}'
+        if val < 0: return f'color: {RED}; font-weight: bold; background-color: {RED_BG}'
+    return ''
+
+
+def style_storage_change(v):
+    """库存变化: 少于常年 (负) 利多为绿。"""
+    if pd.isna(v): return ''
+    if v < 0: return f'color: {GREEN}; font-weight: bold;'
+    if v > 0: return f'color: {RED}; font-weight: bold;'
+    return 'color: black;'
+
+
+# 预报修正方向 (data_loader.REVISION_LABELS): 转冷利多为绿
+REVISION_COLORS = {"❄️ 转冷": GREEN, "🔥 转暖": RED}
+
+
+def style_revision(v):
+    color = REVISION_COLORS.get(v)
+    return f'color: {color}; font-weight: bold' if color else ''
+
+
+def style_highlight_bg(v):
+    return f'background-color: {HIGHLIGHT_BG};'
+
+
+def num_fmt(x):
+    if pd.isna(x): return ""
+    v = float(x)
+    if abs(v - round(v)) < 1e-6: return f"{int(round(v)):,d}"
+    return f"{v:.1f}".rstrip("0").rstrip(".")
+
+
+# ==========================================
+# 3. 表格 Styler (Tables)
+# ==========================================
+
+def _map(styler, func, subset=None):
+    """逐单元格样式: pandas >= 2.1 为 Styler.map，更早版本为 applymap。"""
+    apply = getattr(styler, "map", None) or styler.applymap
+    return apply(func, subset=subset)
+
+
+EIA_HIGHLIGHT_ROWS = ["Net Chg", "vs Year %", "vs 5Yr %"]
+
+
+def _eia_total_highlight(df):
+    styles = pd.DataFrame('font-weight: bold;', index=df.index, columns=df.columns)
+    for idx in df.index:
+        if idx in EIA_HIGHLIGHT_ROWS:
+            for col in df.columns:
+                val = df.loc[idx, col]
+                base = f'font-weight: bold; background-color: {HIGHLIGHT_BG};'
+                if pd.notna(val):
+                    if val < 0:
+                        styles.loc[idx, col] = base + f'color: {GREEN};'
+                    elif val > 0:
+                        styles.loc[idx, col] = base + f'color: {RED};'
+                    else:
+                        styles.loc[idx, col] = base + 'color: black;'
+                else:
+                    styles.loc[idx, col] = base + 'color: black;'
+    return styles
+
+
+def eia_total_styler(eia_df):
+    """侧边栏 EIA 表 (行 = 指标，列 = 区域)。"""
+    return eia_df.T.style.format(num_fmt).apply(_eia_total_highlight, axis=None)
+
+
+def projection_styler(proj_df):
+    return proj_df.style.format("{:+.1f}")
+
+
+def scenario_styler(scen_df):
+    return (scen_df.style.format("{:.0f}", subset=["Weight %"]).format("{:+.0f}", subset=["Δ vs Prev"], na_rep="-")
+            .format("{:+.2f}", subset=[c for c in scen_df.columns if " D" in c]))
+
+
+def revision_styler(rev_df):
+    styler = (rev_df.style.format("{:+.2f}", subset=["预报"])
+              .format("{:+.2f}", subset=["Δ 上次", "Δ 7天前"], na_rep="-")
+              .format("{:+.3f}", subset=["趋势/日"], na_rep="-"))
+    return _map(styler, style_revision, subset=["方向"])
+
+
+def weather_history_styler(df, index_name):
+    return _map(df.style.format("{:.2f}"), style_pna if index_name == "PNA" else style_ao_nao)
+
+
+def hdd_history_styler(df, color_cols, num_cols=None):
+    styler = df.style.format("{:.0f}", subset=num_cols)
+    styler = _map(styler, style_hdd, subset=color_cols)
+    return _map(styler, style_highlight_bg, subset=color_cols)  # 加浅黄背景 (与库存保持一致)
+
+
+def xcorr_styler(df):
+    """滞后相关峰值表: 相关系数正绿负红。"""
+    styler = df.style.format("{:+.3f}", subset=["r", "r@0"], na_rep="-").format("{:+d}", subset=["Lag"])
+    return _map(styler, style_hdd, subset=["r", "r@0"])
+
+
+def rollup_styler(df):
+    """汇总表: 度日距平 / 库存净变化按正负上色。"""
+    num_cols = [c for c in df.columns if c != "Rows"]
+    color_cols = [c for c in num_cols if "_Dev_" in c or "_Net_Change" in c]
+    styler = df.style.format("{:.2f}", subset=num_cols, na_rep="-")
+    return _map(styler, style_hdd, subset=color_cols)
+
+
+def eia_history_styler(view_df):
+    styler = view_df.style
+    all_cols = view_df.columns
+
+    # 格式化
+    int_cols = [c for c in all_cols if c[1] in ["Stock", "Year Ago", "5-Yr Avg"]]
+    styler = styler.format("{:,.0f}", subset=int_cols)
+
+    net_cols = [c for c in all_cols if c[1] == "Net Chg"]
+    styler = styler.format("{:+.0f}", subset=net_cols)
+
+    pct_cols = [c for c in all_cols if "%" in c[1]]
+    styler = styler.format("{:+.1f}", subset=pct_cols)
+
+    # 应用样式
+    target_cols = net_cols + pct_cols
+    styler = _map(styler, style_storage_change, subset=target_cols)
+    styler = _map(styler, style_highlight_bg, subset=target_cols)
+    return styler.set_properties(**{'text-align': 'center'})